@@ -0,0 +1,130 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This script benchmarks reading the tables in src/data from the columnar
+store, see columnar.py, against parsing the files with a plain pd.read_csv.
+
+For each table, it reads the whole table from the text file, and from the
+columnar store with all columns, with one column, and with a filter on the
+rows where one is defined in QUERIES or TIME_COLUMNS. Each read is run
+n_repeats times, and the fastest run is kept. Memory is the peak allocation during the read, as
+traced by tracemalloc. The last columns give the size of the file and of the
+columnar store on disk.
+
+Tables whose files are missing are skipped.
+
+Usage: python BENCH_columnar.py [n_repeats]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+import paths
+
+from columnar import read_columnar, read_schema
+from datasets import DATASETS
+
+
+# projected column and row filters for the filtered read of some tables
+QUERIES = {
+    "tess_flares": (["ed_rec"], [("TIC", "==", 277539431),
+                                 ("Sector", "in", [12, 37, 38])]),
+    "flare_energies": (["E_erg"], [("instrument", "==", "OM")]),
+    "tess_ffd": (["alpha"], [("TIC", "==", 277539431)]),
+    "ilin2021": (["Lbol_erg_s"], [("TIC", "==", 277539431)]),
+}
+
+# time and flux columns of the light curves, the filtered read selects the
+# first tenth of the time range
+TIME_COLUMNS = {
+    "timeseries": ("time", "rate"),
+    "corrected_merged_epic_lc": ("TIME", "RATE"),
+    "stacked_xray_lightcurve": ("time", "normalized_flux"),
+}
+
+
+def time_query(name):
+    """Projected column and filter on the first tenth of the time range of
+    a light curve."""
+    t, flux = TIME_COLUMNS[name]
+    lo = min(g["stats"][t][0] for g in read_schema(name)["row_groups"])
+    hi = max(g["stats"][t][1] for g in read_schema(name)["row_groups"])
+    return [flux], [(t, ">=", lo), (t, "<", lo + (hi - lo) / 10.)]
+
+
+def measure(read, n_repeats=3):
+    """Time and peak memory of a read.
+
+    Parameters
+    ----------
+    read : callable
+        Function without arguments that returns a table.
+    n_repeats : int
+        Number of runs, the fastest is kept.
+
+    Returns
+    -------
+    t, peak : float
+        Time in ms, and peak memory in MB.
+    n_rows : int
+        Number of rows read.
+    """
+    best = None
+    for _ in range(n_repeats):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        df = read()
+        t = (time.perf_counter() - t0) * 1e3
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if best is None or t < best[0]:
+            best = (t, peak / 1024**2, len(df))
+
+    return best
+
+
+def store_size(name, store=paths.cache / "columnar"):
+    """Size of a table in the columnar store in MB."""
+    return sum(p.stat().st_size for p in (store / name).rglob("*")
+               if p.is_file()) / 1024**2
+
+
+if __name__ == "__main__":
+
+    n_repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    print(f"{'table':<26} {'read':<10} {'time [ms]':>10} {'peak [MB]':>10} "
+          f"{'rows':>8} {'file [MB]':>10} {'store [MB]':>10}")
+
+    for name, spec in DATASETS.items():
+        path = paths.data / spec["file"]
+        if not path.exists() or path.suffix != ".csv":
+            continue
+
+        # convert before timing the reads
+        read_schema(name)
+        sizes = f"{path.stat().st_size / 1024**2:>10.2f} {store_size(name):>10.2f}"
+
+        if name in TIME_COLUMNS:
+            columns, filters = time_query(name)
+        else:
+            columns, filters = QUERIES.get(name, (list(spec["dtype"] or [])[:1], None))
+        reads = {"csv": lambda: pd.read_csv(path, **spec.get("kwargs", dict())),
+                 "full": lambda: read_columnar(name),
+                 "projected": lambda: read_columnar(name, columns=columns or None)}
+        if filters is not None:
+            reads["filtered"] = lambda: read_columnar(name, columns=columns,
+                                                      filters=filters)
+
+        for label, read in reads.items():
+            t, peak, n_rows = measure(read, n_repeats)
+            print(f"{name:<26} {label:<10} {t:>10.2f} {peak:>10.2f} {n_rows:>8} {sizes}")
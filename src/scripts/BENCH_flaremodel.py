@@ -0,0 +1,159 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This script benchmarks the exponential decay fits of the TESS flares on
+synthetic flare windows, comparing the original allocating model with the
+buffered model from flaremodel.py, with numerical and analytic Jacobians,
+and the solver in flarefit.py that fits all flares at once. The fits with
+the analytic Jacobian hold t0 between two cadences at a time, see
+flarefit.fit_flare.
+
+Reported are the run time and the number of model evaluations per flare
+(Jacobian evaluations counted separately), and the total cost of all fits,
+i.e., half the sum of squared residuals at the best fit.
+
+Usage: python BENCH_flaremodel.py [n_flares]
+"""
+
+import sys
+import time
+
+import numpy as np
+from scipy.optimize import curve_fit
+
+from flarefit import _fit_by_gaps, fit_flares_batched
+from flaremodel import ExponentialDecay
+
+
+def exponential_decay(t, t0, tau, ampl):
+    """Model as originally defined in the fit scripts."""
+
+    ex = ampl * np.exp(-(t - t0) / tau)
+
+    ex[t < t0] = 0
+
+    return  ex
+
+
+class Counter:
+    """Count the calls to a function."""
+
+    def __init__(self, func):
+        self.func = func
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        return self.func(*args)
+
+
+def synthetic_flares(n, seed=42):
+    """Make flare windows at the 2-min TESS cadence, with the same initial
+    guesses and bounds as in _09_tess_om_flare_loops.py.
+
+    Parameters
+    ----------
+    n : int
+        Number of flares.
+    seed : int
+        Seed of the random number generator.
+
+    Returns
+    -------
+    list of dict
+        Flare windows, see flarefit.py.
+    """
+    rng = np.random.default_rng(seed)
+    cadence = 2. / 60. / 24.
+
+    flares = []
+    for i in range(n):
+        tstart = rng.uniform(0, 100)
+        tau = 10**rng.uniform(-2.5, -1.5)
+        ampl = 10**rng.uniform(-2, 0)
+        tstop = tstart + rng.uniform(2, 6) * tau + 2 * cadence
+
+        t = np.arange(tstart - 0.03, tstop + 0.03, cadence)
+        y = (exponential_decay(t, tstart + rng.uniform(0, cadence), tau, ampl)
+             + rng.normal(0, 2e-3, len(t)))
+
+        # initial guess at the peak cadence, as in the fit script
+        fl = (t > tstart) & (t < tstop)
+        peak_time = t[fl][np.argmax(y[fl])]
+
+        flares.append(dict(t=t, y=y,
+                           p0=[peak_time, (tstop - tstart) / 2, ampl],
+                           bounds=([tstart - 0.99652777778, 0, ampl * 0.95],
+                                   [tstop + 1.00347222222, 1, ampl * 1.00347])))
+
+    return flares
+
+
+def fit(flare, variant):
+    """Fit a flare with one of the model variants.
+
+    Returns
+    -------
+    cost : float
+        Half the sum of squared residuals at the best fit.
+    nfev, njev : int
+        Number of model and Jacobian evaluations.
+    """
+    t, y = flare["t"], flare["y"]
+
+    if variant == "original":
+        model = Counter(exponential_decay)
+    else:
+        buffered = ExponentialDecay(t)
+        model = Counter(buffered)
+        model.jac = Counter(buffered.jac)
+
+    if variant == "analytic":
+        popt, _ = _fit_by_gaps(model, flare)
+    else:
+        popt, _ = curve_fit(model, t, y, p0=flare["p0"], bounds=flare["bounds"])
+
+    cost = 0.5 * np.sum((exponential_decay(t, *popt) - y)**2)
+
+    return cost, model.calls, model.jac.calls if variant == "analytic" else 0
+
+
+if __name__ == "__main__":
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    flares = synthetic_flares(n)
+
+    print(f"{n} flares")
+    print(f"{'variant':<10} {'time/flare [ms]':>16} {'model evals':>12} "
+          f"{'jac evals':>10} {'total cost':>12}")
+
+    for variant in ["original", "buffered", "analytic"]:
+
+        t0 = time.perf_counter()
+        res = np.array([fit(flare, variant) for flare in flares])
+        t = (time.perf_counter() - t0) / n * 1e3
+
+        cost, nfev, njev = res.sum(axis=0)
+
+        print(f"{variant:<10} {t:>16.2f} {nfev / n:>12.1f} "
+              f"{njev / n:>10.1f} {cost:>12.4e}")
+
+    # all flares at once, evaluations are not counted per flare here
+    for i, flare in enumerate(flares):
+        flare.update(sector=0, index=i)
+
+    t0 = time.perf_counter()
+    fits = fit_flares_batched(flares)
+    t = (time.perf_counter() - t0) / n * 1e3
+
+    cost = sum(0.5 * np.sum((exponential_decay(flare["t"], *popt) - flare["y"])**2)
+               for flare, popt in zip(flares, fits[["t0", "tau", "ampl"]].values))
+
+    print(f"{'batched':<10} {t:>16.2f} {'-':>12} {'-':>10} {cost:>12.4e}")
@@ -0,0 +1,141 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This script benchmarks the import time of the paper scripts. For each
+script, the module-level imports are run in a fresh interpreter with
+python -X importtime, and the cumulative times of the top-level imports
+are added up. The first row gives the interpreter startup without any
+imports, for reference.
+
+The output is one line per script with the import time in ms, the wall
+time of the interpreter in ms, and the three slowest top-level imports,
+so that it can be tracked in CI. Each script is run n_repeats times, and
+the fastest run is kept.
+
+Usage: python BENCH_importtime.py [n_repeats] [script ...]
+"""
+
+import ast
+import subprocess
+import sys
+import time
+
+import paths
+
+
+def module_imports(path):
+    """Source of the module-level import statements of a script, without
+    the ones under if __name__ == "__main__".
+
+    Parameters
+    ----------
+    path : Path
+        Path to the script.
+
+    Returns
+    -------
+    str
+        Import statements, one per line.
+    """
+    with open(path, "r") as f:
+        source = f.read()
+
+    tree = ast.parse(source)
+    nodes = [node for node in tree.body
+             if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+    return "\n".join(ast.get_source_segment(source, node) for node in nodes)
+
+
+def parse_importtime(stderr):
+    """Cumulative import times of the top-level imports.
+
+    Parameters
+    ----------
+    stderr : str
+        Output of python -X importtime.
+
+    Returns
+    -------
+    dict
+        Cumulative time in us by module name, for top-level imports only.
+    """
+    times = dict()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # nested imports are indented by two spaces per level
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def import_time(code, n_repeats=3):
+    """Import time of a piece of code in a fresh interpreter.
+
+    Parameters
+    ----------
+    code : str
+        Code to run, e.g., import statements.
+    n_repeats : int
+        Number of runs, the fastest is kept.
+
+    Returns
+    -------
+    total, wall : float
+        Sum of the top-level import times, and the wall time of the
+        interpreter, in ms.
+    times : dict
+        Cumulative time in us by top-level module name.
+    """
+    best = None
+    for _ in range(n_repeats):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                              cwd=paths.scripts, capture_output=True, text=True)
+        wall = (time.perf_counter() - t0) * 1e3
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.splitlines()[-1])
+
+        times = parse_importtime(proc.stderr)
+        total = sum(times.values()) / 1e3
+        if best is None or total < best[0]:
+            best = (total, wall, times)
+
+    return best
+
+
+if __name__ == "__main__":
+
+    n_repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    if len(sys.argv) > 2:
+        scripts = [paths.scripts / name for name in sys.argv[2:]]
+    else:
+        scripts = sorted(p for pattern in ["FIGURE_*.py", "TABLE_*.py",
+                                           "VALUES.py", "_[0-9]*.py"]
+                         for p in paths.scripts.glob(pattern))
+
+    print(f"{'script':<42} {'imports [ms]':>12} {'wall [ms]':>10}  slowest imports")
+
+    rows = [("(interpreter)", "pass")]
+    rows += [(p.name, module_imports(p)) for p in scripts]
+
+    for name, code in rows:
+        try:
+            total, wall, times = import_time(code, n_repeats)
+        except RuntimeError as err:
+            print(f"{name:<42} {'-':>12} {'-':>10}  {err}")
+            continue
+        slowest = sorted(times.items(), key=lambda x: -x[1])[:3]
+        slowest = ", ".join(f"{k} {v / 1e3:.0f}" for k, v in slowest)
+        print(f"{name:<42} {total:>12.1f} {wall:>10.1f}  {slowest}")
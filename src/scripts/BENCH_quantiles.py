@@ -0,0 +1,100 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This script benchmarks the single-pass quantile estimators and the two-pass
+exact quantiles against the np.quantile call on the fully materialised
+chain, in run time and accuracy.
+
+Accuracy is given as the maximum absolute deviation from np.quantile, in
+units of the 16-84 percentile width of each column.
+
+Usage: python BENCH_quantiles.py [n_steps] [chunksize]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from quantiles import StreamingQuantiles, TwoPassQuantiles
+
+
+def synthetic_chain(n, seed=42):
+    """Make a chain with six columns of different shapes.
+
+    Parameters
+    ----------
+    n : int
+        Number of steps.
+    seed : int
+        Seed of the random number generator.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (n, 6).
+    """
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.normal(3, 0.2, n),
+                            rng.lognormal(0, 0.5, n),
+                            rng.normal(50.5, 0.1, n),
+                            rng.gamma(2, 1, n),
+                            rng.lognormal(1, 0.2, n),
+                            rng.standard_t(3, n)])
+
+
+if __name__ == "__main__":
+
+    n = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10_000_000
+    chunksize = int(float(sys.argv[2])) if len(sys.argv) > 2 else 1_000_000
+    qs = [0.16, 0.5, 0.84]
+
+    chain = synthetic_chain(n)
+
+    # reference: the current np.quantile path
+    t0 = time.perf_counter()
+    ref = np.quantile(chain, qs, axis=0)
+    t_ref = time.perf_counter() - t0
+    width = ref[2] - ref[0]
+
+    print(f"{n} steps, chunks of {chunksize}")
+    print(f"{'method':<12} {'time [s]':>10} {'max. error [width]':>20}")
+    print(f"{'np.quantile':<12} {t_ref:>10.3f} {0:>20.2e}")
+
+    for method in ["exact", "tdigest"]:
+
+        sq = StreamingQuantiles(qs, method=method)
+
+        t0 = time.perf_counter()
+        for start in range(0, n, chunksize):
+            sq.update(chain[start:start + chunksize])
+        res = sq.result()
+        t = time.perf_counter() - t0
+
+        err = np.max(np.abs(res - ref) / width)
+
+        print(f"{method:<12} {t:>10.3f} {err:>20.2e}")
+
+    # exact with bounded memory, counting in the first pass and collecting
+    # the values next to the quantiles in the second
+    tp = TwoPassQuantiles(qs)
+
+    t0 = time.perf_counter()
+    for start in range(0, n, chunksize):
+        tp.update(chain[start:start + chunksize])
+    for start in range(0, n, chunksize):
+        tp.collect(chain[start:start + chunksize])
+    res = tp.result()
+    t = time.perf_counter() - t0
+
+    err = np.max(np.abs(res - ref) / width)
+    kept = max(sum(len(v) for v in target["values"]) for target in tp.targets)
+
+    print(f"{'two-pass':<12} {t:>10.3f} {err:>20.2e}   "
+          f"(kept at most {kept / n:.1%} of a column)")
@@ -13,13 +13,20 @@ late M dwarfs in Table 4.
 
 
 import matplotlib.pyplot as plt
-import pandas as pd
 import paths
+from datasets import Datasets
 
 
-if __name__ == "__main__":
+def main(data):
+    """Plot Lx/Lbol against rotation period.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
 
-    d_ = pd.read_csv(paths.data / 'wright2016.csv')
+    d_ = data["wright2016"]
 
     d = d_.sort_values(by='V-K(mag)', ascending=True)
     df = d_[d_["V-K(mag)"] > 5]
@@ -59,4 +66,9 @@ if __name__ == "__main__":
     plt.ylabel(r"$\log (L_X\,/\,L_{\rm bol})$", fontsize=14)
 
     plt.tight_layout()
-    plt.savefig(paths.figures / 'lx_lbol.png', dpi=300)
\ No newline at end of file
+    plt.savefig(paths.figures / 'lx_lbol.png', dpi=300)
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
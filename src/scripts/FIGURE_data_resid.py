@@ -9,62 +9,40 @@ MIT License
 
 This script reads in stacked the writefits output from XSPEC, and plots
 data, model, and residuals in a two-panel figure.
+
+Many fit files can be rendered in one batch: the two-panel layout is built
+once per worker process, and only the data artists are swapped per file.
 """
 
-import pandas as pd
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import matplotlib.pyplot as plt
 import paths
 
+from datasets import Datasets
+from xspec import INSTRUMENTS, read_writefits
 
-def plot_data_resid_3(file):
-
-
-     # column names
-    names = ["E [keV]", "dE", "flux [counts/s/keV]",
-             "e_flux", "model [counts/s/keV]"]
 
-    # read in the file
-    _ = pd.read_csv(paths.data / file, delimiter="\s+", skiprows=3, names=names)
-    
-    # split at the NO NO NO line
-    split_at = _[_["E [keV]"]=="NO"].index.values
+def setup_axes_3():
+    """Make the two-panel layout for joint PN, MOS1, and MOS2 fits.
 
-    d = _[:split_at[0]], _[split_at[0]+1:split_at[1]], _[split_at[1]+1:split_at[2]]
-    r = _[split_at[2]+1:split_at[3]], _[split_at[3]+1:split_at[4]], _[split_at[4]+1:]
+    Returns
+    -------
+    fig : matplotlib.figure.Figure
+    ax : array of matplotlib.axes.Axes
+    """
 
     # make a figure with two subplots, one for data and model, and one for residuals
     fig, ax = plt.subplots(nrows=2, ncols=1, sharex=True, figsize=(7,7),
                            gridspec_kw={'height_ratios': [2.5, 1],
                                         'wspace':0, 'hspace':0})
-    
-    for din, rin, c, label, m in zip(d, r, ["olive", "orange", "blue"],
-                                           ["PN", "MOS1", "MOS2"],
-                                           ["o", "s", "x"]):
-
-        data = din.astype(float)
-        resid = rin.drop("model [counts/s/keV]", axis=1).astype(float)
 
-         # model
-        ax[0].stairs(data["model [counts/s/keV]"], 
-                    np.append(data["E [keV]"].values-data["dE"].values, 
-                            data["E [keV]"].values[-1] + data["dE"].values[-1]), 
-                    color="white", edgecolor=c, linewidth=2, label=label)
-
-        # flux with errors
-        ax[0].errorbar(data["E [keV]"], data["flux [counts/s/keV]"],
-                    yerr=data["e_flux"]/1.644854, fmt=m, markersize=6, alpha=1, c=c)
-
-        # residuals
-        ax[1].errorbar(resid["E [keV]"], resid["flux [counts/s/keV]"],
-                    yerr=resid["e_flux"]/1.644854, fmt=m, markersize=6, c=c)
-        
-        
-      # zero line for residuals
+    # zero line for residuals
     ax[1].axhline(0,c="k")
 
     # labels
-        # labels
     ax[1].set_xlabel("E [keV]", fontsize=14)
     ax[0].set_ylabel(r"flux [counts s$^{-1}\,$keV$^{-1}$]", fontsize=13)
     ax[1].set_ylabel(r"residuals [counts s$^{-1}\,$keV$^{-1}$]", fontsize=13)
@@ -72,76 +50,78 @@ def plot_data_resid_3(file):
     # increase tick size labels
     for a in ax:
         a.tick_params(axis='both', which='major', labelsize=13)
-    
-
-    # y limits
-    ax[0].set_ylim(0,)
-
-    # legend
-    ax[0].legend(loc=1, frameon=False, fontsize=12)
 
     # x limits
     for a in ax:
-        # first = data["E [keV]"].values[0] - data["dE"].values[0]
-        # last = data["E [keV]"].values[-1] + data["dE"].values[-1]
         a.set_xlim(0.25, 5)
-
         a.set_xscale("log")
 
     ax[1].set_xticks(ticks=[0.25,0.4,0.6,0.8,1,2,3,4,5],
                      labels=[0.25,0.4,0.6,0.8,1,2,3,4,5])
 
-    # layout
-    plt.tight_layout()
+    return fig, ax
 
-    # save to file
-    filestub = file.split(".")[0]
-    plt.savefig(paths.figures / f"{filestub}_data_resid.png", dpi=300)
 
+def draw_data_resid_3(ax, file):
+    """Draw data, model, and residuals of a joint fit into the layout.
 
-
-def plot_data_resid_1(file):
-    """Plot the data, model and residuals in a two panel figure.
-    
-    Parameters:
+    Parameters
     ----------
+    ax : array of matplotlib.axes.Axes
+        Axes from setup_axes_3.
     file : str
         filename in results folder
-    
+
+    Returns
+    -------
+    list
+        The artists and containers that were added.
     """
 
+    # read in the file, split at the NO NO NO lines into data and residuals
+    d, r = read_writefits(paths.data / file)
+
+    artists = []
+    for data, resid, c, label, m in zip(d, r, ["olive", "orange", "blue"],
+                                           INSTRUMENTS,
+                                           ["o", "s", "x"]):
+
+        # model
+        artists.append(ax[0].stairs(data["model [counts/s/keV]"],
+                    np.append(data["E [keV]"].values-data["dE"].values,
+                            data["E [keV]"].values[-1] + data["dE"].values[-1]),
+                    color="white", edgecolor=c, linewidth=2, label=label))
+
+        # flux with errors
+        artists.append(ax[0].errorbar(data["E [keV]"], data["flux [counts/s/keV]"],
+                    yerr=data["e_flux"]/1.644854, fmt=m, markersize=6, alpha=1, c=c))
+
+        # residuals
+        artists.append(ax[1].errorbar(resid["E [keV]"], resid["flux [counts/s/keV]"],
+                    yerr=resid["e_flux"]/1.644854, fmt=m, markersize=6, c=c))
+
+    # y limits
+    ax[0].set_ylim(0,)
+
+    # legend
+    ax[0].legend(loc=1, frameon=False, fontsize=12)
+
+    return artists
 
-    # column names
-    names = ["E [keV]", "dE", "flux [counts/s/keV]",
-             "e_flux", "model [counts/s/keV]"]
 
-    # read in the file
-    _ = pd.read_csv(paths.data / file, delimiter="\s+", skiprows=3, names=names)
-    
-    # split at the NO NO NO line
-    split_at = _[_["E [keV]"]=="NO"].index.values[0]
+def setup_axes_1():
+    """Make the two-panel layout for single instrument fits.
 
-    # define data and residuals
-    data = _.iloc[:split_at].astype(float)
-    resid = _.iloc[split_at+1:].drop("model [counts/s/keV]", axis=1).astype(float)
+    Returns
+    -------
+    fig : matplotlib.figure.Figure
+    ax : array of matplotlib.axes.Axes
+    """
 
     # make a figure with two subplots, one for data and model, and one for residuals
     fig, ax = plt.subplots(nrows=2, ncols=1, sharex=True, figsize=(7,7),
                            gridspec_kw={'height_ratios': [2.5, 1],
                                         'wspace':0, 'hspace':0})
-    # model
-    ax[0].stairs(data["model [counts/s/keV]"], 
-                 np.append(data["E [keV]"].values-data["dE"].values, 
-                           data["E [keV]"].values[-1] + data["dE"].values[-1]), 
-                 color="white", edgecolor="k", linewidth=2)
-
-    # flux with errors
-    ax[0].errorbar(data["E [keV]"], data["flux [counts/s/keV]"],
-                yerr=data["e_flux"] / 1.644854, fmt=".", markersize=13, alpha=1, c="olive")
-
-    # residuals
-    ax[1].errorbar(resid["E [keV]"], resid["flux [counts/s/keV]"],
-                yerr=resid["e_flux"]/1.644854, fmt=".", markersize=13, c="olive")
 
     # zero line for residuals
     ax[1].axhline(0,c="k")
@@ -154,22 +134,174 @@ def plot_data_resid_1(file):
     # increase tick size labels
     ax[0].tick_params(axis='both', which='major', labelsize=15)
 
+    for a in ax:
+        a.set_xscale("log")
+
+    return fig, ax
+
+
+def draw_data_resid_1(ax, file):
+    """Draw data, model, and residuals of a single instrument fit into the
+    layout.
+
+    Parameters
+    ----------
+    ax : array of matplotlib.axes.Axes
+        Axes from setup_axes_1.
+    file : str
+        filename in results folder
+
+    Returns
+    -------
+    list
+        The artists and containers that were added.
+    """
+
+    # read in the file, split at the NO NO NO line into data and residuals
+    (data,), (resid,) = read_writefits(paths.data / file)
+
+    # model
+    artists = [ax[0].stairs(data["model [counts/s/keV]"],
+                 np.append(data["E [keV]"].values-data["dE"].values,
+                           data["E [keV]"].values[-1] + data["dE"].values[-1]),
+                 color="white", edgecolor="k", linewidth=2)]
+
+    # flux with errors
+    artists.append(ax[0].errorbar(data["E [keV]"], data["flux [counts/s/keV]"],
+                yerr=data["e_flux"] / 1.644854, fmt=".", markersize=13, alpha=1, c="olive"))
+
+    # residuals
+    artists.append(ax[1].errorbar(resid["E [keV]"], resid["flux [counts/s/keV]"],
+                yerr=resid["e_flux"]/1.644854, fmt=".", markersize=13, c="olive"))
+
     # x limits
     for a in ax:
         first = data["E [keV]"].values[0] - data["dE"].values[0]
         last = data["E [keV]"].values[-1] + data["dE"].values[-1]
         a.set_xlim(first, last)
-        a.set_xscale("log")
 
-    # layout
-    plt.tight_layout()
+    return artists
+
+
+# layout and drawing function of each kind of fit
+LAYOUTS = {"joint": (setup_axes_3, draw_data_resid_3),
+           "single": (setup_axes_1, draw_data_resid_1)}
+
+
+def layout(file):
+    """Get the kind of fit from the filename."""
+    return "joint" if file.split("_")[0] == "joint" else "single"
+
+
+def save(fig, file):
+    """Save the figure of a fit file to the figures folder."""
+
+    # layout, starting from the default margins, because tight_layout
+    # depends on the margins the previous file in a batch left behind
+    fig.subplots_adjust(**{k: plt.rcParams[f"figure.subplot.{k}"]
+                           for k in ("left", "right", "bottom", "top",
+                                     "wspace", "hspace")})
+    fig.tight_layout()
 
     # save to file
     filestub = file.split(".")[0]
-    plt.savefig(paths.figures / f"{filestub}_data_resid.png", dpi=300)
+    fig.savefig(paths.figures / f"{filestub}_data_resid.png", dpi=300)
 
 
-if __name__ == "__main__":
+def plot_data_resid_3(file):
+    """Plot the data, model and residuals of a joint fit in a two panel
+    figure.
+
+    Parameters:
+    ----------
+    file : str
+        filename in results folder
+
+    """
+    fig, ax = setup_axes_3()
+    draw_data_resid_3(ax, file)
+    save(fig, file)
+
+
+def plot_data_resid_1(file):
+    """Plot the data, model and residuals in a two panel figure.
+
+    Parameters:
+    ----------
+    file : str
+        filename in results folder
+
+    """
+    fig, ax = setup_axes_1()
+    draw_data_resid_1(ax, file)
+    save(fig, file)
+
+
+def render_batch(files):
+    """Plot many fit files, building each layout only once.
+
+    Parameters
+    ----------
+    files : list of str
+        filenames in results folder
+    """
+    templates = dict()
+
+    for file in files:
+        kind = layout(file)
+        setup, draw = LAYOUTS[kind]
+
+        # build the layout on first use, else remove the previous file's data
+        if kind not in templates:
+            templates[kind] = (*setup(), [])
+        fig, ax, artists = templates[kind]
+
+        for artist in artists:
+            artist.remove()
+
+        # rescale the y axes to the new data
+        for a in ax:
+            a.relim()
+            a.set_ylim(auto=True)
+            a.autoscale_view(scalex=False)
+
+        artists[:] = draw(ax, file)
+        save(fig, file)
+
+    for fig, _, _ in templates.values():
+        plt.close(fig)
+
+
+def render_files(files, processes=None):
+    """Plot many fit files in parallel worker processes.
+
+    Parameters
+    ----------
+    files : list of str
+        filenames in results folder
+    processes : int
+        Number of worker processes, defaults to the number of cores.
+    """
+    processes = min(len(files), processes or os.cpu_count() or 1)
+
+    if processes <= 1:
+        render_batch(files)
+        return
+
+    # every worker renders a share of the files into its own templates
+    batches = [files[i::processes] for i in range(processes)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        list(executor.map(render_batch, batches))
+
+
+def main(data):
+    """Plot the data and residuals of the XSPEC fits.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data, unused.
+    """
 
     # filename
     # ["pn_onlyflare.txt", "joint_onlyflare.txt", "joint_noflare.txt",
@@ -180,8 +312,9 @@ if __name__ == "__main__":
     files =  ["joint_chain_fit.txt"]
 
     # plot
-    for file in files:
-        if file.split("_")[0] == "joint":
-            plot_data_resid_3(file)
-        else:
-            plot_data_resid_1(file)
\ No newline at end of file
+    render_files(files)
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
@@ -12,21 +12,29 @@ from XMM-Newton, and plots them together.
 """
 
 
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import paths
 
+from datasets import Datasets
 
-if __name__ == "__main__":
+
+def main(data):
+    """Plot the OM and EPIC light curves.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
 
     # read in optical data
-    om = pd.read_csv(paths.data / "timeseries.csv")
+    om = data["timeseries"]
     om.time = om.time / 3600. / 24.
     om.rate = om.rate / np.nanmedian(om.rate)
 
     # read in X-ray data
-    xray = pd.read_csv(paths.data / "corrected_merged_epic_lc.csv")
+    xray = data["corrected_merged_epic_lc"]
     xray["TIME"] = xray["TIME"] / 3600. / 24.
 
     # make the figure
@@ -67,3 +75,8 @@ if __name__ == "__main__":
 
     plt.tight_layout()
     plt.savefig(paths.figures / "lightcurves.png", dpi=300)
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
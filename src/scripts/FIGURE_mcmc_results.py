@@ -16,81 +16,141 @@ T, and plot diagnostic plots, i.e.,
 """
 
 
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from astropy.table import Table
 
 import paths
-import corner
 
-if __name__ == "__main__":
+from chains import BURNIN, iter_chain, to_physical_units
+from convergence import diagnose_chain
+from cornerplot import CornerHistogram, corner_plot
+from datasets import Datasets
+from quantiles import TwoPassQuantiles
 
-    # MCMC RESULTS -------------------------------------------------------------
 
-    # read in the MCMC chains and plot them, extract percentiles and save to file
+# derived columns, in the order of the results dictionary
+COLUMNS = ["kT__1", "norm__16", "EM1", "kT__17", "norm__32", "EM2"]
 
-    subsets = [("full data set", "chain_joint_vapec_feo06.fits","x"),
-            ("quiescent", "chain_joint_vapec_feo06_noflare.fits","o"),
-            ("flaring", "chain_joint_vapec_feo06_flareonly.fits","d"),]
+l10 = np.log(10)
 
-    res = dict()
 
-    for subset, fn, symb in subsets:
+def norm_to_EM_err(norm, norm_err, d, derr):
+    # print(norm, norm_err, d, derr, (norm_err**2 / (norm * l10)**2 + 4 * derr**2 / (l10 * d)**2))
+    return np.sqrt(norm_err**2 / (norm * l10)**2 + 4 * derr**2 / (l10 * d)**2)
 
-        # read in the chain
-        df = Table.read(paths.data / fn, format='fits').to_pandas()
 
-        
-        # discard the first 5000 steps
-        df = df.iloc[5000:]
+def mcmc_subset(subset, fn, symb):
+    """Make the corner plot of one chain and extract its percentiles.
+
+    Parameters
+    ----------
+    subset : str
+        Name of the data subset.
+    fn : str
+        Filename of the chain in the data folder.
+    symb : str
+        Marker symbol of the subset in the diagnostic plots.
+
+    Returns
+    -------
+    dict
+        The 16, 50, and 84 percentiles of the derived columns, and the symbol.
+    """
 
-        norm_to_EM = lambda x: np.log10(1e14 * np.pi * 4. * (13.7 * 3.08567758 * 1e18)**2 * x) #unit cm^-3
-        l10 = np.log(10)
+    # find the burn-in from the trace, but discard at least the first 5000
+    # steps, and the thinning to about one step per autocorrelation time
+    diag = diagnose_chain(paths.data / fn)
+    burnin, thin = max(BURNIN, diag["burnin"]), diag["thin"]
+    print(f"{subset}: burn-in {burnin}, corner plot thinned by {thin}, "
+          f"effective sample size {diag['ess']:.0f}")
 
-        def norm_to_EM_err(norm, norm_err, d, derr):
-            # print(norm, norm_err, d, derr, (norm_err**2 / (norm * l10)**2 + 4 * derr**2 / (l10 * d)**2))
-            return np.sqrt(norm_err**2 / (norm * l10)**2 + 4 * derr**2 / (l10 * d)**2)
+    # first pass: read in the needed columns of the full chain after burn-in
+    # in chunks, and count the values for the quantiles, and get the ranges
+    # of all columns
+    quantiles = TwoPassQuantiles([0.16, 0.5, 0.84])
+    lo, hi = np.full(len(COLUMNS), np.inf), np.full(len(COLUMNS), -np.inf)
+    for chunk in iter_chain(paths.data / fn, burnin=burnin):
 
         # convert units
-        df["EM1"] = norm_to_EM(df["norm__16"])
-        df["EM2"] = norm_to_EM(df["norm__32"])
+        values = to_physical_units(chunk)[COLUMNS].values
 
-        df["norm__16"] = df["norm__16"] * 1e6 # now in 10^-6
-        df["norm__32"] = df["norm__32"] * 1e6 # now in 10^-6
-        
-        df["kT__1"] = df["kT__1"] * 11.604525 # now in MK
-        df["kT__17"] = df["kT__17"] * 11.604525 # now in MK
-
-        # make a corner plot
-        corner.corner(df[["kT__1", "norm__16", "EM1", "kT__17", "norm__32", "EM2"]].values,
-                    labels=[r"$T_1$ [MK]", r"$norm_1 \cdot 10^6$", r"$\log_{10} EM_1$ [cm$^{-3}$]",
-                            r"$T_2$ [MK]",r"$norm_2  \cdot 10^6$", r"$\log_{10} EM_2$ [cm$^{-3}$]"],
-                    quantiles=[0.16, 0.5, 0.84],
-                    show_titles=True,
-                    title_kwargs={"fontsize": 12},)
-                
-        # write to file
-        plt.tight_layout()
-        figname = "corner" + fn[5:-4] + ".png"
-        plt.savefig(paths.figures / figname, dpi=300)
-
-        # caclulate the 0.16, 0.5, 0.84 quantiles and add them to a new dataframe
-        q = np.quantile(df[["kT__1","norm__16", "EM1","kT__17","norm__32","EM2"]].values,
-                        [0.16, 0.5, 0.84], axis=0).T
-        
-        # add the quantiles to the results dictionary
-        res[subset] = dict(zip(["T1_16","T1_50","T1_84",
-                                "norm1_16","norm1_50","norm1_84",
-                                "EM1_16","EM1_50","EM1_84",
-                                "T2_16","T2_50","T2_84",
-                                "norm2_16","norm2_50","norm2_84",
-                                "EM2_16","EM2_50","EM2_84",
-                                "symb"
-                                ],q.flatten()))
-        
-        # add the symbol to the results dictionary
-        res[subset]["symb"] = symb
+        quantiles.update(values)
+        lo = np.fmin(lo, np.nanmin(values, axis=0))
+        hi = np.fmax(hi, np.nanmax(values, axis=0))
+
+    # second pass: keep the values next to the quantiles of the full chain,
+    # and bin the thinned chain for the corner plot
+    hist = CornerHistogram(list(zip(lo, hi)), bins=20)
+    for chunk in iter_chain(paths.data / fn, burnin=burnin):
+        values = to_physical_units(chunk)[COLUMNS].values
+
+        quantiles.collect(values)
+        hist.update(values[(chunk.index.values - burnin) % thin == 0])
+
+    # get the exact 0.16, 0.5, 0.84 quantiles
+    q = quantiles.result()
+
+    # make a corner plot with titles from the quantiles of the full chain
+    corner_plot(hist,
+                labels=[r"$T_1$ [MK]", r"$norm_1 \cdot 10^6$", r"$\log_{10} EM_1$ [cm$^{-3}$]",
+                        r"$T_2$ [MK]",r"$norm_2  \cdot 10^6$", r"$\log_{10} EM_2$ [cm$^{-3}$]"],
+                quantiles=q,
+                title_kwargs={"fontsize": 12},)
+
+    # write to file
+    plt.tight_layout()
+    figname = "corner" + fn[5:-4] + ".png"
+    plt.savefig(paths.figures / figname, dpi=300)
+    plt.close()
+
+    # add the quantiles to the results dictionary
+    res = dict(zip(["T1_16","T1_50","T1_84",
+                    "norm1_16","norm1_50","norm1_84",
+                    "EM1_16","EM1_50","EM1_84",
+                    "T2_16","T2_50","T2_84",
+                    "norm2_16","norm2_50","norm2_84",
+                    "EM2_16","EM2_50","EM2_84",
+                    "symb"
+                    ],q.T.flatten()))
+
+    # add the symbol to the results dictionary
+    res["symb"] = symb
+
+    return res
+
+
+def main(data):
+    """Plot the MCMC results and write mcmc_results.csv.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data, unused.
+    """
+
+    # MCMC RESULTS -------------------------------------------------------------
+
+    # read in the MCMC chains and plot them, extract percentiles and save to file
+
+    subsets = [("full data set", "chain_joint_vapec_feo06.fits","x"),
+            ("quiescent", "chain_joint_vapec_feo06_noflare.fits","o"),
+            ("flaring", "chain_joint_vapec_feo06_flareonly.fits","d"),]
+
+    # one process per subset, or run serially on a single core
+    processes = min(len(subsets), os.cpu_count() or 1)
+
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(mcmc_subset, *zip(*subsets)))
+    else:
+        results = [mcmc_subset(*args) for args in subsets]
+
+    # collect the results in the order of the subsets
+    res = {subset: r for (subset, _, _), r in zip(subsets, results)}
 
     # convert to dataframe
     res = pd.DataFrame(res).T
@@ -198,3 +258,6 @@ if __name__ == "__main__":
     res.to_csv(paths.data / "mcmc_results.csv", index=True)
 
 
+if __name__ == "__main__":
+
+    main(Datasets())
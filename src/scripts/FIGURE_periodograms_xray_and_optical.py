@@ -8,17 +8,34 @@ MIT License
 ---
 
 This script reads in stacked PN and MOS, and optical monitoring light curves 
-from XMM-Newton, calculates periodograms for both, and plots the power spectra.
+from XMM-Newton, calculates periodograms for both, and plots the power spectra
+with false alarm levels from permuted light curves.
 """
 
 
-import lightkurve as lk
-import pandas as pd
 import matplotlib.pyplot as plt
 
 import paths
 
-if __name__ == "__main__":
+from datasets import Datasets
+from fap import resampled_max_power, false_alarm_level, false_alarm_probability
+from periodogram import lombscargle
+
+# number of permuted light curves for the false alarm levels
+N_RESAMPLES = 1000
+
+# false alarm probabilities to mark
+FAPS = [0.01, 0.001]
+
+
+def main(data):
+    """Plot the X-ray and OM periodograms.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
 
     # TIC 277 rotation period in days
     prot = 0.1900125
@@ -27,26 +44,32 @@ if __name__ == "__main__":
     # X-ray periodogram
 
     # read in stacked XMM light curve
-    df = pd.read_csv(paths.data / "stacked_xray_lightcurve.csv")
+    df = data["stacked_xray_lightcurve"]
 
     # get the maximum period 
     time = df.time / 3600. / 24. # convert to days
     max_period = (time.iloc[-1] - time.iloc[0]) / 2.
 
-    # convert to lightkurve object
-    lc = lk.LightCurve(time=df.time / 3600. / 24., flux=df.normalized_flux)
-
     # make periodogram in period space
-    pg = lc.to_periodogram(method='lombscargle', minimum_period=0.01,
-                        maximum_period=max_period, oversample_factor=15) 
+    pg = lombscargle(time, df.normalized_flux, minimum_period=0.01,
+                     maximum_period=max_period, oversample_factor=15)
 
 
 
+    # false alarm levels from permuted light curves on the same grid
+    max_power = resampled_max_power(time, df.normalized_flux, pg.frequency,
+                                    n_resamples=N_RESAMPLES)
+    fap = false_alarm_probability(pg.power.max(), max_power)
+
     # plot periodogram in period
     pg.plot(scale="log")
-    plt.axvline(pg.period_at_max_power.value, c="r",
+    plt.axvline(pg.period_at_max_power, c="r",
                 linestyle="dotted",
-                label=f"period at max. power: {pg.period_at_max_power.value*24:.3f} h")
+                label=f"period at max. power: {pg.period_at_max_power*24:.3f} h "
+                      f"(FAP {fap:.3f})")
+    for p, level in zip(FAPS, false_alarm_level(max_power, FAPS)):
+        plt.axhline(level, c="grey", linestyle="dashed", linewidth=1)
+        plt.annotate(f"FAP {p:.1%}", (0.011, level * 1.05), fontsize=11)
 
     # make vertical lines for rotation period and harmonics
     for fac in [.5, 1, 2, 4, 8, 16]:
@@ -65,24 +88,30 @@ if __name__ == "__main__":
     # optical periodogram
 
     # read in OM data
-    df = pd.read_csv(paths.data / "timeseries.csv")
-
-    # convert to lightkurve object
-    lc = lk.LightCurve(time=df.time / 3600. / 24., flux=df.rate)
+    df = data["timeseries"]
 
     # get the maximum period 
     time = df.time / 3600. / 24.
     max_period = (time.iloc[-1] - time.iloc[0]) / 2.
 
     # make periodogram in period space
-    pg = lc.to_periodogram(method='lombscargle', minimum_period=0.01,
-                        maximum_period=max_period, oversample_factor=35) 
+    pg = lombscargle(time, df.rate, minimum_period=0.01,
+                     maximum_period=max_period, oversample_factor=35)
+
+    # false alarm levels from permuted light curves on the same grid
+    max_power = resampled_max_power(time, df.rate, pg.frequency,
+                                    n_resamples=N_RESAMPLES)
+    fap = false_alarm_probability(pg.power.max(), max_power)
 
     # plot periodogram in period
     pg.plot(scale="log")
-    plt.axvline(pg.period_at_max_power.value, c="r",
+    plt.axvline(pg.period_at_max_power, c="r",
                 linestyle="dotted",
-                label=f"period at max. power: {pg.period_at_max_power.value*24:.3f} h")
+                label=f"period at max. power: {pg.period_at_max_power*24:.3f} h "
+                      f"(FAP {fap:.3f})")
+    for p, level in zip(FAPS, false_alarm_level(max_power, FAPS)):
+        plt.axhline(level, c="grey", linestyle="dashed", linewidth=1)
+        plt.annotate(f"FAP {p:.1%}", (0.011, level * 1.05), fontsize=11)
 
     # make vertical lines for rotation period and harmonics
     for fac in [.5, 1, 2, 4, 8, 16]:
@@ -94,4 +123,9 @@ if __name__ == "__main__":
     plt.legend(fontsize=11, frameon=True, loc=3)
     plt.xlim(0.01, max_period)
 
-    plt.savefig(paths.figures  / "periodogram_om.png", dpi=300)
\ No newline at end of file
+    plt.savefig(paths.figures  / "periodogram_om.png", dpi=300)
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
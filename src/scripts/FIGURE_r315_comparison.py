@@ -13,42 +13,42 @@ Trappist-1, and the four stars with high latitude flares from Ilin et al. 2021.
 
 import paths
 
-import pandas as pd
 import numpy as np
 
-from astropy.table import Table
-
 import matplotlib.pyplot as plt
 
 import adjustText as aT
 
-if __name__ == "__main__":
+from datasets import Datasets
+from energybeta import read_energy_beta
+from flarerate import log_r315
+
+
+def main(data):
+    """Plot R31.5 against rotation period.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
 
     # get Medina et al table
-    df = Table.read(paths.data / "medina2020.fit")
-    df = df.to_pandas()
+    df = data["medina2020"]
 
     # get FFD values
-    ffd_vals = pd.read_csv(paths.data / "tess_ffd.csv")
+    ffd_vals = data["tess_ffd"]
 
     # get rotation periods
-    ilin2021 = pd.read_csv(paths.data / "ilin2021updated_w_Rossby_Lbol.csv")
+    ilin2021 = data["ilin2021"]
 
     ffd_vals = ffd_vals.merge(ilin2021, on="TIC")
 
-    # calculate r315
-    r315s = []
-    for tic, ff in ffd_vals.groupby("TIC"):
-
-        # energy beta
-        with open(paths.data / f"{tic}_energy_beta.txt", "r") as f:
-            beta = float(f.read())
+    # energy beta
+    beta = ffd_vals["TIC"].map(read_energy_beta())
 
-        f315 = beta / (ff.alpha - 1) * (10**31.5)**(-ff.alpha +1)
-        r315s.append(np.log10(f315).values[0])
-
-
-    ffd_vals["r315"] = r315s
+    # calculate r315
+    ffd_vals["r315"] = log_r315(ffd_vals.alpha, beta)
     print(ffd_vals)    
 
 
@@ -111,4 +111,9 @@ if __name__ == "__main__":
     plt.tight_layout()
 
     # save
-    plt.savefig(paths.figures / "r315_prot.png", dpi=300)
\ No newline at end of file
+    plt.savefig(paths.figures / "r315_prot.png", dpi=300)
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
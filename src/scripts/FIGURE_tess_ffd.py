@@ -8,16 +8,19 @@ MIT License
 ---
 
 This script reads in the flare table and FFD fitting results, and plots the FFD
-and power law.
+and power law of every star in the sample with flares and FFD fits. The FFDs
+and power laws of all stars are computed at once, only the plotting loops
+over stars.
 """
 
 
 import paths
 
 import numpy as np
-import pandas as pd
 
-from altaipony.ffd import FFD
+from datasets import Datasets
+from energybeta import write_energy_beta
+from ffd import energy_grid, ffd_table, powerlaw, powerlaw_envelope
 
 import matplotlib.pyplot as plt
 
@@ -71,74 +74,87 @@ import matplotlib.pyplot as plt
 #     return factor.to("erg/s")
 
 
-if __name__ == "__main__":
+def main(data):
+    """Plot the TESS FFDs and write the energy betas.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
 
     tic_teff_rad = [(277539431, 2680, 0.145),
                     (237880881, 3060, 0.275),
                     (452922110, 2680, 0.137),
                     (44984200, 2810, 0.145)]
-    
-    
 
-    for tic, teff, radius in tic_teff_rad[:1]:
+    # TESS band response
+    # tessresp = pd.read_csv(paths.data / "TESS_response.csv")
+
+    # factor = flare_factor(teff, radius, tessresp["WAVELENGTH"].values, tessresp["PASSBAND"].values)
+
+    # get FFD values, the last fit of each star
+    ffd_vals = data["tess_ffd"]
+    ffd_vals = ffd_vals.groupby("TIC").tail(1).set_index("TIC")
+
+    # get flares
+    df = data["tess_flares"]
+
+    # convert ED to E
+    df["ed_rec"] = df["ed_rec"]# * factor
+    df["ed_rec_err"] = df["ed_rec_err"] #* factor
+
+    # make the FFDs of all stars
+    ffds = ffd_table(df)
+
+    # stars with flares and FFD fits
+    tics = [tic for tic, teff, radius in tic_teff_rad
+            if tic in ffd_vals.index and tic in ffds["TIC"].values]
+    fits = ffd_vals.loc[tics]
+
+    # energy range of each FFD
+    edrange = ffds.groupby("TIC")["ed"].agg(["min", "max"]).loc[tics]
+
+    # power law over the range of each FFD
+    x = energy_grid(edrange["min"], edrange["max"], 3)
+    pl = powerlaw(x, fits["alpha"], fits["beta"])
+
+    # OM flare on TIC 277
+    om = data["flare_energies"]
+    om = om[om.instrument == "OM"].iloc[0]
+
+    # power law with uncertainties from the OM flare energy up
+    xom = energy_grid(np.full(len(tics), om.E_erg / 10), edrange["max"] * 2, 10)
+    plom, plom_high, plom_low = powerlaw_envelope(xom, fits)
+
+    for i, tic in enumerate(tics):
 
         print(tic)
 
-        # TESS band response
-        # tessresp = pd.read_csv(paths.data / "TESS_response.csv")
-
-        # factor = flare_factor(teff, radius, tessresp["WAVELENGTH"].values, tessresp["PASSBAND"].values)
-
-        # get FFD values
-        ffd_vals = pd.read_csv(paths.data / "tess_ffd.csv")
-        ffd_vals = ffd_vals[ffd_vals["TIC"] == tic].iloc[-1]
-
-        # get flares
-        df = pd.read_csv(paths.data / "tess_flares.csv")
-        df = df[df["TIC"] == tic]
-
-        # convert ED to E
-        df["ed_rec"] = df["ed_rec"]# * factor
-        df["ed_rec_err"] = df["ed_rec_err"] #* factor
-
-        # make FFD
-        ffd = FFD(df, tot_obs_time=df["tot_obs_time"])
-        ffd.alpha = ffd_vals["alpha"]
-        ffd.beta = ffd_vals["beta"]#.values[0] * factor.value**(ffd.alpha -1)
-        ffd.beta_low_err = ffd_vals["beta_low_err"] #* factor.value**(ffd.alpha -1)
-        ffd.beta_up_err = ffd_vals["beta_up_err"] #* factor.value**(ffd.alpha -1)
-        ffd.alpha_low_err = ffd_vals["alpha_low_err"]
-        ffd.alpha_up_err = ffd_vals["alpha_up_err"]
-        high_alpa, high_beta = ffd.alpha_up_err + ffd.alpha, ffd.beta_up_err + ffd.beta
-        low_alpa, low_beta = ffd.alpha - ffd.alpha_low_err, ffd.beta - ffd.beta_low_err
-        print(ffd.beta, high_beta, low_beta)
-        print(ffd.beta_low_err)
-        ed, freq, counts = ffd.ed_and_freq()
+        fit = fits.loc[tic]
+        print(fit.beta, fit.beta + fit.beta_up_err, fit.beta - fit.beta_low_err)
+        print(fit.beta_low_err)
+
+        ffd = ffds[ffds["TIC"] == tic]
+        ed, freq = ffd["ed"].values, ffd["freq"].values
 
         # plot
         fig, ax = plt.subplots(1,1,figsize=(5.5,4.5))
 
         # make label
-        label = (fr"$\alpha =$ {ffd.alpha:.1f} (+{ffd.alpha_up_err:.1f} "
-                fr"/ -{ffd.alpha_low_err:.1f})")
-        
-        # if TIC 277, add OM flare 
+        label = (fr"$\alpha =$ {fit.alpha:.1f} (+{fit.alpha_up_err:.1f} "
+                fr"/ -{fit.alpha_low_err:.1f})")
+
+        # if TIC 277, add OM flare
         if tic == 277539431:
-            om = pd.read_csv(paths.data / "flare_energies.csv")
-            om = om[om.instrument == "OM"].iloc[0]
-            plt.errorbar([om.E_erg], [om.rate_per_day], 
+            plt.errorbar([om.E_erg], [om.rate_per_day],
                          yerr = [[0.5*om.rate_per_day], [om.rate_per_day]],
-                          xerr=om.eE_erg, c="grey", marker="s", label="OM") 
+                          xerr=om.eE_erg, c="grey", marker="s", label="OM")
 
-            x = np.linspace(om.E_erg/10,np.max(ed)*2,10) #
-            pl = ffd.beta / (ffd.alpha - 1) * x**(- ffd.alpha + 1)
-            pl_high = high_beta / (high_alpa - 1) * x**(- high_alpa + 1)
-            pl_low = low_beta / (low_alpa - 1) * x**(- low_alpa + 1)
-
-            plt.plot(x, pl, linestyle="dashed", c= "olive")
-            plt.fill_between(x, pl_high, pl_low, color="olive", alpha=0.2)
-            plt.plot(x, pl_high, linestyle="dotted", c= "grey", alpha=0.5)
-            plt.plot(x, pl_low, linestyle="dotted", c= "grey", alpha=0.5)
+            plt.plot(xom[i], plom[i], linestyle="dashed", c= "olive")
+            plt.fill_between(xom[i], plom_high[i], plom_low[i], color="olive", alpha=0.2)
+            plt.plot(xom[i], plom_high[i], linestyle="dotted", c= "grey", alpha=0.5)
+            plt.plot(xom[i], plom_low[i], linestyle="dotted", c= "grey", alpha=0.5)
 
             plt.xlim(om.E_erg/10, np.max(ed)*2)
 
@@ -147,7 +163,7 @@ if __name__ == "__main__":
         plt.scatter(ed, freq, c="k", label="TESS")
 
         # power law
-        ffd.plot_powerlaw(ax, c="olive", label=label)
+        ax.plot(x[i], pl[i], c="olive", label=label)
 
         # layout
         plt.legend(loc=1, frameon=False, fontsize=12)
@@ -159,7 +175,12 @@ if __name__ == "__main__":
 
         # save to file
         plt.savefig(paths.figures / f"{tic}_tess_ffd.png", dpi=300)
+        plt.close()
+
+    # save new_beta of all stars
+    write_energy_beta(fits["beta"])
+
+
+if __name__ == "__main__":
 
-        # save new_beta
-        with open(paths.data / f"{tic}_energy_beta.txt", "w") as f:
-            f.write(str(ffd.beta))
\ No newline at end of file
+    main(Datasets())
@@ -12,28 +12,37 @@ three-panel figure.
 """
 
 
-from astropy.table import Table
 import matplotlib.pyplot as plt
 import paths
 
 import numpy as np
-import pandas as pd
 
+from datasets import Datasets
+from lcstore import SECTORS, LightCurveStore
 
-if __name__ == "__main__":
+
+def main(data):
+    """Plot the TESS light curves with their flares.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
 
     # define sectors
-    sectors = 12, 37, 39, 64, 65
+    sectors = SECTORS
 
     # read in light curves
-    lcrs = [Table.read(paths.data / f"tic277539431_tess_detrended_{s}.fits") for s in sectors]
+    store = LightCurveStore()
+    lcrs = [store.sector(s) for s in sectors]
 
     # make three subplots with two light curves each, one showing the flux the other the
     # detrended flux
     fig, axes = plt.subplots(5, 1, figsize=(13, 15))
 
     # read in the flare table
-    df = pd.read_csv(paths.data / "tess_flares.csv")
+    df = data["tess_flares"]
 
     # select the columns we want, sort by time
     sel = df[["tstart", "ampl_rec", 'ed_rec', 'ed_rec_err', 'Sector']].sort_values("tstart")
@@ -74,4 +83,9 @@ if __name__ == "__main__":
     axes[-1].set_xlabel("time [BJD - 2457000]", fontsize=13)
 
     plt.tight_layout()
-    plt.savefig(paths.figures / "tess_lcs.png", dpi=250)
\ No newline at end of file
+    plt.savefig(paths.figures / "tess_lcs.png", dpi=250)
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
@@ -11,9 +11,9 @@ This script reads in the XPEC fit results and derived parameters and produces
 a LaTeX table.
 """
 
-import pandas as pd
 import numpy as np
 import paths
+from datasets import Datasets
 
 def convert_to_scinote(series, rel_err=1e-2):
     """Convert a series to scientific notation.
@@ -79,12 +79,20 @@ def tex_one_err(val, err):
             convert_to_scinote(err) +
             "]$")
 
-if __name__ == "__main__":
 
-    df = pd.read_csv(paths.data / "mcmc_results.csv", index_col=0)
+def main(data):
+    """Write the table of spectral fit results.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
+
+    df = data["mcmc_results"]
 
     # load luminosity from PN data
-    lxs = pd.read_csv(paths.data / "joint_vapec_chain_fits.csv")
+    lxs = data["joint_vapec_chain_fits"]
 
     # get flux and luminosity
     g = lambda x: fr"${x.flux_erg_s_cm2/1e-14:.1f} [{x.flux_erg_s_cm2_err/1e-14:.1f}]$"
@@ -175,4 +183,6 @@ if __name__ == "__main__":
         f.write(string)
 
 
-    
\ No newline at end of file
+if __name__ == "__main__":
+
+    main(Datasets())
@@ -10,13 +10,21 @@ MIT License
 This script reads in the TESS flare table and produces a LaTeX table.
 """
 
-import pandas as pd
 import paths
+from datasets import Datasets
 
-if __name__ == "__main__":
+
+def main(data):
+    """Write the table of TESS flares.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
 
     # read in the flare table
-    df = pd.read_csv(paths.data / "tess_flares.csv")
+    df = data["tess_flares"]
 
     # select the columns we want, sort by time
     sel = df[["tstart", "ampl_rec", 'ed_rec', 'ed_rec_err', 'Sector']].sort_values("tstart")
@@ -50,4 +58,9 @@ if __name__ == "__main__":
 
     # write to file
     with open(paths.output / "tess_flares.tex", "w") as f:
-        f.write(string)
\ No newline at end of file
+        f.write(string)
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
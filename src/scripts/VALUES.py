@@ -26,17 +26,26 @@ Values covered:
 - flare energy OM and EPIC
 """
 
-import pandas as pd
 import numpy as np
 import paths
 
-if __name__ == "__main__":
+from datasets import Datasets
+from flarerate import log_r315
+
+
+def main(data):
+    """Write the values quoted in the text.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
     
 
     # FFD alpha beta -----------------------------------------------------------
 
-    df = pd.read_csv(paths.data / "tess_ffd.csv")
-    row = df[df.TIC == 277539431].iloc[0]
+    row = data.select("tess_ffd", filters=[("TIC", "==", 277539431)]).iloc[0]
 
     # convert alpha and beta results to latex strings with 
     # upper and lower uncertainties for beta convert to log10(beta)
@@ -54,8 +63,7 @@ if __name__ == "__main__":
 
     # R31.5 --------------------------------------------------------------------
 
-    r315 = beta / (alpha - 1) * (10**31.5)**(-alpha +1)
-    r315 = np.log10(r315)
+    r315 = log_r315(alpha, beta)
 
     r315str = f"${r315:.2f}" + r"\,\mathrm{d}^{-1}$"
 
@@ -66,7 +74,7 @@ if __name__ == "__main__":
 
     # Lx -----------------------------------------------------------------------
 
-    df = pd.read_csv(paths.data / "joint_vapec_chain_fits.csv")
+    df = data["joint_vapec_chain_fits"]
 
     # select quiescent data set
     row = df[df.subset == "noflare"].iloc[0]
@@ -105,8 +113,8 @@ if __name__ == "__main__":
 
     # L_bol and L_X / L_bol --------------------------------------------------------------
 
-    ilin2021 = pd.read_csv(paths.data / "ilin2021updated_w_Rossby_Lbol.csv")
-    row = ilin2021[ilin2021.TIC == 277539431].iloc[0]
+    row = data.select("ilin2021", columns=["Lbol_erg_s", "eLbol_erg_s"],
+                      filters=[("TIC", "==", 277539431)]).iloc[0]
     Lbol, eLbol = row.Lbol_erg_s, row.eLbol_erg_s
 
     Lbolstr = fr"$({Lbol/1e30:.1f} \pm {eLbol/1e30:.1f})" + r" \times 10^{30}\,\rm{erg}\,\rm{s}^{-1}$"
@@ -127,8 +135,7 @@ if __name__ == "__main__":
 
     # T1 and T2 ----------------------------------------------------------------
 
-    df = pd.read_csv(paths.data / "mcmc_results.csv")
-    df = df.rename(columns={"Unnamed: 0": "subset"})
+    df = data["mcmc_results"].rename_axis("subset").reset_index()
     row = df[df.subset == "full data set"].iloc[0]
 
     # get T1 and make latex string with a upper and lower uncertainty
@@ -171,7 +178,7 @@ if __name__ == "__main__":
 
     # flare energy OM and EPIC -------------------------------------------------
 
-    epicom = pd.read_csv(paths.data / "flare_energies.csv")
+    epicom = data["flare_energies"]
     epic = epicom[epicom.instrument == "EPIC"].iloc[0]
     om = epicom[epicom.instrument == "OM"].iloc[0]
     E_epic, eE_epic = epic.E_erg, epic.eE_erg
@@ -200,4 +207,9 @@ if __name__ == "__main__":
     print(durstr)
 
     with open(paths.output / "epic_flare_dur.tex", "w") as f:
-        f.write(durstr)
\ No newline at end of file
+        f.write(durstr)
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
@@ -1,10 +1,10 @@
 import numpy as np
-import pandas as pd
 
 import astropy.units as u
 from astropy.constants import R_sun
 
 import paths
+from datasets import Datasets
 
 
 def flare_magnetic_field(em, n0, T):
@@ -63,11 +63,19 @@ def flare_loop_size_from_duration(duration, T, psi=1.2):
     """
     return 0.6 * psi**2 * np.sqrt(T) * duration 
 
-if __name__ == "__main__":
+
+def main(data):
+    """Write the table of EPIC flare loop sizes.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
 
     n0s = np.array([1e11, 1e12, 1e13])
 
-    df = pd.read_csv('../data/mcmc_results.csv', index_col=0)
+    df = data["mcmc_results"]
 
     # use stellar radius as before
     radius = (0.145 * R_sun).to(u.cm).value
@@ -144,4 +152,9 @@ if __name__ == "__main__":
         print(rf'$\Psi={psi:.1f}$')
         ls = flare_loop_size_from_duration(1e3, 0.13 * (T * 1e6)**1.16, psi=psi) * 100
         print(fr"${ls/1e9:.2f} \times 10^9$ cm")
-        print(fr"${ls/radius:.2f} R_*$")
\ No newline at end of file
+        print(fr"${ls/radius:.2f} R_*$")
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
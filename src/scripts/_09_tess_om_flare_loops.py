@@ -5,30 +5,41 @@ import pandas as pd
 from astropy import units as u
 from astropy.constants import mu0, m_e
 
-from astropy.table import Table
 import paths
 
-from scipy.optimize import curve_fit
+from datasets import Datasets
+from flarefit import fit_flares, fit_flares_batched, plot_flare_fits
+from intervals import TimeIndex
+from lcstore import SECTORS, LightCurveStore
 
 
-def exponential_decay(t, t0, tau, ampl):
+# render a diagnostic plot of every flare fit?
+PLOT_FITS = True
 
-    ex = ampl * np.exp(-(t - t0) / tau)
+# fit all flares at once with the vectorised solver, or one by one with
+# curve_fit? The published e-folding times come from curve_fit, the solver
+# is faster but may end in different local minima.
+BATCHED_FIT = False
 
-    ex[t < t0] = 0
 
-    return  ex
+def main(data):
+    """Fit the TESS flares and plot their e-folding times against energy.
 
-if __name__ == "__main__":
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
 
     # define sectors
-    sectors = 12, 37, 39, 64, 65
+    sectors = SECTORS
 
     # read in light curves
-    lcrs = [Table.read(paths.data / f"tic277539431_tess_detrended_{s}.fits") for s in sectors]
+    store = LightCurveStore()
+    lcrs = [store.sector(s) for s in sectors]
 
     # read in the flare table
-    df = pd.read_csv(paths.data / "tess_flares.csv")
+    df = data["tess_flares"]
 
     # delete the largest flare
     df = df.drop(df[df.ed_rec == df.ed_rec.max()].index)
@@ -36,7 +47,7 @@ if __name__ == "__main__":
     # select the columns we want, sort by time
     sel = df[["tstart", "tstop", "ampl_rec", 'ed_rec', 'ed_rec_err', 'Sector']].sort_values("tstart")
 
-    efolds = []
+    flares = []
 
     # loop over axes, light curves and sectors
     for lcr, sector in zip(lcrs, sectors):
@@ -45,61 +56,54 @@ if __name__ == "__main__":
         sel_sector = sel[sel.Sector == sector]
 
         # mask all flares and calculate the median
-        mask = np.ones(len(lcr), dtype=bool)
-        for i, flare in sel_sector.iterrows():
-            mask &= (lcr['TIME'] < flare.tstart - 0.03) | (lcr['TIME'] > flare.tstop + 0.03)
+        time = lcr['TIME']
+        index = TimeIndex(time)
+        mask = ~index.mask(sel_sector.tstart, sel_sector.tstop, pad=0.03)
 
         # calculate the median
         median = np.median(lcr['DETRENDED_FLUX'][mask])
 
-        # divide by the median
-        lcr['DETRENDED_FLUX'] /= median
-
+        # divide by the median, into a new array, the store is read-only
+        flux = lcr['DETRENDED_FLUX'] / median
 
-        # loop over flares
-        for i, flare in sel_sector.iterrows():
 
-            # select the light curve
-            lc = lcr[(lcr['TIME'] > (flare.tstart - 0.03)) & (lcr['TIME'] < (flare.tstop + 0.03))]
+        # index slices of the padded flares and of the flares
+        windows = index.slices(sel_sector.tstart, sel_sector.tstop,
+                               pad=0.03, closed=False)
+        peaks = index.slices(sel_sector.tstart, sel_sector.tstop, closed=False)
 
-            # select the flare
-            lcf = lcr[(lcr['TIME'] > (flare.tstart)) & (lcr['TIME'] < (flare.tstop))]
+        # loop over flares
+        for (i, flare), window, fl in zip(sel_sector.iterrows(), windows, peaks):
 
             # get peak time within tstart and tstop
-            peak_time = lcf['TIME'][np.argmax(lcf['DETRENDED_FLUX'])] 
+            peak_time = time[fl][np.argmax(flux[fl])]
 
 
-            # rename time and flux
-            t, y = lc['TIME'], lc['DETRENDED_FLUX']
+            # select the light curve, rename time and flux
+            t, y = time[window], flux[window]
 
             # assert that the x0 values are within the bounds
             assert flare.tstart < peak_time < flare.tstop
             assert 0 < (flare.tstop-flare.tstart)/2 < 1    
 
-            # fit exponential decay with curve_fit
-            popt, pcov = curve_fit(exponential_decay, t, y-1,
-                                p0=[peak_time, (flare.tstop-flare.tstart)/2, flare.ampl_rec],      
-                                bounds=([flare.tstart-0.99652777778 , 0, flare.ampl_rec * 0.95],
-                                        [flare.tstop+1.00347222222 , 1, flare.ampl_rec * 1.00347]))
-            
-            efolds.append(popt[1])
-
-            plt.figure()
-
-            # plot the fit
-            plt.plot(t, exponential_decay(t, *popt) + 1, label=f"sector {sector} fit")
-            
-
-            # plot the light curve
-            plt.plot(lc['TIME'], lc['DETRENDED_FLUX'], label=f"sector {sector}")
-
-            # plot the flare
-            plt.axvline(flare.tstart, color='r', ls='--')
-            plt.axvline(flare.tstop, color='r', ls='--')
-
-            plt.legend()
-            plt.savefig(paths.figures / f"expfit_flare_{sector}_{i}.png")
-            plt.close()
+            # collect the window for the exponential decay fit
+            flares.append(dict(sector=sector, index=i,
+                               tstart=flare.tstart, tstop=flare.tstop,
+                               t=np.asarray(t), y=np.asarray(y) - 1,
+                               p0=[peak_time, (flare.tstop-flare.tstart)/2, flare.ampl_rec],
+                               bounds=([flare.tstart-0.99652777778 , 0, flare.ampl_rec * 0.95],
+                                       [flare.tstop+1.00347222222 , 1, flare.ampl_rec * 1.00347])))
+
+    # fit exponential decays to all flares
+    if BATCHED_FIT:
+        fits = fit_flares_batched(flares)
+    else:
+        fits = fit_flares(flares)
+    efolds = fits["tau"].values
+
+    # plot the fits after all fitting is done
+    if PLOT_FITS:
+        plot_flare_fits(flares, fits)
 
     df["efold"] = efolds
 
@@ -147,13 +151,10 @@ if __name__ == "__main__":
     handle = plt.scatter([],[], c="olive", label="TIC 277: other TESS flares")
 
     # add in the Maehara + 2021 flares from YZ CMi
-    yzcmi = pd.read_csv(paths.data / "maehara2021_yz_cmi.csv", skiprows=8)
+    yzcmi = data["maehara2021_yz_cmi"]
     
-    # replace "na" with np.nan
-    yzcmi = yzcmi.replace("na", np.nan)
+    # drop flares with missing values, "na" in the table
     yzcmi = yzcmi.dropna()
-    yzcmi["Ebol(erg)"] = yzcmi["Ebol(erg)"].astype(float)
-    yzcmi["eftime(min)"] = yzcmi["eftime(min)"].astype(float)
 
 
     plt.scatter(yzcmi["Ebol(erg)"], yzcmi["eftime(min)"], c="grey", marker='.',
@@ -181,3 +182,8 @@ if __name__ == "__main__":
     plt.legend(loc=4, frameon=True, fontsize=11)
     plt.tight_layout()
     plt.savefig(paths.figures / "tess_flares_B_L_relation.png")
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
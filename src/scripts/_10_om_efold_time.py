@@ -1,30 +1,29 @@
-import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import paths
 from scipy.optimize import curve_fit
 
+from datasets import Datasets
+from flaremodel import ExponentialDecay, exponential_decay
+from intervals import TimeIndex
 
 
-def exponential_decay(t, t0, tau, ampl):
+def main(data):
+    """Fit the decay of the OM flare.
 
-    ex = ampl * np.exp(-(t - t0) / tau)
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
 
-    ex[t < t0] = 0
-
-    return  ex
-
-
-if __name__ == '__main__':
-
-    df = pd.read_csv(paths.data / 'timeseries.csv')
+    df = data["timeseries"]
 
     # calculate the median of the time series
     med = df.median()
 
-    # mask the data to only include the flare and its surroundings
-    mask = (df.time > 7.76075e8) & (df.time < 7.76077e8)
-    df = df[mask]
+    # select only the flare and its surroundings
+    index = TimeIndex(df.time)
+    df = df.iloc[index.slice(7.76075e8, 7.76077e8, closed=False)]
 
     # normalize the data to the median
     t, y = df.time, df.rate / med.rate
@@ -34,7 +33,8 @@ if __name__ == '__main__':
     peaka = df.rate.max() / med.rate - 1
 
     # fit exponential decay with curve_fit
-    popt, pcov = curve_fit(exponential_decay, t, y-1,
+    model = ExponentialDecay(t)
+    popt, pcov = curve_fit(model, t, y-1,
                         p0=[peak, 20, peaka],      
                         bounds=([peak-10 , 1, peaka * 0.95],
                                 [peak+10 , 100, peaka * 1.00347]))
@@ -49,4 +49,9 @@ if __name__ == '__main__':
     plt.savefig(paths.figures / 'OM_exponential_decay.png')
 
     # print e-folding time
-    print('e-folding time [s]:', popt[1])
\ No newline at end of file
+    print('e-folding time [s]:', popt[1])
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
@@ -0,0 +1,45 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This script fits power laws to the TESS FFDs of all stars in the flare table
+at once, and writes alpha, beta, and their uncertainties in the format of
+tess_ffd.csv to tess_ffd_refit.csv. Replace tess_ffd.csv with it to refresh
+the FFD results after adding new sectors.
+"""
+
+
+import paths
+
+from datasets import Datasets
+from ffd import fit_powerlaws
+
+
+def main(data):
+    """Fit power laws to the TESS FFDs of all stars.
+
+    Parameters
+    ----------
+    data : Datasets
+        Tables in src/data.
+    """
+
+    # get flares
+    df = data["tess_flares"]
+
+    # fit all stars
+    res = fit_powerlaws(df)
+
+    print(res)
+
+    res.to_csv(paths.data / "tess_ffd_refit.csv", index=False)
+
+
+if __name__ == "__main__":
+
+    main(Datasets())
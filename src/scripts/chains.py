@@ -0,0 +1,162 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module reads the XSPEC MCMC chains in a streaming fashion. The FITS
+binary table is memory-mapped, only the needed columns are touched, the
+burn-in is skipped without reading it, and the chain is returned in chunks
+of fixed size, so that peak memory does not grow with the chain length.
+"""
+
+import numpy as np
+import pandas as pd
+from astropy.io import fits
+
+
+# chain columns of the two-temperature vapec model
+CHAIN_COLUMNS = ["kT__1", "norm__16", "kT__17", "norm__32"]
+
+# number of steps discarded from the start of each chain
+BURNIN = 5000
+
+# number of steps per chunk
+CHUNKSIZE = 1_000_000
+
+# distance to TIC 277 in pc
+DISTANCE = 13.7
+
+
+def chain_length(path):
+    """Get the number of steps in a chain without reading it.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path to the FITS file with the chain.
+
+    Returns
+    -------
+    int
+        Number of steps in the chain.
+    """
+    with fits.open(path, memmap=True) as hdul:
+        return hdul[1].header["NAXIS2"]
+
+
+def iter_chain(path, columns=CHAIN_COLUMNS, burnin=BURNIN, chunksize=CHUNKSIZE,
+               thin=1):
+    """Iterate over a chain in chunks of fixed size.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path to the FITS file with the chain.
+    columns : list of str
+        Columns to read, all others are never touched.
+    burnin : int
+        Number of steps to skip at the start of the chain.
+    chunksize : int
+        Number of steps per chunk, after thinning.
+    thin : int
+        Keep only every thin-th step after the burn-in.
+
+    Yields
+    ------
+    pd.DataFrame
+        Chunk of the chain with the selected columns in native byte order,
+        indexed by the step number in the chain.
+    """
+    with fits.open(path, memmap=True) as hdul:
+
+        # views into the memory-mapped table, nothing is read yet
+        data = hdul[1].data
+        cols = [data.field(c) for c in columns]
+
+        for start in range(burnin, len(data), chunksize * thin):
+            stop = min(start + chunksize * thin, len(data))
+
+            # copy only this chunk into memory
+            chunk = {c: np.asarray(col[start:stop:thin], dtype=np.float64)
+                     for c, col in zip(columns, cols)}
+
+            yield pd.DataFrame(chunk, index=pd.RangeIndex(start, stop, thin))
+
+
+def norm_to_EM(norm, d=DISTANCE):
+    """Convert the vapec normalization to the emission measure.
+
+    Parameters
+    ----------
+    norm : array-like
+        vapec normalization.
+    d : float
+        Distance in pc.
+
+    Returns
+    -------
+    array-like
+        log10 of the emission measure in cm^-3.
+    """
+    return np.log10(1e14 * np.pi * 4. * (d * 3.08567758 * 1e18)**2 * norm)
+
+
+def to_physical_units(df):
+    """Add emission measures to a chain, and convert kT to MK and norm to
+    units of 10^-6 in place.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Chain, or chunk of a chain, with the vapec columns.
+
+    Returns
+    -------
+    pd.DataFrame
+        The same chain with the EM1 and EM2 columns added.
+    """
+    df["EM1"] = norm_to_EM(df["norm__16"])
+    df["EM2"] = norm_to_EM(df["norm__32"])
+
+    df["norm__16"] = df["norm__16"] * 1e6 # now in 10^-6
+    df["norm__32"] = df["norm__32"] * 1e6 # now in 10^-6
+
+    df["kT__1"] = df["kT__1"] * 11.604525 # now in MK
+    df["kT__17"] = df["kT__17"] * 11.604525 # now in MK
+
+    return df
+
+
+def read_chain(path, columns=CHAIN_COLUMNS, burnin=BURNIN, chunksize=CHUNKSIZE,
+               thin=1):
+    """Read the selected columns of a chain after the burn-in.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path to the FITS file with the chain.
+    columns : list of str
+        Columns to read.
+    burnin : int
+        Number of steps to skip at the start of the chain.
+    chunksize : int
+        Number of steps per chunk.
+    thin : int
+        Keep only every thin-th step after the burn-in.
+
+    Returns
+    -------
+    pd.DataFrame
+        The selected columns of the chain after the burn-in.
+    """
+    chunks = list(iter_chain(path, columns=columns, burnin=burnin,
+                             chunksize=chunksize, thin=thin))
+
+    if len(chunks) == 0:
+        return pd.DataFrame(columns=columns, dtype=np.float64)
+
+    return pd.concat(chunks)
@@ -0,0 +1,348 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module converts the tables declared in datasets.py into a compressed
+columnar format in the cache folder, and reads them back with column
+projection and predicate pushdown.
+
+Each table is split into row groups, one compressed .npz file per group
+with one array per column, so that a read decompresses only the columns it
+asks for. The schema of the table, i.e., its columns and dtypes, the source
+file, and the minimum and maximum of each column in each row group are
+recorded in schema.json. Filters such as ("TIC", "==", 277539431) skip all
+row groups whose range cannot match, before any data are read.
+
+A table is converted on first read, and again when the size or modification
+time of its source file, the declaration in datasets.py, or SCHEMA_VERSION
+change. Each version of a table goes into its own folder, named after a
+hash of its source, and is moved there in one step once it is complete, so
+that concurrent conversions and reads never see a partial or removed
+version. Older versions are removed after a new one is in place.
+
+String columns are stored as fixed-width unicode arrays, so that no pickles
+are involved. Missing values in them are stored as empty strings, with a
+separate mask per column, and restored as NaN on read.
+"""
+
+import hashlib
+import json
+import operator
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import paths
+
+from datasets import DATASETS, read_dataset
+
+
+# version of the store layout, bump when it changes
+SCHEMA_VERSION = 2
+
+# default number of rows per row group
+ROW_GROUP_SIZE = 65536
+
+# comparison of a column with a value, for filters
+OPERATORS = {"==": operator.eq, "!=": operator.ne, "<": operator.lt,
+             "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+             "in": np.isin}
+
+
+def _source(name, folder):
+    """Path, size and modification time of the source file of a table."""
+    path = folder / DATASETS[name]["file"]
+    stat = path.stat()
+    return dict(file=str(path), size=stat.st_size, mtime=stat.st_mtime_ns,
+                spec=repr(sorted(DATASETS[name].items())),
+                version=SCHEMA_VERSION)
+
+
+def _table_dir(name, folder, store):
+    """Folder of the current version of a table."""
+    source = json.dumps(_source(name, folder), sort_keys=True)
+    return store / name / hashlib.sha1(source.encode()).hexdigest()[:16]
+
+
+def _null_key(col):
+    """Key of the missing value mask of a string column in the .npz files."""
+    return f"{col}__null__"
+
+
+def _stat(x):
+    """Minimum and maximum of a column as JSON values, None if undefined."""
+    if x.dtype.kind in "iub":
+        return [x.min().item(), x.max().item()] if len(x) > 0 else None
+    if x.dtype.kind == "f":
+        finite = x[~np.isnan(x)]
+        return [finite.min().item(), finite.max().item()] if len(finite) > 0 else None
+    if x.dtype.kind == "U":
+        # np.minimum has no loop for strings in newer numpy versions
+        x = np.sort(x)
+        return [str(x[0]), str(x[-1])] if len(x) > 0 else None
+    return None
+
+
+def convert(name, folder=paths.data, store=paths.cache / "columnar",
+            row_group_size=ROW_GROUP_SIZE):
+    """Convert a table into row groups of compressed columns. If another
+    process converted the same version of the table first, its conversion
+    is kept.
+
+    Parameters
+    ----------
+    name : str
+        Name of the table, a key of datasets.DATASETS.
+    folder : Path
+        Folder with the tables.
+    store : Path
+        Folder of the columnar tables.
+    row_group_size : int
+        Number of rows per row group.
+
+    Returns
+    -------
+    dict
+        Schema of the table.
+    """
+    target = _table_dir(name, folder, store)
+    df = read_dataset(name, folder)
+
+    # keep an index from the file as a column
+    index = None
+    if not isinstance(df.index, pd.RangeIndex):
+        index = df.index.name or "index"
+        df = df.reset_index()
+
+    columns, nulls = dict(), dict()
+    for col in df.columns:
+        x = df[col].to_numpy()
+        if x.dtype == object:
+            # missing values would turn into the string "nan"
+            null = pd.isna(x)
+            x = np.where(null, "", x).astype(str)
+            if null.any():
+                nulls[col] = null
+        columns[col] = x
+
+    schema = dict(source=_source(name, folder), index=index,
+                  n_rows=len(df),
+                  columns={col: x.dtype.str for col, x in columns.items()},
+                  dtypes={col: str(df[col].dtype) for col in df.columns},
+                  nulls=list(nulls),
+                  row_groups=[])
+
+    tmp = store / name / f"{target.name}.{os.getpid()}.tmp"
+    tmp.mkdir(parents=True)
+
+    for i, start in enumerate(range(0, max(len(df), 1), row_group_size)):
+        rows = slice(start, start + row_group_size)
+        group = {col: x[rows] for col, x in columns.items()}
+        masks = {col: null[rows] for col, null in nulls.items()}
+
+        np.savez_compressed(tmp / f"{i}.npz", **group,
+                            **{_null_key(col): m for col, m in masks.items()})
+
+        # stats and null counts of the values that are not missing
+        stats = {col: _stat(x[~masks[col]] if col in masks else x)
+                 for col, x in group.items()}
+        schema["row_groups"].append(dict(file=f"{i}.npz",
+                                         n_rows=min(row_group_size, len(df) - start),
+                                         stats=stats,
+                                         nulls={col: int(m.sum()) for col, m in masks.items()}))
+
+    with open(tmp / "schema.json", "w") as f:
+        json.dump(schema, f, indent=1)
+
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        # another process converted the same version first
+        shutil.rmtree(tmp)
+        with open(target / "schema.json", "r") as f:
+            schema = json.load(f)
+
+    # remove older versions, but not the conversions still being written
+    for old in (store / name).iterdir():
+        if old != target and not old.name.endswith(".tmp"):
+            shutil.rmtree(old, ignore_errors=True)
+
+    return schema
+
+
+def _open_schema(name, folder, store):
+    """Folder and schema of the current version of a table, converting the
+    table first if needed."""
+    root = _table_dir(name, folder, store)
+
+    if not (root / "schema.json").exists():
+        convert(name, folder=folder, store=store)
+
+    with open(root / "schema.json", "r") as f:
+        return root, json.load(f)
+
+
+def read_schema(name, folder=paths.data, store=paths.cache / "columnar"):
+    """Schema of a table, converting the table first if needed.
+
+    Parameters
+    ----------
+    name : str
+        Name of the table, a key of datasets.DATASETS.
+    folder : Path
+        Folder with the tables.
+    store : Path
+        Folder of the columnar tables.
+
+    Returns
+    -------
+    dict
+        Schema of the table.
+    """
+    return _open_schema(name, folder, store)[1]
+
+
+def _may_match(group, col, op, value):
+    """Whether a row group can match a filter, from the stats of the
+    column."""
+    # missing values are != anything
+    if op == "!=" and group["nulls"].get(col, 0) > 0:
+        return True
+
+    stats = group["stats"][col]
+    if stats is None:
+        return True
+
+    lo, hi = stats
+    if op == "==":
+        return lo <= value <= hi
+    elif op == "!=":
+        return not lo == hi == value
+    elif op == "<":
+        return lo < value
+    elif op == "<=":
+        return lo <= value
+    elif op == ">":
+        return hi > value
+    elif op == ">=":
+        return hi >= value
+    elif op == "in":
+        return any(lo <= v <= hi for v in value)
+
+
+def _read(root, schema, columns, filters):
+    """Read the columns and rows of a table version that match the
+    filters."""
+    nulls = set(schema["nulls"])
+
+    parts = {col: [] for col in columns}
+    masks = {col: [] for col in columns if col in nulls}
+    for group in schema["row_groups"]:
+
+        # skip row groups that cannot match
+        if not all(_may_match(group, col, op, value)
+                   for col, op, value in filters):
+            continue
+
+        with np.load(root / group["file"]) as npz:
+            # each access to npz decompresses the column again
+            arrays = dict()
+
+            def get(key):
+                if key not in arrays:
+                    arrays[key] = npz[key]
+                return arrays[key]
+
+            mask = np.ones(group["n_rows"], dtype=bool)
+            for col, op, value in filters:
+                match = OPERATORS[op](get(col), value)
+                if col in nulls:
+                    null = get(_null_key(col))
+                    match = match | null if op == "!=" else match & ~null
+                mask &= match
+
+            if mask.any():
+                everything = mask.all()
+                for col in columns:
+                    parts[col].append(get(col) if everything else get(col)[mask])
+                    if col in nulls:
+                        null = get(_null_key(col))
+                        masks[col].append(null if everything else null[mask])
+
+    data = dict()
+    for col in columns:
+        if len(parts[col]) == 0:
+            data[col] = np.zeros(0, dtype=schema["columns"][col])
+            continue
+
+        data[col] = np.concatenate(parts[col])
+        if col in nulls:
+            null = np.concatenate(masks[col])
+            if null.any():
+                data[col] = data[col].astype(object)
+                data[col][null] = np.nan
+
+    df = pd.DataFrame(data)
+
+    # restore the pandas dtypes, e.g., object for strings
+    df = df.astype({col: schema["dtypes"][col] for col in columns})
+
+    if schema["index"] is not None:
+        df = df.set_index(schema["index"])
+        if schema["index"] == "index":
+            df.index.name = None
+
+    return df
+
+
+def read_columnar(name, columns=None, filters=None, folder=paths.data,
+                  store=paths.cache / "columnar"):
+    """Read a table from the columnar store.
+
+    Parameters
+    ----------
+    name : str
+        Name of the table, a key of datasets.DATASETS.
+    columns : list of str
+        Columns to read, defaults to all.
+    filters : list of tuple
+        Conditions (column, operator, value) that all rows must fulfill, with
+        operators ==, !=, <, <=, >, >=, and in. Missing values only match
+        !=, as in pandas.
+    folder : Path
+        Folder with the tables.
+    store : Path
+        Folder of the columnar tables.
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    root, schema = _open_schema(name, folder, store)
+    filters = filters or []
+
+    for col, op, _ in filters:
+        if op not in OPERATORS:
+            raise ValueError(f"operator '{op}' not recognized")
+        if col not in schema["columns"]:
+            raise KeyError(f"{name} has no column '{col}'")
+
+    if columns is None:
+        columns = list(schema["columns"])
+    elif schema["index"] is not None and schema["index"] not in columns:
+        columns = [schema["index"], *columns]
+
+    try:
+        return _read(root, schema, columns, filters)
+    except FileNotFoundError:
+        # the source changed during the read, and a new conversion removed
+        # the version we were reading
+        root, schema = _open_schema(name, folder, store)
+        return _read(root, schema, columns, filters)
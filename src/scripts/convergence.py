@@ -0,0 +1,143 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module diagnoses the XSPEC MCMC chains: it finds the burn-in from the
+trace with the MSER-5 rule (White 1997), computes FFT-based integrated
+autocorrelation times with Sokal's automatic window (as in emcee), and from
+them the thinning factor and the effective sample size.
+
+Long chains are diagnosed on a strided subsample of the memory-mapped table,
+so the cost does not grow with the chain length.
+"""
+
+import numpy as np
+
+from chains import CHAIN_COLUMNS, chain_length, read_chain
+
+
+def autocorr_function(x):
+    """Normalized autocorrelation function of a 1D series, using the FFT.
+
+    Parameters
+    ----------
+    x : array-like
+        The series.
+
+    Returns
+    -------
+    np.ndarray
+        Autocorrelation function, 1 at lag 0.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+
+    # zero-pad to a power of two to avoid circular correlation
+    nfft = 2 ** int(np.ceil(np.log2(2 * n)))
+    f = np.fft.rfft(x - x.mean(), n=nfft)
+    acf = np.fft.irfft(f * np.conjugate(f), n=nfft)[:n]
+
+    return acf / acf[0]
+
+
+def integrated_time(x, c=5):
+    """Integrated autocorrelation time of a 1D series.
+
+    Parameters
+    ----------
+    x : array-like
+        The series.
+    c : float
+        Sokal's window constant, the sum over the autocorrelation function
+        stops at the smallest lag M with M >= c * tau(M).
+
+    Returns
+    -------
+    float
+        Integrated autocorrelation time in steps.
+    """
+    taus = 2.0 * np.cumsum(autocorr_function(x)) - 1.0
+
+    m = np.arange(len(taus)) < c * taus
+    window = np.argmin(m) if np.any(~m) else len(taus) - 1
+
+    return taus[window]
+
+
+def find_burnin(x, batch=5):
+    """Find the burn-in of a 1D series with the MSER rule.
+
+    The burn-in is the truncation point d in the first half of the series
+    that minimizes the squared standard error of the mean of the rest,
+    computed on batch means.
+
+    Parameters
+    ----------
+    x : array-like
+        The series.
+    batch : int
+        Size of the batches.
+
+    Returns
+    -------
+    int
+        Number of steps to discard.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    m = len(x) // batch
+
+    # standardize batch means to avoid cancellation in the sums
+    y = x[:m * batch].reshape(m, batch).mean(axis=1)
+    y = (y - y.mean()) / (y.std() or 1.0)
+
+    # sums over y[d:] for all truncation points d
+    s1 = np.cumsum(y[::-1])[::-1]
+    s2 = np.cumsum((y ** 2)[::-1])[::-1]
+    k = np.arange(m, 0, -1)
+
+    mser = (s2 - s1 ** 2 / k) / k ** 2
+
+    return int(np.argmin(mser[:m // 2 + 1])) * batch
+
+
+def diagnose_chain(path, columns=CHAIN_COLUMNS, max_samples=1_000_000):
+    """Find the burn-in, autocorrelation times, thinning, and effective
+    sample size of a chain.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path to the FITS file with the chain.
+    columns : list of str
+        Columns to diagnose.
+    max_samples : int
+        Chains longer than this are diagnosed on every n-th step, and the
+        results are scaled back to steps of the full chain.
+
+    Returns
+    -------
+    dict
+        burnin and thin in steps, tau per column in steps, and the
+        effective sample size ess of the chain after the burn-in.
+    """
+    nsteps = chain_length(path)
+    stride = max(1, int(np.ceil(nsteps / max_samples)))
+
+    df = read_chain(path, columns=columns, burnin=0, thin=stride)
+
+    # burn-in of the slowest column
+    burnin = max(find_burnin(df[c].values) for c in columns)
+
+    tau = {c: integrated_time(df[c].values[burnin:]) * stride for c in columns}
+    burnin *= stride
+
+    # keep about one step per autocorrelation time
+    thin = max(1, int(np.floor(max(tau.values()))))
+    ess = (nsteps - burnin) / max(tau.values())
+
+    return dict(burnin=burnin, thin=thin, tau=tau, ess=ess)
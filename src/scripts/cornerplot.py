@@ -0,0 +1,195 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module makes corner plots of long chains from pre-binned histograms.
+The 1D and 2D histograms are accumulated chunk by chunk with np.histogram and
+np.histogram2d, so the plot costs the same no matter how long the chain is.
+The layout follows corner.corner: step histograms on the diagonal with
+dashed quantile lines and titles, and density with 0.5, 1, 1.5 and 2 sigma
+contours below the diagonal.
+"""
+
+import numpy as np
+
+from lazy import lazy_import
+
+plt = lazy_import("matplotlib.pyplot")
+ticker = lazy_import("matplotlib.ticker")
+
+
+# 2D sigma levels, as in corner.corner
+LEVELS = 1.0 - np.exp(-0.5 * np.arange(0.5, 2.1, 0.5) ** 2)
+
+
+class CornerHistogram:
+    """1D and 2D histograms of all columns and pairs of columns of a chain.
+
+    Parameters
+    ----------
+    ranges : list of tuple
+        (min, max) of each column.
+    bins : int
+        Number of bins per column.
+    """
+
+    def __init__(self, ranges, bins=20):
+        # widen empty ranges, like corner.corner does
+        ranges = [(lo - 0.5, hi + 0.5) if lo == hi else (lo, hi)
+                  for lo, hi in ranges]
+        self.edges = [np.linspace(lo, hi, bins + 1) for lo, hi in ranges]
+        self.ndim = len(ranges)
+        self.hist1d = [np.zeros(bins) for _ in range(self.ndim)]
+        self.hist2d = {(i, j): np.zeros((bins, bins))
+                       for i in range(self.ndim) for j in range(i)}
+
+    def update(self, chunk):
+        """Add a chunk of the chain to the histograms.
+
+        Parameters
+        ----------
+        chunk : array-like
+            Two-dimensional chunk, with steps in rows and parameters in
+            columns.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+
+        for i in range(self.ndim):
+            self.hist1d[i] += np.histogram(chunk[:, i], bins=self.edges[i])[0]
+
+        # x is column j, y is column i
+        for (i, j), h in self.hist2d.items():
+            h += np.histogram2d(chunk[:, j], chunk[:, i],
+                                bins=[self.edges[j], self.edges[i]])[0]
+
+
+def sigma_levels(h, levels=LEVELS):
+    """Find the density thresholds that enclose the given probability mass.
+
+    Parameters
+    ----------
+    h : np.ndarray
+        2D histogram.
+    levels : array-like
+        Enclosed probability mass of each contour.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted density thresholds.
+    """
+    hflat = np.sort(h.ravel())[::-1]
+    cum = np.cumsum(hflat)
+    cum /= cum[-1]
+
+    v = np.array([hflat[cum <= l][-1] if np.any(cum <= l) else hflat[0]
+                  for l in levels])
+    v.sort()
+
+    # contour levels must increase strictly
+    m = np.diff(v) == 0
+    while np.any(m):
+        v[np.where(m)[0][0]] *= 1.0 - 1e-4
+        m = np.diff(v) == 0
+
+    return v
+
+
+def corner_plot(hist, labels, quantiles, title_fmt=".2f", title_kwargs=None,
+                color="k"):
+    """Plot a corner plot from pre-binned histograms.
+
+    Parameters
+    ----------
+    hist : CornerHistogram
+        Histograms of the chain.
+    labels : list of str
+        Axis label of each column.
+    quantiles : np.ndarray
+        Array of shape (3, n_columns) with the 16, 50, and 84 percentiles
+        of each column, computed from the full chain.
+    title_fmt : str
+        Format of the numbers in the titles.
+    title_kwargs : dict
+        Keyword arguments passed to set_title.
+    color : str
+        Color of the histograms and contours.
+
+    Returns
+    -------
+    matplotlib.figure.Figure
+        The figure.
+    """
+    title_kwargs = dict() if title_kwargs is None else title_kwargs
+    K = hist.ndim
+
+    # same dimensions as corner.corner
+    factor = 2.0
+    lbdim, trdim, whspace = 0.5 * factor, 0.2 * factor, 0.05
+    plotdim = factor * K + factor * (K - 1.0) * whspace
+    dim = lbdim + plotdim + trdim
+
+    fig, axes = plt.subplots(K, K, figsize=(dim, dim))
+    lb, tr = lbdim / dim, (lbdim + plotdim) / dim
+    fig.subplots_adjust(left=lb, bottom=lb, right=tr, top=tr,
+                        wspace=whspace, hspace=whspace)
+
+    for i in range(K):
+        for j in range(K):
+            ax = axes[i, j]
+
+            if j > i:
+                ax.set_frame_on(False)
+                ax.set_xticks([])
+                ax.set_yticks([])
+                continue
+
+            if i == j:
+                # 1D histogram with quantiles
+                ax.stairs(hist.hist1d[i], hist.edges[i], color=color)
+                for q in quantiles[:, i]:
+                    ax.axvline(q, ls="dashed", color=color)
+                ax.set_ylim(0, 1.1 * hist.hist1d[i].max())
+
+                q16, q50, q84 = quantiles[:, i]
+                fmt = "{{0:{0}}}".format(title_fmt).format
+                title = r"${{{0}}}_{{-{1}}}^{{+{2}}}$".format(
+                    fmt(q50), fmt(q50 - q16), fmt(q84 - q50))
+                ax.set_title(f"{labels[i]} = {title}", **title_kwargs)
+            else:
+                # 2D density with sigma contours
+                h = hist.hist2d[(i, j)]
+                xe, ye = hist.edges[j], hist.edges[i]
+                v = sigma_levels(h)
+                ax.pcolormesh(xe, ye, np.ma.masked_less(h.T, v[0]),
+                              cmap="Greys", vmin=0, vmax=2 * h.max())
+                xc, yc = (xe[1:] + xe[:-1]) / 2, (ye[1:] + ye[:-1]) / 2
+                ax.contour(xc, yc, h.T, v, colors=color, linewidths=1)
+                ax.set_ylim(ye[0], ye[-1])
+
+            ax.set_xlim(hist.edges[j][0], hist.edges[j][-1])
+
+            # ticks and labels only on the outer axes
+            ax.xaxis.set_major_locator(ticker.MaxNLocator(5, prune="lower"))
+            if i < K - 1:
+                ax.tick_params(axis="x", labelbottom=False)
+            else:
+                ax.tick_params(axis="x", labelrotation=45)
+                ax.set_xlabel(labels[j])
+
+            if i == j:
+                ax.set_yticks([])
+            else:
+                ax.yaxis.set_major_locator(ticker.MaxNLocator(5, prune="lower"))
+                if j > 0:
+                    ax.tick_params(axis="y", labelleft=False)
+                else:
+                    ax.tick_params(axis="y", labelrotation=45)
+                    ax.set_ylabel(labels[i])
+
+    return fig
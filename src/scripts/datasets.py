@@ -0,0 +1,254 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module reads the tables in src/data by name. The paper scripts get their
+tables from a Datasets object passed to their main function, so that all
+scripts that run in one process, see pipeline.py --in-process, share a
+single parsed copy of each table.
+
+Each table is declared once in DATASETS, with the columns the scripts use and
+their dtypes, so that no other columns are parsed or kept in memory, and
+with any other pd.read_csv arguments, e.g., for missing values.
+
+Parsed tables are kept in an in-process LRU cache, keyed on the modification
+time of the file, so that a table is parsed again only if the file changed,
+e.g., mcmc_results.csv after FIGURE_mcmc_results.py. They are also mirrored
+as pickles in the cache folder, so that a new process reads the binary
+mirror instead of parsing the text file. A mirror is invalid once the size
+or modification time of its file, or the declaration of the table, change.
+Tables are handed out as copies, so that scripts can modify them freely.
+
+Datasets.select reads only some columns and rows of a table from the
+columnar store, see columnar.py.
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+
+import pandas as pd
+
+import paths
+
+from lazy import lazy_import
+
+table = lazy_import("astropy.table")
+
+
+# file name, columns with dtypes (None for all columns with inferred dtypes),
+# other pd.read_csv keyword arguments, and whether to drop rows with missing
+# values in any column of the file, of each table
+DATASETS = {
+    "corrected_merged_epic_lc": dict(
+        file="corrected_merged_epic_lc.csv",
+        dtype={"TIME": "float64", "RATE": "float64", "ERROR": "float64"}),
+    "flare_energies": dict(
+        file="flare_energies.csv",
+        dtype={"instrument": "object", "E_erg": "float64", "eE_erg": "float64",
+               "rate_per_day": "float64", "tstart": "float64",
+               "tstop": "float64"}),
+    "ilin2021": dict(
+        file="ilin2021updated_w_Rossby_Lbol.csv",
+        dtype={"TIC": "int64", "Prot_days": "float64", "Lbol_erg_s": "float64",
+               "eLbol_erg_s": "float64"}),
+    "joint_vapec_chain_fits": dict(
+        file="joint_vapec_chain_fits.csv",
+        dtype={"subset": "object", "Lx_erg_s": "float64",
+               "Lx_erg_s_err": "float64", "flux_erg_s_cm2": "float64",
+               "flux_erg_s_cm2_err": "float64"}),
+    "maehara2021_yz_cmi": dict(
+        file="maehara2021_yz_cmi.csv",
+        dtype={"Ebol(erg)": "float64", "eftime(min)": "float64"},
+        kwargs=dict(skiprows=8, na_values=["na"]),
+        dropna=True),
+    "mcmc_results": dict(
+        file="mcmc_results.csv",
+        dtype=None,
+        kwargs=dict(index_col=0)),
+    "medina2020": dict(
+        file="medina2020.fit",
+        dtype={"Mstar": "float64", "Prot": "float64", "Rate": "float64"}),
+    "stacked_xray_lightcurve": dict(
+        file="stacked_xray_lightcurve.csv",
+        dtype={"time": "float64", "normalized_flux": "float64"}),
+    "tess_ffd": dict(
+        file="tess_ffd.csv",
+        dtype={"TIC": "int64", "alpha": "float64", "alpha_low_err": "float64",
+               "alpha_up_err": "float64", "beta": "float64",
+               "beta_low_err": "float64", "beta_up_err": "float64"}),
+    "tess_flares": dict(
+        file="tess_flares.csv",
+        dtype={"TIC": "int64", "Sector": "int64", "tstart": "float64",
+               "tstop": "float64", "ampl_rec": "float64", "ed_rec": "float64",
+               "ed_rec_err": "float64", "tot_obs_time": "float64"}),
+    "timeseries": dict(
+        file="timeseries.csv",
+        dtype={"time": "float64", "rate": "float64"}),
+    "wright2016": dict(
+        file="wright2016.csv",
+        dtype={"V-K(mag)": "float64", "Rotation_period(days)": "float64",
+               "log(Lx/Lbol)": "float64"}),
+}
+
+# number of parsed tables kept in memory
+MAXSIZE = 32
+
+
+def read_dataset(name, folder=paths.data):
+    """Parse a table from its file.
+
+    Parameters
+    ----------
+    name : str
+        Name of the table, a key of DATASETS.
+    folder : Path
+        Folder with the tables.
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    spec = DATASETS[name]
+    dtype, kwargs = spec["dtype"], spec.get("kwargs", dict())
+    path = folder / spec["file"]
+
+    # FITS tables go through astropy
+    if path.suffix == ".fit":
+        df = table.Table.read(path).to_pandas()
+        return df if dtype is None else df[list(dtype)].astype(dtype)
+
+    if dtype is None:
+        df = pd.read_csv(path, **kwargs)
+        return df.dropna() if spec.get("dropna", False) else df
+
+    if spec.get("dropna", False):
+        # missing values in columns that are not kept drop the row, too
+        df = pd.read_csv(path, **kwargs).dropna()
+        return df[list(dtype)].astype(dtype)
+
+    return pd.read_csv(path, usecols=list(dtype), dtype=dtype, **kwargs)[list(dtype)]
+
+
+def _mirror_path(name, path, cache):
+    """Path of the pickle mirror of the current version of a table."""
+    stat = path.stat()
+    spec = repr(sorted(DATASETS[name].items()))
+    key = hashlib.sha1(f"{spec} {stat.st_size} {stat.st_mtime_ns}".encode())
+    return cache / f"{name}.{key.hexdigest()[:16]}.pkl"
+
+
+@lru_cache(maxsize=MAXSIZE)
+def _load(name, folder, mtime, cache):
+    """Read a table from its mirror, or parse it and write the mirror. The
+    modification time is part of the key of the LRU cache only.
+    """
+    if cache is None:
+        return read_dataset(name, folder)
+
+    path = folder / DATASETS[name]["file"]
+    mirror = _mirror_path(name, path, cache)
+
+    if mirror.exists():
+        try:
+            return pd.read_pickle(mirror)
+        except Exception:
+            # e.g., written by another pandas version, parse again
+            pass
+
+    df = read_dataset(name, folder)
+
+    # replace the mirrors of older versions atomically
+    cache.mkdir(parents=True, exist_ok=True)
+    tmp = mirror.with_suffix(f".{os.getpid()}.tmp")
+    df.to_pickle(tmp)
+    os.replace(tmp, mirror)
+    for old in cache.glob(f"{name}.*.pkl"):
+        if old != mirror:
+            old.unlink(missing_ok=True)
+
+    return df
+
+
+def load_dataset(name, folder=paths.data, cache=paths.cache / "datasets"):
+    """Copy of a table, from the in-process cache, the mirror, or the file.
+
+    Parameters
+    ----------
+    name : str
+        Name of the table, a key of DATASETS.
+    folder : Path
+        Folder with the tables.
+    cache : Path or None
+        Folder of the pickle mirrors, None to always parse the file.
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    mtime = (folder / DATASETS[name]["file"]).stat().st_mtime_ns
+    return _load(name, folder, mtime, cache).copy()
+
+
+class Datasets:
+    """Tables in src/data, read on first access and shared afterwards.
+
+    Parameters
+    ----------
+    folder : Path
+        Folder with the tables.
+    cache : Path or None
+        Folder of the pickle mirrors, None to always parse the files.
+    store : Path
+        Folder of the columnar tables, see Datasets.select.
+    """
+
+    def __init__(self, folder=paths.data, cache=paths.cache / "datasets",
+                 store=paths.cache / "columnar"):
+        self.folder = folder
+        self.cache = cache
+        self.store = store
+
+    def __getitem__(self, name):
+        """Copy of a table, see load_dataset.
+
+        Parameters
+        ----------
+        name : str
+            Name of the table, a key of DATASETS.
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        return load_dataset(name, self.folder, self.cache)
+
+    def select(self, name, columns=None, filters=None):
+        """Columns and rows of a table from the columnar store, see
+        columnar.read_columnar.
+
+        Parameters
+        ----------
+        name : str
+            Name of the table, a key of DATASETS.
+        columns : list of str
+            Columns to read, defaults to all.
+        filters : list of tuple
+            Conditions (column, operator, value) that all rows must fulfill,
+            e.g., ("TIC", "==", 277539431).
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        return columnar.read_columnar(name, columns=columns, filters=filters,
+                                      folder=self.folder, store=self.store)
+
+
+# at the end, because columnar.py imports DATASETS and read_dataset from here
+import columnar  # noqa: E402
@@ -0,0 +1,115 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module keeps the FFD intercepts beta in energy units of all stars in a
+single table, energy_beta.csv, indexed by TIC, instead of one text file per
+star. The first line of the table holds the schema version. Updates are
+merged into the table by TIC and written atomically, so readers never see a
+partial file.
+
+If the table does not exist yet, the old {tic}_energy_beta.txt files are
+read once and migrated, on the first read or on the first write, so that an
+update of some stars keeps the betas of all others.
+"""
+
+import os
+
+import pandas as pd
+
+import paths
+
+
+# version of the table layout, bump when the columns change
+SCHEMA_VERSION = 1
+
+# columns of the table
+COLUMNS = ["TIC", "beta"]
+
+
+def _legacy_energy_beta(folder):
+    """Read the old per-star text files.
+
+    Parameters
+    ----------
+    folder : Path
+        Folder with the {tic}_energy_beta.txt files.
+
+    Returns
+    -------
+    pd.Series
+        beta indexed by TIC.
+    """
+    betas = dict()
+    for path in folder.glob("*_energy_beta.txt"):
+        with open(path, "r") as f:
+            betas[int(path.name.split("_")[0])] = float(f.read())
+
+    return pd.Series(betas, name="beta", dtype=float).rename_axis("TIC")
+
+
+def read_energy_beta(path=paths.data / "energy_beta.csv"):
+    """Read beta of all stars.
+
+    Parameters
+    ----------
+    path : Path
+        Path to the table.
+
+    Returns
+    -------
+    pd.Series
+        beta indexed by TIC.
+    """
+    if not path.exists():
+        betas = _legacy_energy_beta(path.parent)
+        if len(betas) > 0:
+            write_energy_beta(betas, path=path)
+        return betas
+
+    with open(path, "r") as f:
+        header = f.readline()
+
+    version = int(header.split(":")[1])
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"{path} has schema version {version}, "
+                         f"expected {SCHEMA_VERSION}.")
+
+    df = pd.read_csv(path, comment="#", dtype={"TIC": int, "beta": float},
+                     float_precision="round_trip")
+
+    return df.set_index("TIC")["beta"]
+
+
+def write_energy_beta(betas, path=paths.data / "energy_beta.csv"):
+    """Write beta of many stars at once, replacing the values of these stars
+    and keeping all others.
+
+    Parameters
+    ----------
+    betas : pd.Series or dict
+        beta indexed by TIC.
+    path : Path
+        Path to the table.
+    """
+    betas = pd.Series(betas, dtype=float)
+
+    if path.exists():
+        old = read_energy_beta(path)
+    else:
+        old = _legacy_energy_beta(path.parent)
+
+    betas = pd.concat([old[~old.index.isin(betas.index)], betas])
+
+    df = betas.sort_index().rename_axis("TIC").rename("beta").reset_index()
+
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        f.write(f"# schema_version: {SCHEMA_VERSION}\n")
+        df[COLUMNS].to_csv(f, index=False)
+    os.replace(tmp, path)
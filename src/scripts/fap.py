@@ -0,0 +1,173 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module estimates false alarm probabilities (FAPs) of periodogram peaks
+from the distribution of the highest peak in periodograms of resampled
+light curves. The fluxes are either permuted, i.e., drawn without
+replacement, or bootstrapped, i.e., drawn with replacement, onto the
+original time stamps, which destroys any periodic signal but keeps the
+sampling and the flux distribution.
+
+All resamples share one frequency grid and one LombScarglePlan, so the
+extirpolation and the trig sums over the time stamps are computed once and
+sent to each worker process once. The workers then compute batches of
+resampled periodograms as columns of a single power call.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from periodogram import LombScarglePlan
+
+
+# plan of the worker process, set by _init_worker
+_PLAN = None
+
+
+def _init_worker(plan):
+    """Keep the plan in the worker process."""
+    global _PLAN
+    _PLAN = plan
+
+
+def _max_power_batch(flux, n, seed, method, normalization):
+    """Highest peak in the periodograms of n resampled flux series.
+
+    Parameters
+    ----------
+    flux : np.ndarray
+        Flux of shape (n_times,).
+    n : int
+        Number of resamples.
+    seed : np.random.SeedSequence
+        Seed of this batch.
+    method : str
+        "permutation" or "bootstrap".
+    normalization : str
+        Normalization of the periodograms, see LombScarglePlan.power.
+
+    Returns
+    -------
+    np.ndarray
+        Highest power of each resample, of shape (n,).
+    """
+    rng = np.random.default_rng(seed)
+
+    if method == "permutation":
+        idx = np.argsort(rng.random((len(flux), n)), axis=0)
+    elif method == "bootstrap":
+        idx = rng.integers(0, len(flux), size=(len(flux), n))
+    else:
+        raise ValueError(f"method='{method}' not recognized")
+
+    power = _PLAN.power(flux[idx], normalization=normalization)
+
+    return power.max(axis=0)
+
+
+def resampled_max_power(time, flux, frequency, n_resamples=1000,
+                        method="permutation", normalization="amplitude",
+                        batch_size=64, processes=None, seed=42,
+                        dtype=np.float64):
+    """Highest periodogram peak of many resampled light curves.
+
+    Parameters
+    ----------
+    time : array-like
+        Time stamps in days.
+    flux : array-like
+        Flux, NaNs are removed with their time stamps.
+    frequency : array-like
+        Regular frequency grid, the same as for the periodogram of the data.
+    n_resamples : int
+        Number of resampled light curves.
+    method : str
+        "permutation" or "bootstrap".
+    normalization : str
+        Normalization of the periodograms, see LombScarglePlan.power.
+    batch_size : int
+        Number of resamples per power call.
+    processes : int
+        Number of worker processes, defaults to the number of cores.
+    seed : int
+        Seed of the random number generator. The result does not depend on
+        the number of processes.
+    dtype : np.float32 or np.float64
+        Precision of the extirpolation and FFT.
+
+    Returns
+    -------
+    np.ndarray
+        Highest power of each resample, of shape (n_resamples,).
+    """
+    time, flux = np.asarray(time, dtype=np.float64), np.asarray(flux, dtype=np.float64)
+    finite = np.isfinite(flux)
+    time, flux = time[finite], flux[finite]
+
+    plan = LombScarglePlan(time, frequency, dtype=dtype)
+
+    sizes = [batch_size] * (n_resamples // batch_size)
+    if n_resamples % batch_size:
+        sizes.append(n_resamples % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(flux, n, s, method, normalization) for n, s in zip(sizes, seeds)]
+
+    processes = min(len(sizes), processes or os.cpu_count() or 1)
+
+    if processes <= 1:
+        _init_worker(plan)
+        results = [_max_power_batch(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(plan,)) as executor:
+            results = list(executor.map(_max_power_batch, *zip(*args)))
+
+    return np.concatenate(results)
+
+
+def false_alarm_level(max_power, fap):
+    """Power that the highest peak of a light curve without signal exceeds
+    with a given probability.
+
+    Parameters
+    ----------
+    max_power : np.ndarray
+        Highest power of each resample, from resampled_max_power.
+    fap : float or array-like
+        False alarm probabilities, e.g., [0.01, 0.001].
+
+    Returns
+    -------
+    float or np.ndarray
+        Power levels.
+    """
+    return np.quantile(max_power, 1. - np.asarray(fap))
+
+
+def false_alarm_probability(power, max_power):
+    """Probability that the highest peak of a light curve without signal
+    reaches a given power.
+
+    Parameters
+    ----------
+    power : float or array-like
+        Power of a peak in the periodogram of the data.
+    max_power : np.ndarray
+        Highest power of each resample, from resampled_max_power.
+
+    Returns
+    -------
+    float or np.ndarray
+        FAPs, at least 1 / (n_resamples + 1).
+    """
+    max_power = np.sort(max_power)
+    n_above = len(max_power) - np.searchsorted(max_power, power, side="left")
+    return (n_above + 1.) / (len(max_power) + 1.)
@@ -0,0 +1,279 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module computes cumulative flare frequency distributions (FFDs) of
+many stars at once, and evaluates power law fits to them, with their
+uncertainty envelopes, vectorised over stars and energies.
+
+The FFDs of all stars come from a single sort of the flare table by star
+and descending energy, as in altaipony's FFD.ed_and_freq without
+corrections: the k-th most energetic flare of a star has a frequency of k
+divided by the total observing time of the star.
+
+The power law fits sample the joint posterior of Wheatland (2004), eq. 24,
+with the same choices as altaipony's FFD.fit_mcmc_powerlaw: uniform priors
+on the flaring probability and on alpha in [1, 3], a detection threshold
+at the smallest flare, and predictions above ten times the largest flare
+within the observing time. Instead of one emcee run per star, a random
+walk Metropolis sampler runs many chains of all stars at once, starting
+from the closed-form maximum likelihood alpha. It samples the log-rate of
+flares above the threshold instead of the probability, which makes the
+posterior nearly uncorrelated, and transforms back to beta.
+"""
+
+import numpy as np
+import pandas as pd
+
+from flarerate import flare_rate
+
+
+def ffd_table(flares, by="TIC", col="ed_rec", time_col="tot_obs_time"):
+    """Cumulative FFDs of all stars in a flare table.
+
+    Parameters
+    ----------
+    flares : pd.DataFrame
+        Flare table with one row per flare.
+    by : str
+        Column that identifies the star.
+    col : str
+        Column with the flare energies or EDs.
+    time_col : str
+        Column with the total observing time of the star.
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns by, "ed", "freq", and "count" (number of flares with at least
+        this energy), sorted by star and descending energy.
+    """
+    key = flares[by].values
+    ed = flares[col].values.astype(np.float64)
+    tobs = flares[time_col].values.astype(np.float64)
+
+    # sort by star, then by descending energy, NaNs last
+    order = np.lexsort((-ed, key))
+    key, ed, tobs = key[order], ed[order], tobs[order]
+
+    # rank of each flare within its star
+    start = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    count = np.arange(1, len(key) + 1) - np.repeat(start, np.diff(np.r_[start, len(key)]))
+
+    return pd.DataFrame({by: key, "ed": ed, "freq": count / tobs,
+                         "count": count})
+
+
+def _star_statistics(flares, by, col, time_col):
+    """Sufficient statistics of the posterior of each star.
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by star, with the number of flares n, the threshold
+        threshed, the energy mined to predict flares above, the sum of
+        ln(ed / threshed) PI, and the observing time tobs.
+    """
+    f = flares[[by, col, time_col]].dropna()
+    g = f.groupby(by)
+
+    stats = pd.DataFrame({"n": g[col].size(), "threshed": g[col].min(),
+                          "mined": 10. * g[col].max(),
+                          "tobs": g[time_col].first()})
+
+    logs = np.log(f[col].values / stats["threshed"].loc[f[by]].values)
+    stats["PI"] = pd.Series(logs).groupby(f[by].values).sum()
+
+    return stats
+
+
+def log_posterior(v, alpha, n, PI, L):
+    """Joint log posterior of Wheatland (2004), eq. 24, up to a constant,
+    in terms of v = ln(rate above threshed * observing time) and alpha, for
+    predictions within the observing time.
+
+    Parameters
+    ----------
+    v, alpha : np.ndarray
+        Parameters, of shape (n_stars, n_chains).
+    n, PI, L : np.ndarray
+        Number of flares, sum of ln(ed / threshed), and ln(mined /
+        threshed) of each star, of shape (n_stars, 1).
+
+    Returns
+    -------
+    np.ndarray
+        Log posterior, -inf outside the prior.
+    """
+    # u = ln(-ln(1 - eps)), the expected number of flares above mined
+    u = v - (alpha - 1.) * L
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lp = (n * u + n * np.log(alpha - 1.) + alpha * ((n + 1.) * L - PI)
+              - (np.exp(v) - np.exp(u))
+              # Jacobian of eps -> u
+              + u - np.exp(u))
+
+    return np.where((alpha > 1.) & (alpha <= 3.), lp, -np.inf)
+
+
+def fit_powerlaws(flares, by="TIC", col="ed_rec", time_col="tot_obs_time",
+                  nchains=32, nsteps=3000, burnin=1000, seed=42):
+    """Fit power laws to the FFDs of all stars at once, sampling the
+    posterior of each star with many random walk Metropolis chains.
+
+    Parameters
+    ----------
+    flares : pd.DataFrame
+        Flare table with one row per flare.
+    by : str
+        Column that identifies the star.
+    col : str
+        Column with the flare energies or EDs.
+    time_col : str
+        Column with the total observing time of the star.
+    nchains : int
+        Number of chains per star.
+    nsteps : int
+        Number of steps per chain.
+    burnin : int
+        Number of steps to discard at the start of each chain.
+    seed : int
+        Seed of the random number generator.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per star with the columns of tess_ffd.csv: by, alpha,
+        alpha_low_err, alpha_up_err, beta, beta_low_err, beta_up_err, and
+        the number of flares n and the MLE alpha_mle. Stars with fewer than
+        three flares are skipped.
+    """
+    rng = np.random.default_rng(seed)
+
+    stats = _star_statistics(flares, by, col, time_col)
+    stats = stats[stats["n"] > 2].copy()
+
+    # closed-form MLE of alpha, 1 + n / sum(ln(ed / threshed))
+    stats["alpha_mle"] = 1. + stats["n"] / stats["PI"]
+
+    n, PI = stats["n"].values[:, None], stats["PI"].values[:, None]
+    L = np.log(stats["mined"].values / stats["threshed"].values)[:, None]
+
+    # start at the MLE, clipped into the prior, and the observed rate
+    a0 = np.clip(stats["alpha_mle"].values, 1.01, 2.99)[:, None]
+    alpha = a0 + 1e-3 * rng.standard_normal((len(stats), nchains))
+    v = np.log(n) + 1e-3 * rng.standard_normal((len(stats), nchains))
+    lp = log_posterior(v, alpha, n, PI, L)
+
+    # proposal widths from the expected posterior widths
+    sv = 2.4 / np.sqrt(2.) / np.sqrt(n)
+    sa = 2.4 / np.sqrt(2.) * (a0 - 1.) / np.sqrt(n)
+
+    samples = np.empty((2, len(stats), nchains, nsteps - burnin))
+
+    for i in range(nsteps):
+
+        vp = v + sv * rng.standard_normal(v.shape)
+        ap = alpha + sa * rng.standard_normal(alpha.shape)
+        lpp = log_posterior(vp, ap, n, PI, L)
+
+        # proposals outside the prior are rejected
+        with np.errstate(invalid="ignore"):
+            accept = np.log(rng.random(lp.shape)) < lpp - lp
+        v, alpha, lp = (np.where(accept, vp, v), np.where(accept, ap, alpha),
+                        np.where(accept, lpp, lp))
+
+        if i >= burnin:
+            samples[:, :, :, i - burnin] = v, alpha
+
+    v, alpha = samples.reshape(2, len(stats), -1)
+
+    # beta from the rate above threshed, per unit observing time
+    rate = np.exp(v) / stats["tobs"].values[:, None]
+    beta = rate * (alpha - 1.) * np.power(stats["threshed"].values[:, None],
+                                          alpha - 1.)
+
+    res = pd.DataFrame({by: stats.index.values})
+    for name, x in [("alpha", alpha), ("beta", beta)]:
+        lo, mid, hi = np.percentile(x, [16, 50, 84], axis=1)
+        res[name] = mid
+        res[f"{name}_low_err"] = mid - lo
+        res[f"{name}_up_err"] = hi - mid
+
+    res["n"] = stats["n"].values
+    res["alpha_mle"] = stats["alpha_mle"].values
+
+    return res
+
+
+def energy_grid(lo, hi, n=10):
+    """Linear energy grid per star.
+
+    Parameters
+    ----------
+    lo, hi : array-like
+        Lower and upper end of the grid of each star.
+    n : int
+        Number of points.
+
+    Returns
+    -------
+    np.ndarray
+        Grid of shape (n_stars, n).
+    """
+    return np.linspace(np.asarray(lo, dtype=np.float64),
+                       np.asarray(hi, dtype=np.float64), n, axis=-1)
+
+
+def powerlaw(x, alpha, beta):
+    """Cumulative power law frequency above x.
+
+    Parameters
+    ----------
+    x : array-like
+        Energies, of shape (n_stars, n_energies) or (n_energies,).
+    alpha, beta : array-like
+        Power law exponent and intercept, of shape (n_stars,) or scalar.
+
+    Returns
+    -------
+    np.ndarray
+        Frequencies, broadcast to shape (n_stars, n_energies).
+    """
+    alpha = np.asarray(alpha, dtype=np.float64)[..., None]
+    beta = np.asarray(beta, dtype=np.float64)[..., None]
+    return flare_rate(x, alpha, beta)
+
+
+def powerlaw_envelope(x, fits):
+    """Power law and its uncertainty envelope, spanned by shifting alpha and
+    beta together to their upper and lower uncertainties.
+
+    Parameters
+    ----------
+    x : array-like
+        Energies, of shape (n_stars, n_energies) or (n_energies,).
+    fits : pd.DataFrame
+        One row per star with the columns alpha, alpha_low_err,
+        alpha_up_err, beta, beta_low_err, and beta_up_err.
+
+    Returns
+    -------
+    pl, pl_high, pl_low : np.ndarray
+        Frequencies of shape (n_stars, n_energies).
+    """
+    alpha, beta = fits["alpha"].values, fits["beta"].values
+
+    pl = powerlaw(x, alpha, beta)
+    pl_high = powerlaw(x, alpha + fits["alpha_up_err"].values,
+                       beta + fits["beta_up_err"].values)
+    pl_low = powerlaw(x, alpha - fits["alpha_low_err"].values,
+                      beta - fits["beta_low_err"].values)
+
+    return pl, pl_high, pl_low
@@ -0,0 +1,364 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module fits exponential decays to many flares, either one by one with
+curve_fit over a process pool, or all at once with a Levenberg-Marquardt
+solver that is vectorised over the flares, and collects the results in a
+table with one row per flare: best-fit t0, tau, and ampl, their
+covariances, and the fit status. Diagnostic plots of the
+fits are optional, and rendered in a separate pass after all fits are done.
+
+Each flare is passed as a dict with the keys
+
+- "sector" and "index": identifiers of the flare,
+- "tstart" and "tstop": flare start and stop times,
+- "t" and "y": time and normalized flux minus 1 of the fitted window,
+- "p0": initial guess of (t0, tau, ampl),
+- "bounds": lower and upper bounds of (t0, tau, ampl).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import paths
+
+from flaremodel import ExponentialDecay, exponential_decay
+from lazy import lazy_import
+
+plt = lazy_import("matplotlib.pyplot")
+optimize = lazy_import("scipy.optimize")
+
+
+# fit parameters
+PARAMS = ["t0", "tau", "ampl"]
+
+# unique elements of the covariance matrix
+COVARIANCES = [f"cov_{p}_{q}" for i, p in enumerate(PARAMS) for q in PARAMS[i:]]
+
+
+def _fit_gap(model, flare, k, p0):
+    """Fit with the analytic Jacobian, and t0 bounded to the gap between
+    the cadences k - 1 and k, where the model is smooth.
+
+    Returns
+    -------
+    cost : float
+        Half the sum of squared residuals at the best fit, infinite if the
+        gap is outside the bounds of t0.
+    popt, pcov : np.ndarray
+        Best-fit parameters and their covariance, as from curve_fit.
+    """
+    t = flare["t"]
+    lb, ub = (np.array(b, dtype=np.float64) for b in flare["bounds"])
+
+    # t0 in (t[k - 1], t[k]] covers the cadences from k on
+    lb[0] = max(lb[0], np.nextafter(t[k - 1], np.inf) if k > 0 else -np.inf)
+    ub[0] = min(ub[0], t[k])
+    if lb[0] >= ub[0]:
+        return np.inf, None, None
+
+    popt, pcov = optimize.curve_fit(model, t, flare["y"], jac=model.jac,
+                                    p0=np.clip(p0, lb, ub), bounds=(lb, ub))
+    cost = 0.5 * np.sum((model(t, *popt) - flare["y"])**2)
+
+    return cost, popt, pcov
+
+
+def _fit_by_gaps(model, flare):
+    """Fit with the analytic Jacobian, one gap between cadences at a time,
+    starting from the gap of the initial t0, and moving to a neighbouring
+    gap as long as that lowers the cost."""
+    k = int(np.searchsorted(flare["t"], flare["p0"][0]))
+    cost, popt, pcov = _fit_gap(model, flare, k, flare["p0"])
+    if popt is None:
+        raise ValueError("Initial t0 is outside the bounds.")
+
+    tried = {k}
+    while True:
+        gaps = [g for g in (k - 1, k + 1)
+                if 0 <= g < len(flare["t"]) and g not in tried]
+        tried.update(gaps)
+
+        fits = [(_fit_gap(model, flare, g, popt), g) for g in gaps]
+        better = [(fit, g) for fit, g in fits if fit[0] < cost]
+        if len(better) == 0:
+            return popt, pcov
+
+        (cost, popt, pcov), k = min(better, key=lambda b: b[0][0])
+
+
+def fit_flare(flare, jac=False):
+    """Fit an exponential decay to a single flare.
+
+    Parameters
+    ----------
+    flare : dict
+        Flare window, see module docstring.
+    jac : bool
+        Use the analytic Jacobian instead of finite differences. It cannot
+        see the jump of the model at t0, so t0 is held between two
+        cadences in each fit, and moved to the neighbouring gaps as long
+        as that lowers the cost.
+
+    Returns
+    -------
+    dict
+        Identifiers, best-fit parameters, covariances, and status ("ok" or
+        the error message) of the fit.
+    """
+    res = dict(sector=flare["sector"], index=flare["index"])
+
+    model = ExponentialDecay(flare["t"])
+
+    try:
+        if jac:
+            popt, pcov = _fit_by_gaps(model, flare)
+        else:
+            popt, pcov = optimize.curve_fit(model, flare["t"], flare["y"],
+                                            p0=flare["p0"],
+                                            bounds=flare["bounds"])
+        res["status"] = "ok"
+    except (RuntimeError, ValueError) as err:
+        popt, pcov = np.full(3, np.nan), np.full((3, 3), np.nan)
+        res["status"] = str(err)
+
+    res.update(zip(PARAMS, popt))
+    res.update(zip(COVARIANCES, pcov[np.triu_indices(3)]))
+
+    return res
+
+
+def fit_flares(flares, processes=None, jac=False):
+    """Fit exponential decays to many flares in parallel.
+
+    Parameters
+    ----------
+    flares : list of dict
+        Flare windows, see module docstring.
+    processes : int
+        Number of worker processes, defaults to the number of cores.
+    jac : bool
+        Use the analytic Jacobian, see fit_flare.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per flare, in the order of the input.
+    """
+    processes = min(len(flares), processes or os.cpu_count() or 1)
+
+    if processes <= 1:
+        results = [fit_flare(flare, jac=jac) for flare in flares]
+    else:
+        chunksize = max(1, len(flares) // (4 * processes))
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(partial(fit_flare, jac=jac), flares,
+                                        chunksize=chunksize))
+
+    return pd.DataFrame(results, columns=["sector", "index", *PARAMS,
+                                          *COVARIANCES, "status"])
+
+
+def pack_flares(flares):
+    """Stack the flare windows into padded arrays.
+
+    Parameters
+    ----------
+    flares : list of dict
+        Flare windows, see module docstring.
+
+    Returns
+    -------
+    t, y : np.ndarray
+        Time and flux of shape (n_flares, max. window length), padded with
+        the last time stamp and zero flux.
+    w : np.ndarray
+        Weights of the same shape, 1 inside the window, 0 in the padding.
+    """
+    n = np.array([len(flare["t"]) for flare in flares])
+    t, y = np.zeros((2, len(flares), n.max()))
+    w = np.arange(n.max()) < n[:, None]
+
+    for i, flare in enumerate(flares):
+        t[i, :n[i]], y[i, :n[i]] = flare["t"], flare["y"]
+        t[i, n[i]:] = flare["t"][-1]
+
+    return t, y, w.astype(np.float64)
+
+
+def _batched_residuals(x, t, y, w):
+    """Weighted residuals of the exponential decay of every flare, where x
+    has shape (n_flares, 3)."""
+    t0, tau, ampl = x[:, :1], x[:, 1:2], x[:, 2:]
+    model = ampl * np.exp(-np.maximum(t - t0, 0.) / tau)
+    model[t < t0] = 0.
+    return (model - y) * w
+
+
+def _batched_jacobian(x, r, t, y, w, ub):
+    """Forward difference Jacobian of the residuals, with shape
+    (n_flares, window length, 3), stepping like scipy's "2-point" scheme,
+    and backwards where a step would leave the upper bound."""
+    jac = np.empty(r.shape + (3,))
+    h = np.sqrt(np.finfo(np.float64).eps) * np.maximum(1., np.abs(x))
+    h = np.where(x + h > ub, -h, h)
+
+    for k in range(3):
+        xk = x.copy()
+        xk[:, k] += h[:, k]
+        jac[..., k] = (_batched_residuals(xk, t, y, w) - r) / h[:, k:k + 1]
+
+    return jac
+
+
+def fit_flares_batched(flares, max_iter=200, ftol=1e-8, xtol=1e-8):
+    """Fit exponential decays to all flares at once, with a Levenberg-
+    Marquardt solver that is vectorised over the flares. Bounds are imposed
+    by projecting every step onto them.
+
+    Parameters
+    ----------
+    flares : list of dict
+        Flare windows, see module docstring.
+    max_iter : int
+        Maximum number of iterations.
+    ftol, xtol : float
+        Tolerances for the relative change of cost and parameters.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per flare, in the order of the input, as from fit_flares.
+    """
+    t, y, w = pack_flares(flares)
+    x = np.array([flare["p0"] for flare in flares], dtype=np.float64)
+    lb, ub = np.array([flare["bounds"] for flare in flares],
+                      dtype=np.float64).transpose(1, 0, 2)
+    x = np.clip(x, lb, ub)
+
+    r = _batched_residuals(x, t, y, w)
+    cost = 0.5 * np.einsum("ij,ij->i", r, r)
+    lam = np.full(len(flares), 1e-3)
+    active = np.ones(len(flares), dtype=bool)
+
+    for _ in range(max_iter):
+
+        a = np.flatnonzero(active)
+        if len(a) == 0:
+            break
+
+        jac = _batched_jacobian(x[a], r[a], t[a], y[a], w[a], ub[a])
+        jtj = np.einsum("ijk,ijl->ikl", jac, jac)
+        grad = np.einsum("ijk,ij->ik", jac, r[a])
+
+        # damped normal equations, scaled by the diagonal
+        diag = np.einsum("ikk->ik", jtj)
+        damped = jtj.copy()
+        damped[:, np.arange(3), np.arange(3)] += lam[a, None] * np.maximum(diag, 1e-30)
+
+        try:
+            step = -np.linalg.solve(damped, grad[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            # singular for some flare, fall back to least squares per flare
+            step = np.stack([-np.linalg.lstsq(d, g, rcond=None)[0]
+                             for d, g in zip(damped, grad)])
+
+        xnew = np.clip(x[a] + step, lb[a], ub[a])
+        rnew = _batched_residuals(xnew, t[a], y[a], w[a])
+        costnew = 0.5 * np.einsum("ij,ij->i", rnew, rnew)
+
+        # accept improving steps and relax the damping, else damp harder
+        better = costnew < cost[a]
+        dx = np.abs(xnew - x[a]).max(axis=1)
+        dcost = cost[a] - costnew
+
+        acc = a[better]
+        x[acc], r[acc], cost[acc] = xnew[better], rnew[better], costnew[better]
+        lam[a] = np.where(better, lam[a] / 10, lam[a] * 10)
+
+        # a rejected step is not a converged one, however small
+        converged = ((better & (dcost <= ftol * costnew)) |
+                     (better & (dx <= xtol * (xtol + np.abs(x[a]).max(axis=1)))) |
+                     (lam[a] > 1e16))
+        active[a[converged]] = False
+
+    # covariance as in curve_fit, scaled by the reduced chi-square, and
+    # undefined for windows with no more points than parameters
+    jac = _batched_jacobian(x, r, t, y, w, ub)
+    jtj = np.einsum("ijk,ijl->ikl", jac, jac)
+    dof = w.sum(axis=1) - 3
+    chi2 = np.where(dof > 0, 2 * cost / np.maximum(dof, 1), np.nan)
+    pcov = np.linalg.pinv(jtj) * chi2[:, None, None]
+
+    res = pd.DataFrame({"sector": [flare["sector"] for flare in flares],
+                        "index": [flare["index"] for flare in flares]})
+    res[PARAMS] = x
+    res[COVARIANCES] = pcov[(slice(None),) + np.triu_indices(3)]
+    res["status"] = np.where(active, "Optimal parameters not found: "
+                             "number of iterations exceeded max_iter", "ok")
+
+    return res
+
+
+def plot_flare_fit(flare, popt):
+    """Plot the fit of a single flare and save it to the figures folder.
+
+    Parameters
+    ----------
+    flare : dict
+        Flare window, see module docstring.
+    popt : array-like
+        Best-fit t0, tau, and ampl.
+    """
+    sector, t = flare["sector"], flare["t"]
+
+    plt.figure()
+
+    # plot the fit
+    plt.plot(t, exponential_decay(t, *popt) + 1, label=f"sector {sector} fit")
+
+    # plot the light curve
+    plt.plot(t, flare["y"] + 1, label=f"sector {sector}")
+
+    # plot the flare
+    plt.axvline(flare["tstart"], color='r', ls='--')
+    plt.axvline(flare["tstop"], color='r', ls='--')
+
+    plt.legend()
+    plt.savefig(paths.figures / f"expfit_flare_{sector}_{flare['index']}.png")
+    plt.close()
+
+
+def plot_flare_fits(flares, fits, processes=None):
+    """Plot the fits of many flares in parallel, skipping failed fits.
+
+    Parameters
+    ----------
+    flares : list of dict
+        Flare windows, see module docstring.
+    fits : pd.DataFrame
+        Results from fit_flares, in the same order as flares.
+    processes : int
+        Number of worker processes, defaults to the number of cores.
+    """
+    ok = (fits.status == "ok").values
+    flares = [flare for flare, o in zip(flares, ok) if o]
+    popts = list(fits.loc[ok, PARAMS].values)
+
+    processes = min(len(flares), processes or os.cpu_count() or 1)
+
+    if processes <= 1:
+        list(map(plot_flare_fit, flares, popts))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            list(executor.map(plot_flare_fit, flares, popts))
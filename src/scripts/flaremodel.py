@@ -0,0 +1,133 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module contains the exponential flare decay model shared by the TESS
+and OM flare fits, and its analytic Jacobian. Both can write into
+preallocated buffers, and ExponentialDecay keeps one set of buffers per
+flare window, so that curve_fit or least_squares do not allocate new
+arrays in every iteration.
+
+The analytic Jacobian only covers the smooth part of the model. The jump at
+t0 is invisible to it, so it is exact only while t0 stays between the same
+two cadences, see flarefit.fit_flare with jac=True.
+"""
+
+import numpy as np
+
+
+def exponential_decay(t, t0, tau, ampl, out=None, mask=None):
+    """Exponential decay that starts at t0, and is zero before.
+
+    Parameters
+    ----------
+    t : array-like
+        Time.
+    t0 : float
+        Start time of the decay.
+    tau : float
+        e-folding time.
+    ampl : float
+        Amplitude at t0.
+    out : np.ndarray
+        Buffer for the result, same shape as t.
+    mask : np.ndarray
+        Boolean buffer, same shape as t.
+
+    Returns
+    -------
+    np.ndarray
+        Model at t.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    out = np.empty_like(t) if out is None else out
+    mask = np.empty(t.shape, dtype=bool) if mask is None else mask
+
+    np.less(t, t0, out=mask)
+
+    # clip at t0 to avoid overflows before the decay starts
+    np.subtract(t, t0, out=out)
+    np.maximum(out, 0., out=out)
+    np.multiply(out, -1. / tau, out=out)
+    np.exp(out, out=out)
+    np.multiply(out, ampl, out=out)
+    np.putmask(out, mask, 0.)
+
+    return out
+
+
+def exponential_decay_jac(t, t0, tau, ampl, out=None, mask=None):
+    """Jacobian of the exponential decay with respect to t0, tau, and ampl.
+
+    Parameters
+    ----------
+    t : array-like
+        Time.
+    t0, tau, ampl : float
+        Model parameters, see exponential_decay.
+    out : np.ndarray
+        Buffer for the result, shape (len(t), 3).
+    mask : np.ndarray
+        Boolean buffer, same shape as t.
+
+    Returns
+    -------
+    np.ndarray
+        Partial derivatives at t, with shape (len(t), 3).
+    """
+    t = np.asarray(t, dtype=np.float64)
+    # column-major, so that each derivative is contiguous
+    out = np.empty((3, len(t))).T if out is None else out
+    mask = np.empty(t.shape, dtype=bool) if mask is None else mask
+    dt0, dtau, dampl = out[:, 0], out[:, 1], out[:, 2]
+
+    np.less(t, t0, out=mask)
+
+    # time since t0, clipped at 0
+    np.subtract(t, t0, out=dtau)
+    np.maximum(dtau, 0., out=dtau)
+
+    # d/dampl = exp(-(t - t0) / tau)
+    np.multiply(dtau, -1. / tau, out=dampl)
+    np.exp(dampl, out=dampl)
+    np.putmask(dampl, mask, 0.)
+
+    # d/dt0 = ampl / tau * exp(-(t - t0) / tau)
+    np.multiply(dampl, ampl / tau, out=dt0)
+
+    # d/dtau = ampl (t - t0) / tau^2 * exp(-(t - t0) / tau)
+    np.multiply(dtau, dampl, out=dtau)
+    np.multiply(dtau, ampl / tau**2, out=dtau)
+
+    return out
+
+
+class ExponentialDecay:
+    """Exponential decay model with buffers for a fixed time array, to pass
+    to curve_fit as f=model and jac=model.jac. The time passed to the calls
+    is ignored in favour of the one given here.
+
+    Parameters
+    ----------
+    t : array-like
+        Time.
+    """
+
+    def __init__(self, t):
+        self.t = np.asarray(t, dtype=np.float64)
+        self.value = np.empty_like(self.t)
+        self.jacobian = np.empty((3, len(self.t))).T
+        self.mask = np.empty(self.t.shape, dtype=bool)
+
+    def __call__(self, t, t0, tau, ampl):
+        return exponential_decay(self.t, t0, tau, ampl,
+                                 out=self.value, mask=self.mask)
+
+    def jac(self, t, t0, tau, ampl):
+        return exponential_decay_jac(self.t, t0, tau, ampl,
+                                     out=self.jacobian, mask=self.mask)
@@ -0,0 +1,100 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module evaluates cumulative flare rates above energy thresholds from
+power law FFD fits,
+
+    rate(>E) = beta / |alpha - 1| * E^(1 - alpha),
+
+and propagates the uncertainties of alpha and beta to the rates. All
+functions broadcast over arrays of fits and thresholds, e.g., alpha and beta
+of shape (n_stars, 1) against energies of shape (n_energies,).
+
+Rates are computed in log10 space, so that the large exponents of energies
+in erg neither overflow nor lose precision.
+"""
+
+import numpy as np
+
+
+# log10 of the energy threshold of R31.5 in erg
+LOG_E315 = 31.5
+
+
+def log_flare_rate(energy, alpha, beta):
+    """log10 of the cumulative flare rate above an energy.
+
+    Parameters
+    ----------
+    energy : array-like
+        Energy threshold, in the units of the FFD fit.
+    alpha, beta : array-like
+        Power law exponent and intercept.
+
+    Returns
+    -------
+    np.ndarray
+        log10 of the rate, in the time units of beta.
+    """
+    energy, alpha, beta = (np.asarray(x, dtype=np.float64)
+                           for x in (energy, alpha, beta))
+    return (np.log10(beta) - np.log10(np.abs(alpha - 1.)) +
+            (1. - alpha) * np.log10(energy))
+
+
+def flare_rate(energy, alpha, beta):
+    """Cumulative flare rate above an energy, see log_flare_rate."""
+    return np.power(10., log_flare_rate(energy, alpha, beta))
+
+
+def log_flare_rate_err(energy, alpha, beta, alpha_low_err, alpha_up_err,
+                       beta_low_err, beta_up_err):
+    """log10 of the cumulative flare rate above an energy with lower and
+    upper uncertainties, propagated linearly in log space from independent
+    uncertainties of alpha and beta. Each side of the rate uses the side of
+    alpha and beta that moves the rate in that direction.
+
+    Parameters
+    ----------
+    energy : array-like
+        Energy threshold, in the units of the FFD fit.
+    alpha, beta : array-like
+        Power law exponent and intercept.
+    alpha_low_err, alpha_up_err : array-like
+        Lower and upper uncertainty of alpha.
+    beta_low_err, beta_up_err : array-like
+        Lower and upper uncertainty of beta.
+
+    Returns
+    -------
+    log_rate, log_rate_low_err, log_rate_up_err : np.ndarray
+        log10 of the rate, and its lower and upper uncertainties in dex.
+    """
+    energy, alpha, beta = (np.asarray(x, dtype=np.float64)
+                           for x in (energy, alpha, beta))
+
+    log_rate = log_flare_rate(energy, alpha, beta)
+
+    # partial derivatives of log10(rate)
+    dalpha = -1. / ((alpha - 1.) * np.log(10.)) - np.log10(energy)
+    dbeta = 1. / (beta * np.log(10.))
+
+    # alpha errors that raise and lower the rate
+    alpha_raise = np.where(dalpha < 0, alpha_low_err, alpha_up_err)
+    alpha_lower = np.where(dalpha < 0, alpha_up_err, alpha_low_err)
+
+    up = np.hypot(dalpha * alpha_raise, dbeta * np.asarray(beta_up_err))
+    low = np.hypot(dalpha * alpha_lower, dbeta * np.asarray(beta_low_err))
+
+    return log_rate, low, up
+
+
+def log_r315(alpha, beta):
+    """log10 of the rate of flares above 10^31.5 erg, R31.5."""
+    return log_flare_rate(10.**LOG_E315, alpha, beta)
@@ -0,0 +1,183 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module masks and slices time windows, e.g., padded flares, in a light
+curve with a sorted time column. The bounds of all windows are found with
+np.searchsorted, and the mask is built with a single cumulative sum, so
+masking M windows in N cadences costs O(N + M log N) instead of O(N M).
+
+TimeIndex wraps a sorted time column, and cuts windows out of it, or out of
+any array aligned with it, as contiguous slices, i.e., views without copies.
+"""
+
+import numpy as np
+
+
+def interval_bounds(time, tstart, tstop, pad=0., closed=True):
+    """Find the index bounds of time windows.
+
+    Parameters
+    ----------
+    time : array-like
+        Sorted time stamps.
+    tstart, tstop : array-like
+        Start and stop times of the windows.
+    pad : float
+        Padding added to both sides of each window.
+    closed : bool
+        If True, time stamps equal to the padded start or stop are inside
+        the window, else they are outside.
+
+    Returns
+    -------
+    lo, hi : np.ndarray
+        Each window covers the indices lo:hi.
+    """
+    time = np.asarray(time)
+    a = np.asarray(tstart, dtype=np.float64) - pad
+    b = np.asarray(tstop, dtype=np.float64) + pad
+
+    if closed:
+        lo = np.searchsorted(time, a, side="left")
+        hi = np.searchsorted(time, b, side="right")
+    else:
+        lo = np.searchsorted(time, a, side="right")
+        hi = np.searchsorted(time, b, side="left")
+
+    # empty windows
+    hi = np.maximum(lo, hi)
+
+    return lo, hi
+
+
+def interval_slices(time, tstart, tstop, pad=0., closed=True):
+    """Get the index slice of each time window.
+
+    Parameters
+    ----------
+    time : array-like
+        Sorted time stamps.
+    tstart, tstop : array-like
+        Start and stop times of the windows.
+    pad : float
+        Padding added to both sides of each window.
+    closed : bool
+        If True, time stamps equal to the padded start or stop are inside
+        the window, else they are outside.
+
+    Returns
+    -------
+    list of slice
+        One slice per window.
+    """
+    lo, hi = interval_bounds(time, tstart, tstop, pad=pad, closed=closed)
+    return [slice(l, h) for l, h in zip(lo, hi)]
+
+
+def interval_mask(time, tstart, tstop, pad=0., closed=True):
+    """Mask all time stamps that fall into any of the time windows.
+
+    Parameters
+    ----------
+    time : array-like
+        Sorted time stamps.
+    tstart, tstop : array-like
+        Start and stop times of the windows, may overlap.
+    pad : float
+        Padding added to both sides of each window.
+    closed : bool
+        If True, time stamps equal to the padded start or stop are inside
+        the window, else they are outside.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array, True inside any window.
+    """
+    n = len(time)
+    lo, hi = interval_bounds(time, tstart, tstop, pad=pad, closed=closed)
+
+    # +1 where a window opens, -1 where it closes, then count open windows
+    edges = (np.bincount(lo, minlength=n + 1) -
+             np.bincount(hi, minlength=n + 1))
+
+    return np.cumsum(edges[:n]) > 0
+
+
+class TimeIndex:
+    """Index of a sorted time column, to cut time windows as slices.
+
+    Parameters
+    ----------
+    time : array-like
+        Sorted time stamps.
+    """
+
+    def __init__(self, time):
+        self.time = np.asarray(time)
+
+        if np.any(self.time[1:] < self.time[:-1]):
+            raise ValueError("Time stamps must be sorted.")
+
+    def __len__(self):
+        return len(self.time)
+
+    def slice(self, tstart, tstop, pad=0., closed=True):
+        """Get the index slice of a single time window.
+
+        Parameters
+        ----------
+        tstart, tstop : float
+            Start and stop time of the window.
+        pad : float
+            Padding added to both sides of the window.
+        closed : bool
+            If True, time stamps equal to the padded start or stop are
+            inside the window, else they are outside.
+
+        Returns
+        -------
+        slice
+        """
+        (lo,), (hi,) = interval_bounds(self.time, [tstart], [tstop],
+                                       pad=pad, closed=closed)
+        return slice(lo, hi)
+
+    def slices(self, tstart, tstop, pad=0., closed=True):
+        """Get the index slice of each time window, see interval_slices."""
+        return interval_slices(self.time, tstart, tstop, pad=pad, closed=closed)
+
+    def mask(self, tstart, tstop, pad=0., closed=True):
+        """Mask the time stamps in any of the time windows, see
+        interval_mask."""
+        return interval_mask(self.time, tstart, tstop, pad=pad, closed=closed)
+
+    def window(self, tstart, tstop, *arrays, pad=0., closed=True):
+        """Cut a time window out of the time column and out of arrays that
+        are aligned with it.
+
+        Parameters
+        ----------
+        tstart, tstop : float
+            Start and stop time of the window.
+        arrays : array-like
+            Arrays of the same length as the time column.
+        pad : float
+            Padding added to both sides of the window.
+        closed : bool
+            If True, time stamps equal to the padded start or stop are
+            inside the window, else they are outside.
+
+        Returns
+        -------
+        list of np.ndarray
+            Views of the time column and of each array in the window.
+        """
+        sl = self.slice(tstart, tstop, pad=pad, closed=closed)
+        return [self.time[sl]] + [np.asarray(a)[sl] for a in arrays]
@@ -0,0 +1,75 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module defers imports of heavy packages, e.g., matplotlib.pyplot,
+scipy.optimize, or astropy.table, to their first use. The shared helpers
+import them with lazy_import at module level, so that scripts that only
+write tables or values do not pay for plotting or fitting packages they
+never call.
+
+    plt = lazy_import("matplotlib.pyplot")
+
+    def plot(...):
+        fig, ax = plt.subplots()  # matplotlib.pyplot is imported here
+
+Modules that are imported already are returned as they are.
+"""
+
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Module that is imported on first attribute access.
+
+    Parameters
+    ----------
+    name : str
+        Full name of the module, e.g., "matplotlib.pyplot".
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        """Import the module once."""
+        if self._module is None:
+            self.__dict__["_module"] = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, attr):
+        # only called for attributes that are not set on the proxy
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name):
+    """Module that is imported on first use.
+
+    Parameters
+    ----------
+    name : str
+        Full name of the module.
+
+    Returns
+    -------
+    module or LazyModule
+        The module if it is imported already, else a proxy.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
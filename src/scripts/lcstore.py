@@ -0,0 +1,232 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module converts the de-trended TESS light curves of a star once into a
+columnar store, and serves memory-mapped, zero-copy views of single sectors
+or time ranges from it.
+
+The store of each TIC is a folder in the cache with one native float64 .npy
+file per column, all sectors concatenated in time order, and an index.npz
+with the sector numbers, their offsets into the columns, and the
+modification times of the FITS files they were converted from. A store whose
+FITS files changed gets rebuilt. Reading a sector then costs no FITS
+decoding at all.
+
+Each version of a store goes into its own folder, named after a hash of its
+sectors, columns, and FITS modification times, and is moved there in one
+step once it is complete, so that concurrent builds and reads never see a
+partial store. Older versions are removed after a new one is in place.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+import paths
+
+from lazy import lazy_import
+
+table = lazy_import("astropy.table")
+
+
+# TIC 277539431
+TIC = 277539431
+
+# TESS sectors with de-trended light curves
+SECTORS = (12, 37, 39, 64, 65)
+
+# columns in the de-trended light curves
+COLUMNS = ("TIME", "FLUX", "DETRENDED_FLUX")
+
+
+def fits_path(tic, sector):
+    """Path to the de-trended light curve of a TIC in a sector."""
+    return paths.data / f"tic{tic}_tess_detrended_{sector}.fits"
+
+
+def _mtimes(tic, sectors):
+    """Modification times of the FITS files, or -1 where missing."""
+    return np.array([fits_path(tic, s).stat().st_mtime_ns
+                     if fits_path(tic, s).exists() else -1
+                     for s in sectors], dtype=np.int64)
+
+
+def _version(sectors, columns, mtimes):
+    """Name of the folder of a version of a store."""
+    source = json.dumps(dict(sectors=[int(s) for s in sectors],
+                             columns=list(columns),
+                             mtimes=[int(m) for m in mtimes]))
+    return hashlib.sha1(source.encode()).hexdigest()[:16]
+
+
+def build_store(tic, sectors=SECTORS, columns=COLUMNS,
+                root=paths.cache / "lcstore"):
+    """Convert the FITS light curves of a TIC into a columnar store. If
+    another process built the same version of the store first, its build is
+    kept.
+
+    Parameters
+    ----------
+    tic : int
+        TIC ID.
+    sectors : tuple of int
+        Sectors to convert.
+    columns : tuple of str
+        Columns to convert.
+    root : Path
+        Folder that contains the stores of all TICs.
+
+    Returns
+    -------
+    Path
+        Folder of the store.
+    """
+    sectors = sorted(sectors)
+    mtimes = _mtimes(tic, sectors)
+    folder = root / f"tic{tic}" / _version(sectors, columns, mtimes)
+
+    tmp = folder.with_name(f"{folder.name}.{os.getpid()}.tmp")
+    tmp.mkdir(parents=True)
+
+    lcs = [table.Table.read(fits_path(tic, s)) for s in sectors]
+    offsets = np.cumsum([0] + [len(lc) for lc in lcs])
+
+    for col in columns:
+
+        # masked values become NaN, big endian becomes native
+        data = np.concatenate([np.ma.filled(np.ma.asarray(lc[col],
+                                                          dtype=np.float64),
+                                            np.nan) for lc in lcs])
+        np.save(tmp / f"{col}.npy", data)
+
+    np.savez(tmp / "index.npz", sectors=np.array(sectors), offsets=offsets,
+             mtimes=mtimes, columns=np.array(columns))
+
+    try:
+        os.replace(tmp, folder)
+    except OSError:
+        # another process built the same version first
+        shutil.rmtree(tmp)
+
+    # remove older versions, but not the builds still being written; open
+    # memory maps of removed files stay valid
+    for old in folder.parent.iterdir():
+        if old == folder or old.name.endswith(".tmp"):
+            continue
+        if old.is_dir():
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            # files of the unversioned layout
+            old.unlink(missing_ok=True)
+
+    return folder
+
+
+class LightCurveStore:
+    """Memory-mapped light curves of one TIC, converted from FITS on first
+    use and whenever the FITS files change.
+
+    Parameters
+    ----------
+    tic : int
+        TIC ID.
+    sectors : tuple of int
+        Sectors in the store.
+    columns : tuple of str
+        Columns in the store.
+    root : Path
+        Folder that contains the stores of all TICs.
+    """
+
+    def __init__(self, tic=TIC, sectors=SECTORS, columns=COLUMNS,
+                 root=paths.cache / "lcstore"):
+        self.tic = tic
+
+        try:
+            self._open(root, sorted(sectors), columns)
+        except FileNotFoundError:
+            # another process replaced the version we were opening
+            self._open(root, sorted(sectors), columns)
+
+    def _open(self, root, sectors, columns):
+        """Memory-map the current version of the store, building it first
+        if needed."""
+        versions = root / f"tic{self.tic}"
+        current = [folder for folder in sorted(versions.glob("*"))
+                   if not folder.name.endswith(".tmp")
+                   and self._is_current(folder, sectors, columns)]
+        if len(current) > 0:
+            self.folder = current[0]
+        else:
+            self.folder = build_store(self.tic, sectors=sectors,
+                                      columns=columns, root=root)
+
+        with np.load(self.folder / "index.npz") as index:
+            self.sectors = [int(s) for s in index["sectors"]]
+            self.offsets = index["offsets"]
+
+        self.columns = {col: np.load(self.folder / f"{col}.npy", mmap_mode="r")
+                        for col in columns}
+
+    def _is_current(self, folder, sectors, columns):
+        """Check if a version of the store has all sectors and columns, and
+        is newer than the FITS files that still exist."""
+        index = folder / "index.npz"
+        if not index.exists():
+            return False
+
+        with np.load(index) as idx:
+            if (list(idx["sectors"]) != list(sectors) or
+                    not set(columns) <= set(idx["columns"])):
+                return False
+
+            # FITS files may be gone if only the store is kept
+            mtimes = _mtimes(self.tic, sectors)
+            present = mtimes >= 0
+            return bool(np.all(idx["mtimes"][present] == mtimes[present]))
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def sector(self, sector):
+        """Views of all columns in a sector.
+
+        Parameters
+        ----------
+        sector : int
+            TESS sector.
+
+        Returns
+        -------
+        dict
+            Column name to read-only array.
+        """
+        i = self.sectors.index(sector)
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return {col: data[a:b] for col, data in self.columns.items()}
+
+    def between(self, tmin, tmax):
+        """Views of all columns with tmin <= TIME < tmax, across sectors.
+        Assumes that TIME is sorted within and across sectors.
+
+        Parameters
+        ----------
+        tmin, tmax : float
+            Time range.
+
+        Returns
+        -------
+        dict
+            Column name to read-only array.
+        """
+        a, b = np.searchsorted(self.columns["TIME"], [tmin, tmax])
+        return {col: data[a:b] for col, data in self.columns.items()}
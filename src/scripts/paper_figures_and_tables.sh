@@ -1,9 +1,3 @@
-python FIGURE_data_resid.py
-python FIGURE_lightcurves.py
-python FIGURE_tess_ffd.py
-python FIGURE_tess_lcs.py
-
-python TABLE_specfits.py
-python TABLE_tess_flares.py
-
-python VALUES.py
\ No newline at end of file
+python pipeline.py FIGURE_data_resid.py FIGURE_lightcurves.py FIGURE_tess_ffd.py FIGURE_tess_lcs.py \
+                   TABLE_specfits.py TABLE_tess_flares.py \
+                   VALUES.py
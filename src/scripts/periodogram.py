@@ -0,0 +1,350 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module computes Lomb-Scargle periodograms with the O(N log N) algorithm
+of Press & Rybicki (1989), in the floating-mean formulation of Zechmeister &
+Kurster (2009), as astropy's LombScargle with method="fast" and
+algorithm="fasper", and with the frequency grid and normalizations of
+lightkurve's LombScarglePeriodogram.
+
+Everything that depends only on the time stamps and the frequency grid is
+computed once in a LombScarglePlan: the extirpolation of the time stamps onto
+the FFT grid (a sparse matrix with the phase shift to the first frequency
+folded in), and the sums over the time stamps that fix the time offset tau
+and the normalization at each frequency. A periodogram of a flux series then
+costs one sparse matrix product and one FFT, and many flux series on the same
+time stamps, e.g., permutations, can be passed at once.
+
+The plan can work in float32 to halve memory and FFT time for long, finely
+oversampled series.
+"""
+
+from math import factorial
+
+import numpy as np
+from scipy import fft, sparse
+
+from lazy import lazy_import
+
+plt = lazy_import("matplotlib.pyplot")
+
+
+def frequency_grid(time, minimum_period=None, maximum_period=None,
+                   oversample_factor=5., nyquist_factor=1.):
+    """Regular frequency grid as in lightkurve's LombScarglePeriodogram.
+
+    Parameters
+    ----------
+    time : array-like
+        Sorted time stamps in days.
+    minimum_period, maximum_period : float
+        Period range in days, defaults to twice the median cadence divided
+        by nyquist_factor, and oversample_factor times the time baseline.
+    oversample_factor : float
+        Number of grid points per 1 / time baseline.
+    nyquist_factor : float
+        Multiple of the Nyquist frequency of the median cadence.
+
+    Returns
+    -------
+    np.ndarray
+        Frequencies in 1/d.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    fs = 1. / (time[-1] - time[0]) / oversample_factor
+
+    if maximum_period is None:
+        fmin = fs
+    else:
+        fmin = 1. / maximum_period
+
+    if minimum_period is None:
+        fmax = 0.5 / np.median(np.diff(time)) * nyquist_factor
+    else:
+        fmax = 1. / minimum_period
+
+    return np.arange(fmin, fmax, fs)
+
+
+def _bitceil(n):
+    """Smallest power of 2 not below n."""
+    return 1 << int(np.ceil(np.log2(n)))
+
+
+def extirpolation_matrix(x, n, m=4):
+    """Sparse matrix that extirpolates values at positions x onto the
+    integer grid range(n), with Lagrange weights on the m nearest grid
+    points, following extirpolate() in astropy and spread() in Numerical
+    Recipes.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Positions in [0, n).
+    n : int
+        Size of the grid.
+    m : int
+        Number of grid points per value.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        Matrix of shape (n, len(x)).
+    """
+    cols = np.arange(len(x))
+
+    # values at integer positions go to a single grid point
+    integers = x % 1 == 0
+    rows, weights, idx = [x[integers].astype(int)], [np.ones(integers.sum())], [cols[integers]]
+    x, cols = x[~integers], cols[~integers]
+
+    ilo = np.clip((x - m // 2).astype(int), 0, n - m)
+    numerator = np.prod(x - ilo - np.arange(m)[:, None], 0)
+    denominator = factorial(m - 1)
+
+    for j in range(m):
+        if j > 0:
+            denominator *= j / (j - m)
+        ind = ilo + (m - 1 - j)
+        rows.append(ind)
+        weights.append(numerator / (denominator * (x - ind)))
+        idx.append(cols)
+
+    return sparse.csr_matrix((np.concatenate(weights),
+                              (np.concatenate(rows), np.concatenate(idx))),
+                             shape=(n, len(integers)))
+
+
+class _TrigSum:
+    """Precomputed sums of h * sin and h * cos(2 pi f t) over the time
+    stamps, for f = freq_factor * (f0 + df * arange(nf)), for any h.
+    """
+
+    def __init__(self, t, f0, df, nf, freq_factor=1, oversampling=5, m=4,
+                 dtype=np.float64):
+        ctype = np.complex64 if dtype == np.float32 else np.complex128
+        f0, df = f0 * freq_factor, df * freq_factor
+
+        t0 = t.min()
+        self.nf = nf
+        self.nfft = _bitceil(nf * oversampling)
+
+        # extirpolation onto the FFT grid, with the phase shift to f0
+        tnorm = ((t - t0) * self.nfft * df) % self.nfft
+        shift = np.exp(2j * np.pi * f0 * (t - t0))
+        self.matrix = (extirpolation_matrix(tnorm, self.nfft, m)
+                       @ sparse.diags(shift)).astype(ctype).tocsr()
+
+        # phase shift back to the original time zero point
+        self.phase = np.exp(2j * np.pi * t0 * (f0 + df * np.arange(nf))).astype(ctype)
+
+    def __call__(self, h):
+        """Sums for h of shape (n_times,) or (n_times, n_series).
+
+        Returns
+        -------
+        S, C : np.ndarray
+            Of shape (n_freq,) or (n_freq, n_series).
+        """
+        grid = self.matrix @ h
+        grid = fft.ifft(grid, axis=0, norm="forward")[:self.nf]
+        grid *= self.phase if grid.ndim == 1 else self.phase[:, None]
+        return grid.imag, grid.real
+
+
+class LombScarglePlan:
+    """Floating-mean Lomb-Scargle periodograms of flux series on fixed time
+    stamps and a fixed, regular frequency grid.
+
+    Parameters
+    ----------
+    time : array-like
+        Time stamps.
+    frequency : array-like
+        Regular frequency grid, e.g., from frequency_grid.
+    dy : array-like
+        Flux uncertainties, defaults to equal weights.
+    oversampling : int
+        Oversampling of the FFT grid with respect to the frequency grid.
+    m : int
+        Number of FFT grid points each time stamp is extirpolated to.
+    dtype : np.float32 or np.float64
+        Precision of the extirpolation and FFT.
+    """
+
+    def __init__(self, time, frequency, dy=None, oversampling=5, m=4,
+                 dtype=np.float64):
+        self.time = np.asarray(time, dtype=np.float64)
+        self.frequency = np.asarray(frequency, dtype=np.float64)
+        self.dtype = dtype
+
+        f0, nf = self.frequency[0], len(self.frequency)
+        df = (self.frequency[-1] - f0) / (nf - 1) if nf > 1 else 1.
+        if not np.allclose(np.diff(self.frequency), df, rtol=1e-6, atol=0):
+            raise ValueError("The frequency grid must be regular.")
+        if f0 < 0:
+            raise ValueError("Frequencies must be positive.")
+
+        dy = np.ones_like(self.time) if dy is None else np.asarray(dy, dtype=np.float64)
+        w = dy**-2.
+        self.norm = float(w.sum())
+        self.w = (w / self.norm).astype(dtype)
+
+        self._sums = _TrigSum(self.time, f0, df, nf, 1, oversampling, m, dtype)
+
+        # sums over the time stamps only
+        S, C = self._sums(self.w)
+        S2, C2 = _TrigSum(self.time, f0, df, nf, 2, oversampling, m, dtype)(self.w)
+
+        tan_2omega_tau = (S2 - 2 * S * C) / (C2 - (C * C - S * S))
+        S2w = tan_2omega_tau / np.sqrt(1 + tan_2omega_tau * tan_2omega_tau)
+        C2w = 1 / np.sqrt(1 + tan_2omega_tau * tan_2omega_tau)
+        self.Cw = 0.5**0.5 * np.sqrt(1 + C2w)
+        self.Sw = 0.5**0.5 * np.sign(S2w) * np.sqrt(1 - C2w)
+
+        self.CC = (0.5 * (1 + C2 * C2w + S2 * S2w)
+                   - (C * self.Cw + S * self.Sw)**2)
+        self.SS = (0.5 * (1 - C2 * C2w - S2 * S2w)
+                   - (S * self.Cw - C * self.Sw)**2)
+
+    def power(self, flux, normalization="amplitude"):
+        """Periodogram of one or many flux series.
+
+        Parameters
+        ----------
+        flux : array-like
+            Flux of shape (n_times,), or (n_times, n_series).
+        normalization : str
+            "amplitude" or "psd" as in lightkurve, or "standard" as in
+            astropy, i.e., the fraction of the variance explained.
+
+        Returns
+        -------
+        np.ndarray
+            Power of shape (n_freq,) or (n_freq, n_series).
+        """
+        y = np.asarray(flux, dtype=self.dtype)
+        w = self.w if y.ndim == 1 else self.w[:, None]
+
+        # center the data
+        y = y - np.sum(w * y, axis=0)
+
+        Sh, Ch = self._sums(w * y)
+
+        Cw, Sw, CC, SS = self.Cw, self.Sw, self.CC, self.SS
+        if y.ndim > 1:
+            Cw, Sw, CC, SS = Cw[:, None], Sw[:, None], CC[:, None], SS[:, None]
+
+        YC = Ch * Cw + Sh * Sw
+        YS = Sh * Cw - Ch * Sw
+        power = YC * YC / CC + YS * YS / SS
+
+        if normalization == "standard":
+            return power / np.sum(w * y**2, axis=0)
+
+        # astropy's psd normalization
+        power = power * 0.5 * self.norm
+
+        if normalization == "psd":
+            return power
+        elif normalization == "amplitude":
+            return np.sqrt(power) * (4. / len(self.time))**0.5
+        else:
+            raise ValueError(f"normalization='{normalization}' not recognized")
+
+
+class Periodogram:
+    """Power on a frequency grid.
+
+    Parameters
+    ----------
+    frequency : np.ndarray
+        Frequencies in 1/d.
+    power : np.ndarray
+        Power at each frequency.
+    """
+
+    def __init__(self, frequency, power):
+        self.frequency = frequency
+        self.power = power
+
+    @property
+    def period(self):
+        """Periods in days."""
+        return 1. / self.frequency
+
+    @property
+    def period_at_max_power(self):
+        """Period in days of the highest peak."""
+        return self.period[np.nanargmax(self.power)]
+
+    def plot(self, ax=None, scale="linear", **kwargs):
+        """Plot power against period.
+
+        Parameters
+        ----------
+        ax : matplotlib.axes.Axes
+            Axes to plot into, defaults to a new figure.
+        scale : str
+            "linear" or "log" scale of both axes.
+        kwargs : dict
+            Keyword arguments passed to ax.plot.
+
+        Returns
+        -------
+        matplotlib.axes.Axes
+        """
+        if ax is None:
+            fig, ax = plt.subplots()
+
+        ax.plot(self.period, self.power, **kwargs)
+        ax.set_xlabel("Period [d]")
+        ax.set_ylabel("Power")
+        ax.set_xscale(scale)
+        ax.set_yscale(scale)
+
+        return ax
+
+
+def lombscargle(time, flux, minimum_period=None, maximum_period=None,
+                oversample_factor=5., normalization="amplitude",
+                dtype=np.float64):
+    """Lomb-Scargle periodogram of a light curve, as lightkurve's
+    LightCurve.to_periodogram(method="lombscargle").
+
+    Parameters
+    ----------
+    time : array-like
+        Sorted time stamps in days.
+    flux : array-like
+        Flux, NaNs are removed with their time stamps.
+    minimum_period, maximum_period : float
+        Period range in days, see frequency_grid.
+    oversample_factor : float
+        Number of grid points per 1 / time baseline.
+    normalization : str
+        "amplitude" or "psd".
+    dtype : np.float32 or np.float64
+        Precision of the extirpolation and FFT.
+
+    Returns
+    -------
+    Periodogram
+    """
+    time, flux = np.asarray(time, dtype=np.float64), np.asarray(flux, dtype=np.float64)
+    finite = np.isfinite(flux)
+    time, flux = time[finite], flux[finite]
+
+    frequency = frequency_grid(time, minimum_period=minimum_period,
+                               maximum_period=maximum_period,
+                               oversample_factor=oversample_factor)
+
+    plan = LombScarglePlan(time, frequency, dtype=dtype)
+
+    return Periodogram(frequency, plan.power(flux, normalization=normalization))
@@ -0,0 +1,347 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This script runs the paper scripts with a result cache. Each script declares
+the data files it reads and the files it writes, as glob patterns relative
+to src/. A script runs only if its source, the local modules it imports, or
+its inputs changed since a cached run, else its outputs are restored from
+the cache, see resultcache.py.
+
+A script depends on another if it reads a file that the other writes, e.g.,
+TABLE_specfits.py reads the mcmc_results.csv of FIGURE_mcmc_results.py.
+Scripts run as soon as all scripts they depend on are done, up to --jobs at
+a time. At the end, the script prints the start, stop, and duration of each
+script, and the critical path, i.e., the chain of dependent scripts that
+took longest.
+
+With --in-process, the scripts run one after the other in this process, by
+calling their main functions with a shared Datasets object, see datasets.py,
+so that each table is parsed once and the interpreter starts once.
+
+Usage: python pipeline.py [--jobs N] [--in-process] [--force] [--budget MB] [script ...]
+"""
+
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from fnmatch import fnmatch
+
+import paths
+
+from datasets import Datasets
+from resultcache import BUDGET, ResultCache, expand
+
+
+# inputs and outputs of each script, as glob patterns relative to src/
+SCRIPTS = {
+    "FIGURE_data_resid.py": (
+        ["data/joint_chain_fit.txt"],
+        ["tex/figures/*_data_resid.png"]),
+    "FIGURE_lightcurves.py": (
+        ["data/timeseries.csv", "data/corrected_merged_epic_lc.csv"],
+        ["tex/figures/lightcurves.png"]),
+    "FIGURE_LXLBol_rot.py": (
+        ["data/wright2016.csv"],
+        ["tex/figures/lx_lbol.png"]),
+    "FIGURE_mcmc_results.py": (
+        ["data/chain_joint_vapec_feo06*.fits"],
+        ["tex/figures/corner*.png", "tex/figures/T1_vs_T2.png",
+         "tex/figures/EM_weighted_T_vs_norm_ratio.png",
+         "data/mcmc_results.csv"]),
+    "FIGURE_periodograms_xray_and_optical.py": (
+        ["data/stacked_xray_lightcurve.csv", "data/timeseries.csv"],
+        ["tex/figures/periodogram_*.png"]),
+    "FIGURE_tess_ffd.py": (
+        ["data/tess_ffd.csv", "data/tess_flares.csv",
+         "data/flare_energies.csv", "data/*_energy_beta.txt"],
+        ["tex/figures/*_tess_ffd.png", "data/energy_beta.csv"]),
+    "FIGURE_r315_comparison.py": (
+        ["data/medina2020.fit", "data/tess_ffd.csv",
+         "data/ilin2021updated_w_Rossby_Lbol.csv", "data/energy_beta.csv"],
+        ["tex/figures/r315_prot.png"]),
+    "FIGURE_tess_lcs.py": (
+        ["data/tic*_tess_detrended_*.fits", "data/tess_flares.csv"],
+        ["tex/figures/tess_lcs.png"]),
+    "TABLE_specfits.py": (
+        ["data/mcmc_results.csv", "data/joint_vapec_chain_fits.csv"],
+        ["tex/output/mcmc_specfit.tex"]),
+    "TABLE_tess_flares.py": (
+        ["data/tess_flares.csv"],
+        ["tex/output/tess_flares.tex"]),
+    "VALUES.py": (
+        ["data/tess_ffd.csv", "data/joint_vapec_chain_fits.csv",
+         "data/ilin2021updated_w_Rossby_Lbol.csv", "data/mcmc_results.csv",
+         "data/flare_energies.csv"],
+        ["tex/output/tess_ffd_*.tex", "tex/output/R315.tex",
+         "tex/output/epic_*.tex", "tex/output/Lbol.tex",
+         "tex/output/lxlbol.tex", "tex/output/T*.tex",
+         "tex/output/om_flare.tex"]),
+    "_08_flare_loop_size_epic.py": (
+        ["data/mcmc_results.csv"],
+        ["tex/output/EPIC_flare_loop_table.tex"]),
+    "_09_tess_om_flare_loops.py": (
+        ["data/tic*_tess_detrended_*.fits", "data/tess_flares.csv",
+         "data/maehara2021_yz_cmi.csv"],
+        ["tex/figures/tess_flares_B_L_relation.png",
+         "tex/figures/expfit_flare_*.png"]),
+    "_10_om_efold_time.py": (
+        ["data/timeseries.csv"],
+        ["tex/figures/OM_exponential_decay.png"]),
+    "_11_tess_ffd_fits.py": (
+        ["data/tess_flares.csv"],
+        ["data/tess_ffd_refit.csv"]),
+}
+
+
+def snapshot(patterns):
+    """Modification time, size, and inode of the files matching glob
+    patterns, to find the files that a run wrote.
+
+    Parameters
+    ----------
+    patterns : list of str
+        Glob patterns relative to src/.
+
+    Returns
+    -------
+    dict
+        (st_mtime_ns, st_size, st_ino) by path.
+    """
+    snap = dict()
+    for path in expand(patterns):
+        stat = path.stat()
+        snap[path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    return snap
+
+
+def run_main(name, data):
+    """Run the main function of a script in this process.
+
+    Parameters
+    ----------
+    name : str
+        File name of the script.
+    data : Datasets
+        Tables shared by all scripts.
+    """
+    module = importlib.import_module(name[:-3])
+    module.main(data)
+
+    # do not carry figures over to the next script
+    if "matplotlib.pyplot" in sys.modules:
+        sys.modules["matplotlib.pyplot"].close("all")
+
+
+def run_script(name, cache=None, force=False, data=None):
+    """Run a script, or restore its outputs from the cache.
+
+    Parameters
+    ----------
+    name : str
+        File name of the script, a key of SCRIPTS.
+    cache : ResultCache or None
+        Result cache, None to always run the script.
+    force : bool
+        Run the script even on a cache hit.
+    data : Datasets or None
+        Tables shared by all scripts to run the script in this process, or
+        None to run it in a new interpreter.
+
+    Returns
+    -------
+    str
+        "cached" or "run".
+    """
+    inputs, outputs = SCRIPTS[name]
+
+    if cache is not None:
+        key = cache.key(paths.scripts / name, inputs)
+        if not force and cache.restore(key) is not None:
+            return "cached"
+
+    # compare with the files before the run rather than with the wall clock,
+    # which can be ahead of coarse file system timestamps
+    before = snapshot(outputs) if cache is not None else None
+    if data is None:
+        subprocess.run([sys.executable, name], cwd=paths.scripts, check=True)
+    else:
+        run_main(name, data)
+
+    if cache is not None:
+        # files matching the output patterns that the run wrote
+        written = [p for p, s in snapshot(outputs).items() if before.get(p) != s]
+        cache.store(key, written)
+
+    return "run"
+
+
+def dependencies(names):
+    """Scripts that each script depends on, i.e., that write a file matching
+    one of its inputs.
+
+    Parameters
+    ----------
+    names : list of str
+        File names of the scripts, keys of SCRIPTS. Dependencies on scripts
+        that are not in the list are ignored.
+
+    Returns
+    -------
+    dict
+        Set of the names of the dependencies of each script.
+    """
+    def overlap(a, b):
+        return any(fnmatch(x, y) or fnmatch(y, x) for x in a for y in b)
+
+    return {name: set(other for other in names if other != name and
+                      overlap(SCRIPTS[name][0], SCRIPTS[other][1]))
+            for name in names}
+
+
+def run_graph(names, cache=None, force=False, jobs=None, data=None):
+    """Run scripts in parallel as soon as their dependencies are done.
+
+    Parameters
+    ----------
+    names : list of str
+        File names of the scripts, keys of SCRIPTS.
+    cache : ResultCache or None
+        Result cache, None to always run the scripts.
+    force : bool
+        Run the scripts even on cache hits.
+    jobs : int
+        Number of scripts to run at a time, defaults to the number of cores.
+    data : Datasets or None
+        Tables shared by all scripts to run them one at a time in this
+        process, or None to run each in a new interpreter.
+
+    Returns
+    -------
+    dict
+        Status, start and stop time in s since the start of the run of each
+        script, in the order they finished.
+    """
+    deps = dependencies(names)
+    # pyplot is not thread-safe
+    jobs = 1 if data is not None else jobs or os.cpu_count() or 1
+
+    todo, running, report = list(names), dict(), dict()
+    t0 = time.perf_counter()
+
+    def task(name):
+        start = time.perf_counter() - t0
+        status = run_script(name, cache=cache, force=force, data=data)
+        return status, start, time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while len(todo) > 0 or len(running) > 0:
+
+            # submit all scripts whose dependencies are done
+            for name in [n for n in todo if deps[n] <= set(report)]:
+                todo.remove(name)
+                running[executor.submit(task, name)] = name
+
+            if len(running) == 0:
+                raise RuntimeError(f"Circular dependencies between {todo}.")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    status, start, stop = future.result()
+                except Exception as err:
+                    # scripts in subprocesses print their own traceback
+                    if not isinstance(err, subprocess.CalledProcessError):
+                        traceback.print_exception(type(err), err, err.__traceback__)
+                    # let the running scripts finish, but start no new ones
+                    todo.clear()
+                    status, start, stop = "failed", None, time.perf_counter() - t0
+                report[name] = dict(status=status, start=start, stop=stop)
+                print(f"{name:<42} {status}", flush=True)
+
+    return report
+
+
+def critical_path(report, deps):
+    """Chain of dependent scripts with the longest total duration.
+
+    Parameters
+    ----------
+    report : dict
+        Output of run_graph.
+    deps : dict
+        Output of dependencies.
+
+    Returns
+    -------
+    list of str
+        Names of the scripts on the path, first to last.
+    """
+    # longest path ending at each script, in the order the scripts finished
+    length, previous = dict(), dict()
+    for name, r in report.items():
+        before = [d for d in deps[name] if d in length]
+        previous[name] = max(before, key=length.get) if before else None
+        duration = r["stop"] - r["start"] if r["start"] is not None else 0.
+        length[name] = duration + (length[previous[name]] if before else 0.)
+
+    path = [max(length, key=length.get)]
+    while previous[path[-1]] is not None:
+        path.append(previous[path[-1]])
+
+    return path[::-1]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run paper scripts with a result cache.")
+    parser.add_argument("scripts", nargs="*", default=list(SCRIPTS),
+                        help="scripts to run, in order, defaults to all")
+    parser.add_argument("--force", action="store_true",
+                        help="run all scripts, ignoring cache hits")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="run all scripts without the cache")
+    parser.add_argument("--budget", type=float, default=BUDGET / 1024**2,
+                        help="disk budget of the cache in MB")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="scripts to run at a time, defaults to the number of cores")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run all scripts in this process, sharing loaded tables")
+    args = parser.parse_args()
+
+    data = None
+    if args.in_process:
+        # the scripts find matplotlibrc in their working directory
+        os.chdir(paths.scripts)
+        data = Datasets()
+
+    cache = None if args.no_cache else ResultCache(budget=int(args.budget * 1024**2))
+
+    report = run_graph(args.scripts, cache=cache, force=args.force, jobs=args.jobs,
+                       data=data)
+
+    # timing report
+    print(f"\n{'script':<42} {'status':<7} {'start [s]':>9} {'stop [s]':>9} {'time [s]':>9}")
+    for name, r in sorted(report.items(), key=lambda x: x[1]["stop"]):
+        if r["start"] is None:
+            print(f"{name:<42} {r['status']:<7} {'-':>9} {r['stop']:>9.2f} {'-':>9}")
+        else:
+            print(f"{name:<42} {r['status']:<7} {r['start']:>9.2f} {r['stop']:>9.2f} "
+                  f"{r['stop'] - r['start']:>9.2f}")
+
+    path = critical_path(report, dependencies(args.scripts))
+    print("\ncritical path: " + " -> ".join(path))
+
+    if any(r["status"] == "failed" for r in report.values()):
+        sys.exit(1)
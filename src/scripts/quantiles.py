@@ -0,0 +1,357 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module estimates quantiles of a posterior from chunks of the chain.
+StreamingQuantiles needs a single pass, with two methods:
+
+- "exact" keeps the sorted chunks and merges them at the end, so the result
+  is identical to np.quantile, but memory grows with the chain. This is the
+  default.
+- "tdigest" keeps a merging t-digest per column (Dunning & Ertl 2019), so
+  memory is bounded by the compression, and the error in quantile rank is
+  roughly q (1 - q) / compression.
+
+TwoPassQuantiles is exact with bounded memory, at the cost of a second
+pass. The first pass counts the values in a fixed number of bins, whose
+width doubles whenever the values outgrow them. This gives the bin and the
+rank within the bin of the values that np.quantile interpolates between.
+The second pass keeps only the values in these bins. This is the method
+used for the published values.
+"""
+
+import numpy as np
+
+
+class TDigest:
+    """Merging t-digest of a one-dimensional stream of values.
+
+    Centroids are merged with the k1 scale function, i.e., clusters are
+    smaller in the tails, where the 16th and 84th percentiles live.
+
+    Parameters
+    ----------
+    compression : float
+        Compression parameter delta, the digest keeps at most about
+        delta / 2 centroids.
+    """
+
+    def __init__(self, compression=2000):
+        self.compression = compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        """Add a chunk of values to the digest.
+
+        Parameters
+        ----------
+        values : array-like
+            One-dimensional chunk of values, NaNs are ignored.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+
+        if len(values) == 0:
+            return
+
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        # merge the new values with the old centroids, sorted by mean
+        means = np.concatenate([self.means, values])
+        weights = np.concatenate([self.weights, np.ones_like(values)])
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        # rank of the left edge of each centroid
+        cumw = np.cumsum(weights)
+        q = (cumw - weights) / cumw[-1]
+
+        # k1 scale function, each cluster spans one unit of k
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        cluster = np.floor(k - k[0]).astype(np.int64)
+
+        # collapse the centroids in each cluster
+        starts = np.flatnonzero(np.diff(cluster, prepend=-1))
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q):
+        """Estimate quantiles from the digest.
+
+        Parameters
+        ----------
+        q : float or array-like
+            Quantiles between 0 and 1.
+
+        Returns
+        -------
+        float or np.ndarray
+            Estimated quantiles.
+        """
+        if len(self.means) == 0:
+            return np.full(np.shape(q), np.nan)
+
+        # interpolate between centroid centres in rank, pinned to the extremes
+        cumw = np.cumsum(self.weights)
+        centres = cumw - self.weights / 2
+        x = np.concatenate([[0], centres, [cumw[-1]]])
+        y = np.concatenate([[self.min], self.means, [self.max]])
+
+        return np.interp(np.asarray(q) * cumw[-1], x, y)
+
+
+class StreamingQuantiles:
+    """Quantiles of the columns of a chain, accumulated chunk by chunk.
+
+    Parameters
+    ----------
+    quantiles : list of float
+        Quantiles to estimate, between 0 and 1.
+    method : str
+        Either "exact" or "tdigest".
+    compression : float
+        Compression of the t-digest, ignored for the exact method.
+    """
+
+    def __init__(self, quantiles=(0.16, 0.5, 0.84), method="exact",
+                 compression=2000):
+        if method not in ("exact", "tdigest"):
+            raise ValueError(f"Unknown method: {method}")
+
+        self.quantiles = np.asarray(quantiles)
+        self.method = method
+        self.compression = compression
+        self.columns = None
+
+    def update(self, chunk):
+        """Add a chunk of the chain.
+
+        Parameters
+        ----------
+        chunk : array-like
+            Two-dimensional chunk, with steps in rows and parameters in
+            columns.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+
+        if self.columns is None:
+            if self.method == "exact":
+                self.columns = [[] for _ in range(chunk.shape[1])]
+            else:
+                self.columns = [TDigest(self.compression)
+                                for _ in range(chunk.shape[1])]
+
+        for column, values in zip(self.columns, chunk.T):
+            if self.method == "exact":
+                column.append(np.sort(values))
+            else:
+                column.update(values)
+
+    def result(self):
+        """Get the quantiles of all chunks seen so far.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (n_quantiles, n_columns), like np.quantile with
+            axis=0.
+        """
+        if self.columns is None:
+            raise ValueError("No chunks were added.")
+
+        res = []
+        for column in self.columns:
+            if self.method == "exact":
+                # the timsort merges the sorted runs in linear time
+                values = np.sort(np.concatenate(column), kind="stable")
+                res.append(np.quantile(values, self.quantiles))
+            else:
+                res.append(column.quantile(self.quantiles))
+
+        return np.array(res).T
+
+
+
+class _Histogram:
+    """Histogram of a stream of values in N bins of width w, a power of two,
+    so that the bin of a value, floor(x / w), is exact. When the values
+    outgrow the bins, w doubles and pairs of bins merge, which gives the
+    same counts as binning all values with the new width in the first
+    place."""
+
+    def __init__(self, nbins):
+        self.nbins = nbins
+        self.width = None
+        self.start = 0
+        self.counts = np.zeros(nbins, dtype=np.int64)
+        self.min, self.max = np.inf, -np.inf
+
+    def _fits(self, width, lo, hi):
+        return np.floor(hi / width) - np.floor(lo / width) < self.nbins
+
+    def bins(self, values):
+        """Bins of values, with the current width."""
+        return np.floor(values / self.width).astype(np.int64)
+
+    def update(self, values):
+        if len(values) == 0:
+            return
+
+        lo, hi = min(self.min, values.min()), max(self.max, values.max())
+
+        # the smallest width that fits all values so far, and resolves them
+        width = self.width
+        if width is None:
+            width = np.spacing(max(abs(lo), abs(hi)))
+        while not self._fits(width, lo, hi):
+            width *= 2.
+
+        # move the counts into the wider bins, and the window of bins to the
+        # bin of the smallest value
+        occupied = self.start + np.flatnonzero(self.counts)
+        counts = self.counts[occupied - self.start]
+        if self.width is not None and width > self.width:
+            occupied = np.floor_divide(occupied, int(round(width / self.width)))
+
+        self.width, self.min, self.max = width, lo, hi
+        self.start = int(np.floor(lo / width))
+        self.counts = np.zeros(self.nbins, dtype=np.int64)
+        np.add.at(self.counts, occupied - self.start, counts)
+
+        self.counts += np.bincount(self.bins(values) - self.start,
+                                   minlength=self.nbins)
+
+
+class TwoPassQuantiles:
+    """Exact quantiles of the columns of a chain, as from np.quantile, in two
+    passes over the chunks with bounded memory. NaNs and infinities are
+    ignored.
+
+    Pass the chunks to update in the first pass, and the same chunks in the
+    same order to collect in the second pass.
+
+    Parameters
+    ----------
+    quantiles : list of float
+        Quantiles to compute, between 0 and 1.
+    nbins : int
+        Number of bins of the first pass per column. The second pass keeps
+        the values in the bins of the quantiles, i.e., a fraction of about
+        the density at the quantiles times the range of the column over
+        nbins.
+    """
+
+    def __init__(self, quantiles=(0.16, 0.5, 0.84), nbins=2**16):
+        self.quantiles = np.asarray(quantiles)
+        self.nbins = nbins
+        self.hists = None
+        self.targets = None
+
+    @staticmethod
+    def _finite(values):
+        return values[np.isfinite(values)]
+
+    def update(self, chunk):
+        """Count the values of a chunk of the chain, first pass.
+
+        Parameters
+        ----------
+        chunk : array-like
+            Two-dimensional chunk, with steps in rows and parameters in
+            columns.
+        """
+        if self.targets is not None:
+            raise ValueError("The second pass has started.")
+
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if self.hists is None:
+            self.hists = [_Histogram(self.nbins) for _ in range(chunk.shape[1])]
+
+        for hist, values in zip(self.hists, chunk.T):
+            hist.update(self._finite(values))
+
+    def _find_targets(self):
+        """Ranks np.quantile interpolates between, and their bins."""
+        self.targets = []
+        for hist in self.hists:
+            n = hist.counts.sum()
+            cum = np.cumsum(hist.counts)
+
+            # np.quantile with the default linear method
+            virtual = (n - 1) * self.quantiles
+            r0 = np.floor(virtual).astype(np.int64)
+            r1 = np.minimum(r0 + 1, n - 1)
+            ranks = np.concatenate([r0, r1])
+
+            bins = np.searchsorted(cum, ranks, side="right")
+            self.targets.append(dict(n=n, virtual=virtual, ranks=ranks,
+                                     bins=bins, before=cum[bins] - hist.counts[bins],
+                                     keep=np.unique(bins), values=[]))
+
+    def collect(self, chunk):
+        """Keep the values of a chunk in the bins of the quantiles, second
+        pass.
+
+        Parameters
+        ----------
+        chunk : array-like
+            Two-dimensional chunk, as in the first pass.
+        """
+        if self.hists is None:
+            raise ValueError("No chunks were counted in the first pass.")
+        if self.targets is None:
+            self._find_targets()
+
+        chunk = np.asarray(chunk, dtype=np.float64)
+        for target, hist, values in zip(self.targets, self.hists, chunk.T):
+            if target["n"] == 0:
+                continue
+            values = self._finite(values)
+            bins = hist.bins(values) - hist.start
+            target["values"].append(values[np.isin(bins, target["keep"])])
+
+    def result(self):
+        """Get the quantiles after both passes.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (n_quantiles, n_columns), like np.quantile with
+            axis=0.
+        """
+        if self.targets is None:
+            raise ValueError("The second pass has not started.")
+
+        res = []
+        for target, hist in zip(self.targets, self.hists):
+            if target["n"] == 0:
+                res.append(np.full(len(self.quantiles), np.nan))
+                continue
+
+            counts = hist.counts[target["keep"]]
+            kept = np.sort(np.concatenate(target["values"]))
+            if len(kept) != counts.sum():
+                raise ValueError("The passes saw different chunks.")
+
+            # position of each rank among the kept values, whose bins are
+            # contiguous in sorted order
+            offset = np.cumsum(counts) - counts
+            start = offset[np.searchsorted(target["keep"], target["bins"])]
+            values = kept[start + target["ranks"] - target["before"]]
+
+            # linear interpolation as in np.quantile
+            a, b = np.split(values, 2)
+            gamma = target["virtual"] - np.floor(target["virtual"])
+            res.append(np.where(gamma >= 0.5, b - (b - a) * (1 - gamma),
+                                a + (b - a) * gamma))
+
+        return np.array(res).T
@@ -0,0 +1,282 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module caches the files that the paper scripts write, keyed on the
+content of everything that goes into them: the script, the local modules it
+imports, the matplotlibrc, and the data files it reads. A script whose key
+is in the cache does not run, and its files are copied back instead.
+
+Hashes of data files are memoised by size and modification time, so that
+large inputs, e.g., the MCMC chains, are only read again when they change.
+Entries are evicted in least recently used order when the cache grows
+beyond its disk budget.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import paths
+
+
+# default disk budget of the cache in bytes
+BUDGET = 2 * 1024**3
+
+
+def local_imports(script, folder=paths.scripts):
+    """Local modules that a script imports, directly or through other local
+    modules. Modules named in lazy_import("...") calls count as imports.
+
+    Parameters
+    ----------
+    script : Path
+        Path to the script.
+    folder : Path
+        Folder with the local modules.
+
+    Returns
+    -------
+    list of Path
+        Paths to the local modules, sorted.
+    """
+    found, todo = set(), [script]
+
+    while len(todo) > 0:
+        with open(todo.pop(), "r") as f:
+            tree = ast.parse(f.read())
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0:
+                names = [node.module]
+            elif (isinstance(node, ast.Call)
+                  and isinstance(node.func, ast.Name)
+                  and node.func.id == "lazy_import"
+                  and len(node.args) > 0
+                  and isinstance(node.args[0], ast.Constant)
+                  and isinstance(node.args[0].value, str)):
+                names = [node.args[0].value]
+            else:
+                continue
+
+            for name in names:
+                path = folder / f"{name.split('.')[0]}.py"
+                if path.exists() and path not in found:
+                    found.add(path)
+                    todo.append(path)
+
+    return sorted(found)
+
+
+def expand(patterns, root=paths.src):
+    """Files matching glob patterns.
+
+    Parameters
+    ----------
+    patterns : list of str
+        Glob patterns relative to root.
+    root : Path
+        Folder the patterns are relative to.
+
+    Returns
+    -------
+    list of Path
+        Existing files, sorted.
+    """
+    return sorted(set(p for pattern in patterns for p in root.glob(pattern)
+                      if p.is_file()))
+
+
+class ResultCache:
+    """Content-addressed cache of the files written by the paper scripts.
+    Runs of different scripts can use the cache from several threads.
+
+    Parameters
+    ----------
+    root : Path
+        Folder of the cache.
+    budget : int
+        Disk budget in bytes.
+    """
+
+    def __init__(self, root=paths.cache / "results", budget=BUDGET):
+        self.root = root
+        self.budget = budget
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._memo_path = self.root / "hashes.json"
+        if self._memo_path.exists():
+            with open(self._memo_path, "r") as f:
+                self._memo = json.load(f)
+        else:
+            self._memo = dict()
+
+        # the budget may have shrunk since the last run
+        self.evict()
+
+    def file_hash(self, path):
+        """SHA-1 hash of the content of a file, memoised by size and
+        modification time.
+
+        Parameters
+        ----------
+        path : Path
+            Path to the file.
+
+        Returns
+        -------
+        str
+            Hex digest.
+        """
+        stat = path.stat()
+        name = str(path.relative_to(paths.src))
+
+        memo = self._memo.get(name)
+        if memo is not None and memo[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return memo[2]
+
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+
+        self._memo[name] = [stat.st_size, stat.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    def key(self, script, inputs):
+        """Key of a run of a script.
+
+        Parameters
+        ----------
+        script : Path
+            Path to the script.
+        inputs : list of str
+            Glob patterns of the data files the script reads, relative to
+            paths.src.
+
+        Returns
+        -------
+        str
+            Hex digest.
+        """
+        files = [script, *local_imports(script, paths.scripts), paths.scripts / "matplotlibrc",
+                 *expand(inputs)]
+
+        h = hashlib.sha1()
+        with self._lock:
+            for path in files:
+                if path.exists():
+                    h.update(str(path.relative_to(paths.src)).encode())
+                    h.update(self.file_hash(path).encode())
+
+            self._save_memo()
+
+        return h.hexdigest()
+
+    def _save_memo(self):
+        """Write the memoised hashes atomically."""
+        tmp = self._memo_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._memo, f)
+        os.replace(tmp, self._memo_path)
+
+    def restore(self, key):
+        """Copy the files of a cached run back to their places.
+
+        Parameters
+        ----------
+        key : str
+            Key of the run.
+
+        Returns
+        -------
+        list of Path or None
+            Restored files, or None if the key is not in the cache.
+        """
+        entry = self.root / key
+        manifest = entry / "manifest.json"
+        if not manifest.exists():
+            return None
+
+        with open(manifest, "r") as f:
+            files = json.load(f)["files"]
+
+        restored = []
+        for name in files:
+            path = paths.src / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            shutil.copyfile(entry / "files" / name, tmp)
+            os.replace(tmp, path)
+            restored.append(path)
+
+        # mark as recently used
+        os.utime(manifest)
+
+        return restored
+
+    def store(self, key, files):
+        """Copy the files written by a run into the cache, and evict old
+        entries if the cache is over budget.
+
+        Parameters
+        ----------
+        key : str
+            Key of the run.
+        files : list of Path
+            Files written by the run.
+        """
+        entry = self.root / key
+        if entry.exists():
+            return
+
+        tmp = self.root / f"{key}.{os.getpid()}.tmp"
+        tmp.mkdir()
+        size = 0
+        for path in files:
+            name = path.relative_to(paths.src)
+            (tmp / "files" / name).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(path, tmp / "files" / name)
+            size += path.stat().st_size
+
+        with open(tmp / "manifest.json", "w") as f:
+            json.dump({"files": [str(p.relative_to(paths.src)) for p in files],
+                       "size": size}, f)
+
+        try:
+            os.replace(tmp, entry)
+        except OSError:
+            # another process stored the same key first
+            shutil.rmtree(tmp)
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits into
+        the disk budget."""
+        entries = []
+        for manifest in self.root.glob("*/manifest.json"):
+            # skip entries that are still being written
+            if manifest.parent.name.endswith(".tmp"):
+                continue
+            with open(manifest, "r") as f:
+                size = json.load(f)["size"]
+            entries.append((manifest.stat().st_mtime_ns, size, manifest.parent))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.budget:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,194 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+This module parses the whitespace-delimited output of XSPEC's writefits
+(plot data and residuals), and caches the parsed blocks as .npz files in
+the cache folder, keyed on the modification time and SHA-1 hash of the
+text file, so that re-plotting a fit does no text parsing at all.
+
+The file has three header lines, then the data blocks of each instrument,
+then the residual blocks, all separated by "NO NO NO ..." rows.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import paths
+
+
+# column names
+COLUMNS = ["E [keV]", "dE", "flux [counts/s/keV]",
+           "e_flux", "model [counts/s/keV]"]
+
+# instruments in the joint fits, in the order of the blocks
+INSTRUMENTS = ["PN", "MOS1", "MOS2"]
+
+
+def _parse_block(lines):
+    """Convert the rows of one block to a float64 array with all columns.
+
+    Parameters
+    ----------
+    lines : np.ndarray
+        Rows of the block as strings.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (n_rows, len(COLUMNS)), missing values are NaN.
+    """
+    if len(lines) == 0:
+        return np.zeros((0, len(COLUMNS)))
+
+    # "NO" marks missing values within a row
+    tokens = " ".join(lines).replace("NO", "nan").split()
+    ncol = len(lines[0].split())
+
+    if len(tokens) == len(lines) * ncol:
+        # all rows have the same length
+        block = np.array(tokens, dtype=np.float64).reshape(len(lines), ncol)
+    else:
+        # pad ragged rows
+        rows = [l.replace("NO", "nan").split() for l in lines]
+        ncol = max(len(r) for r in rows)
+        block = np.full((len(rows), ncol), np.nan)
+        for i, r in enumerate(rows):
+            block[i, :len(r)] = np.array(r, dtype=np.float64)
+
+    out = np.full((len(lines), len(COLUMNS)), np.nan)
+    out[:, :min(ncol, len(COLUMNS))] = block[:, :len(COLUMNS)]
+
+    return out
+
+
+def parse_writefits(text, skiprows=3):
+    """Split the writefits output at the NO rows and parse all blocks.
+
+    Parameters
+    ----------
+    text : str
+        Content of the file.
+    skiprows : int
+        Number of header lines.
+
+    Returns
+    -------
+    list of np.ndarray
+        One float64 array per block, the data blocks of all instruments
+        first, then the residual blocks.
+    """
+    lines = np.array([l.strip() for l in text.splitlines()[skiprows:]])
+    lines = lines[np.char.str_len(lines) > 0]
+
+    # separator rows consist of NO only
+    sep = np.flatnonzero(np.char.startswith(lines, "NO"))
+
+    bounds = zip(np.concatenate([[0], sep + 1]),
+                 np.concatenate([sep, [len(lines)]]))
+
+    return [_parse_block(lines[a:b]) for a, b in bounds]
+
+
+def _fingerprint(path):
+    """SHA-1 hash of the content of a file.
+
+    Parameters
+    ----------
+    path : Path
+        Path to the file.
+
+    Returns
+    -------
+    str
+        Hex digest.
+    """
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def load_blocks(path, cache=paths.cache / "xspec"):
+    """Load the parsed blocks of a writefits file, from the cache if the
+    file did not change.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path to the writefits text file.
+    cache : Path or None
+        Cache folder, or None to always parse the text file.
+
+    Returns
+    -------
+    list of np.ndarray
+        Parsed blocks, see parse_writefits.
+    """
+    path = Path(path)
+    mtime = path.stat().st_mtime_ns
+
+    if cache is None:
+        with open(path, "r") as f:
+            return parse_writefits(f.read())
+
+    cachefile = cache / f"{path.name}.npz"
+    sha1 = None
+
+    if cachefile.exists():
+        with np.load(cachefile) as npz:
+
+            # same modification time, or touched but with the same content
+            hit = int(npz["mtime"]) == mtime
+            if not hit:
+                sha1 = _fingerprint(path)
+                hit = str(npz["sha1"]) == sha1
+
+            if hit:
+                return [npz[f"block_{i}"] for i in range(int(npz["nblocks"]))]
+
+    with open(path, "r") as f:
+        blocks = parse_writefits(f.read())
+
+    # write to a temporary file first, so that readers never see half a file
+    cache.mkdir(parents=True, exist_ok=True)
+    tmp = cachefile.with_suffix(f".{os.getpid()}.tmp.npz")
+    np.savez(tmp, mtime=mtime, sha1=sha1 or _fingerprint(path),
+             nblocks=len(blocks),
+             **{f"block_{i}": b for i, b in enumerate(blocks)})
+    os.replace(tmp, cachefile)
+
+    return blocks
+
+
+def read_writefits(path, cache=paths.cache / "xspec"):
+    """Read data and residuals of a writefits file.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path to the writefits text file.
+    cache : Path or None
+        Cache folder, or None to always parse the text file.
+
+    Returns
+    -------
+    data : list of pd.DataFrame
+        Data and model of each instrument.
+    resid : list of pd.DataFrame
+        Residuals of each instrument, without the model column.
+    """
+    blocks = load_blocks(path, cache=cache)
+    n = len(blocks) // 2
+
+    data = [pd.DataFrame(b, columns=COLUMNS) for b in blocks[:n]]
+    resid = [pd.DataFrame(b[:, :-1], columns=COLUMNS[:-1]) for b in blocks[n:]]
+
+    return data, resid
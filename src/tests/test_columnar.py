@@ -0,0 +1,143 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+Tests of the columnar store against the tables parsed with pd.read_csv.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from columnar import OPERATORS, convert, read_columnar, read_schema
+from datasets import Datasets, read_dataset
+
+
+@pytest.fixture
+def folder(tmp_path):
+    """Folder with small versions of some of the tables, with missing
+    values."""
+    rng = np.random.default_rng(42)
+    folder = tmp_path / "data"
+    folder.mkdir()
+
+    pd.DataFrame({"instrument": ["OM", np.nan, "EPIC", "OM", np.nan],
+                  "E_erg": [1e30, 2e30, np.nan, 4e30, 5e30],
+                  "eE_erg": 1e29, "rate_per_day": 0.2,
+                  "tstart": np.arange(5.), "tstop": np.arange(5.) + 1,
+                  "unused": "x"}).to_csv(folder / "flare_energies.csv", index=False)
+
+    n = 50
+    pd.DataFrame({"TIC": rng.choice([277539431, 237880881, 1], n),
+                  "Sector": rng.choice([12, 37, 39, 64, 65], n),
+                  "tstart": np.sort(rng.uniform(0, 100, n)),
+                  "tstop": np.sort(rng.uniform(0, 100, n)) + 0.1,
+                  "ampl_rec": rng.random(n), "ed_rec": rng.random(n) * 100,
+                  "ed_rec_err": rng.random(n), "tot_obs_time": 20.}
+                 ).to_csv(folder / "tess_flares.csv", index=False)
+
+    pd.DataFrame({"T1_50": [3.48, 3.48, 3.47], "symb": ["x", "o", "d"]},
+                 index=["full data set", "quiescent", "flaring"]
+                 ).to_csv(folder / "mcmc_results.csv")
+
+    return folder
+
+
+@pytest.mark.parametrize("name", ["flare_energies", "tess_flares", "mcmc_results"])
+@pytest.mark.parametrize("row_group_size", [2, 65536])
+def test_round_trip(folder, tmp_path, name, row_group_size):
+    store = tmp_path / "store"
+    convert(name, folder=folder, store=store, row_group_size=row_group_size)
+
+    pd.testing.assert_frame_equal(read_columnar(name, folder=folder, store=store),
+                                  read_dataset(name, folder))
+
+
+def test_missing_strings_are_restored(folder, tmp_path):
+    df = read_columnar("flare_energies", folder=folder, store=tmp_path / "store")
+
+    assert df.instrument.isna().tolist() == [False, True, False, False, True]
+    assert "nan" not in df.instrument.tolist()
+
+
+@pytest.mark.parametrize("name, filters", [
+    ("tess_flares", [("TIC", "==", 277539431)]),
+    ("tess_flares", [("TIC", "==", 277539431), ("Sector", "in", [12, 37])]),
+    ("tess_flares", [("tstart", ">=", 20.), ("tstart", "<", 40.)]),
+    ("tess_flares", [("Sector", "!=", 39), ("ed_rec", "<=", 50.)]),
+    ("tess_flares", [("TIC", "==", 42)]),
+    ("flare_energies", [("instrument", "==", "OM")]),
+    ("flare_energies", [("instrument", "!=", "OM")]),
+    ("flare_energies", [("instrument", "in", ["EPIC", "nan"])]),
+    ("flare_energies", [("E_erg", ">", 1.5e30)]),
+    ("mcmc_results", [("index", "==", "quiescent")]),
+])
+def test_filters_match_pandas(folder, tmp_path, name, filters):
+    store = tmp_path / "store"
+    convert(name, folder=folder, store=store, row_group_size=4)
+
+    df = read_dataset(name, folder)
+    mask = np.ones(len(df), dtype=bool)
+    for col, op, value in filters:
+        x = df.index.to_series() if col == "index" else df[col]
+        mask &= (x.isin(value) if op == "in" else OPERATORS[op](x, value)).values
+
+    res = read_columnar(name, filters=filters, folder=folder, store=store)
+
+    expected = df[mask] if name == "mcmc_results" else df[mask].reset_index(drop=True)
+    pd.testing.assert_frame_equal(res, expected, check_index_type=False)
+
+
+def test_projection(folder, tmp_path):
+    res = read_columnar("tess_flares", columns=["ed_rec"],
+                        filters=[("TIC", "==", 1)], folder=folder,
+                        store=tmp_path / "store")
+    df = read_dataset("tess_flares", folder)
+
+    assert list(res.columns) == ["ed_rec"]
+    np.testing.assert_array_equal(res.ed_rec, df.ed_rec[df.TIC == 1])
+
+
+def test_new_version_replaces_old(folder, tmp_path):
+    store = tmp_path / "store"
+    read_columnar("mcmc_results", folder=folder, store=store)
+
+    pd.DataFrame({"T1_50": [1.], "symb": ["s"]}, index=["new"]
+                 ).to_csv(folder / "mcmc_results.csv")
+    df = read_columnar("mcmc_results", folder=folder, store=store)
+
+    assert df.index.tolist() == ["new"]
+    assert len(list((store / "mcmc_results").iterdir())) == 1
+
+
+def test_second_conversion_keeps_the_first(folder, tmp_path):
+    store = tmp_path / "store"
+    first = convert("tess_flares", folder=folder, store=store, row_group_size=10)
+    second = convert("tess_flares", folder=folder, store=store, row_group_size=20)
+
+    assert first == second == read_schema("tess_flares", folder=folder, store=store)
+    assert len(list((store / "tess_flares").iterdir())) == 1
+
+
+def test_datasets_select_uses_its_store(folder, tmp_path):
+    store = tmp_path / "elsewhere"
+    data = Datasets(folder=folder, cache=None, store=store)
+
+    res = data.select("tess_flares", filters=[("Sector", "==", 12)])
+
+    assert (store / "tess_flares").exists()
+    assert (res.Sector == 12).all()
+
+
+def test_unknown_operator_and_column(folder, tmp_path):
+    with pytest.raises(ValueError):
+        read_columnar("tess_flares", filters=[("TIC", "~", 1)], folder=folder,
+                      store=tmp_path / "store")
+    with pytest.raises(KeyError):
+        read_columnar("tess_flares", filters=[("tic", "==", 1)], folder=folder,
+                      store=tmp_path / "store")
@@ -0,0 +1,65 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+Tests of rendering many XSPEC fits with the layouts built once.
+"""
+
+import functools
+
+import matplotlib
+import numpy as np
+
+matplotlib.use("agg")
+
+import FIGURE_data_resid
+import xspec
+
+
+def writefits(path, scales, seed):
+    """Write a writefits file with one data and residual block per scale."""
+    rng = np.random.default_rng(seed)
+    data, resid = [], []
+    for scale in scales:
+        e = np.sort(rng.uniform(0.3, 5., 50))
+        flux = scale * rng.uniform(0., 1., 50)
+        data.append([f"{a} 0.01 {b} {0.1 * b} {1.02 * b}" for a, b in zip(e, flux)])
+        resid.append([f"{a} 0.01 {b} 0.05 NO" for a, b in zip(e, scale * rng.uniform(-0.5, 0.5, 50))])
+
+    sep = ["NO NO NO NO NO"]
+    lines = ["READ SERR 1 2", "@fit.pco", "!"]
+    for block in data + resid:
+        lines += block + sep
+    path.write_text("\n".join(lines[:-1]) + "\n")
+
+
+def test_batch_renders_like_single_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(FIGURE_data_resid.paths, "data", tmp_path)
+    monkeypatch.setattr(FIGURE_data_resid.paths, "figures", tmp_path)
+    monkeypatch.setattr(FIGURE_data_resid, "read_writefits",
+                        functools.partial(xspec.read_writefits, cache=None))
+
+    # tick labels of different widths on the y axes
+    writefits(tmp_path / "joint_a.txt", [1200., 900., 800.], 1)
+    writefits(tmp_path / "pn_a.txt", [1.], 2)
+    writefits(tmp_path / "joint_b.txt", [0.5, 0.4, 0.3], 3)
+    writefits(tmp_path / "pn_b.txt", [3000.], 4)
+    writefits(tmp_path / "pn_c.txt", [1.], 2)
+    files = ["joint_a.txt", "pn_a.txt", "joint_b.txt", "pn_b.txt", "pn_c.txt"]
+
+    def rendered():
+        return [(tmp_path / f"{f.split('.')[0]}_data_resid.png").read_bytes()
+                for f in files]
+
+    FIGURE_data_resid.render_batch(files)
+    batch = rendered()
+
+    for file in files:
+        FIGURE_data_resid.render_batch([file])
+
+    assert rendered() == batch
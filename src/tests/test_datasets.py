@@ -0,0 +1,29 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+Tests of reading the tables declared in datasets.py.
+"""
+
+from datasets import read_dataset
+
+
+def test_missing_values_in_other_columns_drop_rows(tmp_path):
+    lines = [f"# comment {i}" for i in range(8)]
+    lines += ["Ebol(erg),eftime(min),Flare_No,Teff",
+              "1e33,10.5,1,3000",
+              "2e33,20.5,2,na",
+              "na,30.5,3,3100",
+              "4e33,40.5,na,3200"]
+    (tmp_path / "maehara2021_yz_cmi.csv").write_text("\n".join(lines) + "\n")
+
+    df = read_dataset("maehara2021_yz_cmi", tmp_path)
+
+    assert list(df.columns) == ["Ebol(erg)", "eftime(min)"]
+    assert df["Ebol(erg)"].tolist() == [1e33]
+    assert df["eftime(min)"].dtype == "float64"
@@ -0,0 +1,63 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+Tests of the energy beta table and the migration of the per-star files.
+"""
+
+import pandas as pd
+import pytest
+
+from energybeta import read_energy_beta, write_energy_beta
+
+
+def legacy_files(folder, betas):
+    """Write the old {tic}_energy_beta.txt files."""
+    for tic, beta in betas.items():
+        with open(folder / f"{tic}_energy_beta.txt", "w") as f:
+            f.write(repr(beta))
+
+
+def test_read_migrates_legacy_files(tmp_path):
+    legacy_files(tmp_path, {277539431: 1.2345678901234567e28, 237880881: 3e27})
+    path = tmp_path / "energy_beta.csv"
+
+    betas = read_energy_beta(path)
+
+    assert path.exists()
+    assert betas.to_dict() == {277539431: 1.2345678901234567e28, 237880881: 3e27}
+    pd.testing.assert_series_equal(read_energy_beta(path).sort_index(),
+                                   betas.sort_index(), check_index_type=False)
+
+
+def test_first_write_keeps_legacy_stars(tmp_path):
+    legacy_files(tmp_path, {277539431: 1e28, 237880881: 3e27})
+    path = tmp_path / "energy_beta.csv"
+
+    write_energy_beta({277539431: 2e28}, path=path)
+
+    assert read_energy_beta(path).to_dict() == {237880881: 3e27, 277539431: 2e28}
+
+
+def test_write_merges_by_tic(tmp_path):
+    path = tmp_path / "energy_beta.csv"
+
+    write_energy_beta({1: 1., 2: 2.}, path=path)
+    write_energy_beta({2: 20., 3: 30.}, path=path)
+
+    assert read_energy_beta(path).to_dict() == {1: 1., 2: 20., 3: 30.}
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_unknown_schema_version(tmp_path):
+    path = tmp_path / "energy_beta.csv"
+    with open(path, "w") as f:
+        f.write("# schema_version: 99\nTIC,beta\n1,1.0\n")
+
+    with pytest.raises(ValueError):
+        read_energy_beta(path)
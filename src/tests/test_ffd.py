@@ -0,0 +1,88 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+Tests of the vectorised FFDs and power law fits against per-star loops,
+the closed-form maximum likelihood alpha, and a grid posterior.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ffd import ffd_table, fit_powerlaws, log_posterior
+
+
+def synthetic_flares(sizes=(5, 40, 300), alpha=2., seed=42):
+    """Flare table of stars with power law distributed EDs."""
+    rng = np.random.default_rng(seed)
+
+    tables = []
+    for tic, n in enumerate(sizes):
+        ed = 10. * (1. - rng.random(n))**(-1. / (alpha - 1.))
+        tables.append(pd.DataFrame({"TIC": tic, "ed_rec": ed,
+                                    "tot_obs_time": 20. + tic}))
+
+    return pd.concat(tables, ignore_index=True).sample(frac=1., random_state=1)
+
+
+def test_ffd_table_matches_per_star_loop():
+    flares = synthetic_flares()
+    ffd = ffd_table(flares)
+
+    for tic, g in flares.groupby("TIC"):
+        ed = np.sort(g.ed_rec.values)[::-1]
+        row = ffd[ffd.TIC == tic]
+        np.testing.assert_array_equal(row.ed, ed)
+        np.testing.assert_array_equal(row["count"], np.arange(1, len(ed) + 1))
+        np.testing.assert_allclose(row.freq, np.arange(1, len(ed) + 1)
+                                   / g.tot_obs_time.iloc[0])
+
+
+def test_alpha_close_to_mle_for_many_flares():
+    flares = synthetic_flares(sizes=(300,))
+    res = fit_powerlaws(flares).iloc[0]
+
+    # closed-form MLE, and its asymptotic standard error
+    ed = flares.ed_rec.values
+    mle = 1. + len(ed) / np.log(ed / ed.min()).sum()
+    err = (mle - 1.) / np.sqrt(len(ed))
+
+    assert np.isclose(res.alpha_mle, mle)
+    assert abs(res.alpha - mle) < 0.2 * err
+    assert np.isclose(res.alpha_low_err, err, rtol=0.2)
+    assert np.isclose(res.alpha_up_err, err, rtol=0.2)
+
+
+def test_alpha_percentiles_match_grid_posterior():
+    flares = synthetic_flares(sizes=(8, 40))
+    res = fit_powerlaws(flares).set_index("TIC")
+
+    for tic, g in flares.groupby("TIC"):
+        ed = g.ed_rec.values
+        n, PI = len(ed), np.log(ed / ed.min()).sum()
+        L = np.log(10. * ed.max() / ed.min())
+
+        # posterior on a grid of alpha and v, marginalised over v
+        alpha = np.linspace(1.001, 3., 2000)[:, None]
+        v = np.linspace(np.log(n) - 6. / np.sqrt(n), np.log(n) + 6. / np.sqrt(n),
+                        400)[None, :]
+        lp = log_posterior(v, alpha, n, PI, L)
+        p = np.exp(lp - lp.max()).sum(axis=1)
+        cdf = np.cumsum(p) / p.sum()
+        lo, mid, hi = np.interp([0.16, 0.5, 0.84], cdf, alpha[:, 0])
+
+        width = hi - lo
+        assert abs(res.loc[tic, "alpha"] - mid) < 0.05 * width
+        assert abs(res.loc[tic, "alpha_low_err"] - (mid - lo)) < 0.05 * width
+        assert abs(res.loc[tic, "alpha_up_err"] - (hi - mid)) < 0.05 * width
+
+
+def test_stars_with_few_flares_are_skipped():
+    flares = synthetic_flares(sizes=(2, 10))
+
+    assert fit_powerlaws(flares).TIC.tolist() == [1]
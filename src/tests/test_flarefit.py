@@ -0,0 +1,121 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+Tests of the batched flare decay fits against curve_fit, and of the fits
+with the analytic Jacobian.
+"""
+
+import numpy as np
+
+from flarefit import COVARIANCES, PARAMS, fit_flares, fit_flares_batched
+from flaremodel import exponential_decay, exponential_decay_jac
+
+
+# 2-min TESS cadence in days
+CADENCE = 2. / 60. / 24.
+
+
+def synthetic_flares(n, noise=2e-3, seed=42):
+    """Flare windows with known decays, started near the true parameters,
+    with t0 between two cadences."""
+    rng = np.random.default_rng(seed)
+
+    flares = []
+    for i in range(n):
+        tstart = rng.uniform(0, 100)
+        tau = 10**rng.uniform(-2., -1.5)
+        ampl = 10**rng.uniform(-1, 0)
+        t = np.arange(tstart - 0.03, tstart + 6 * tau, CADENCE)
+        t0 = t[np.searchsorted(t, tstart)] - CADENCE / 2
+        y = exponential_decay(t, t0, tau, ampl) + rng.normal(0, noise, len(t))
+
+        flares.append(dict(sector=0, index=i, t=t, y=y,
+                           tstart=tstart, tstop=tstart + 6 * tau,
+                           truth=(t0, tau, ampl),
+                           p0=[t0, tau * 1.2, ampl * 0.9],
+                           bounds=([t0 - CADENCE / 2, 0, 0],
+                                   [t0 + CADENCE / 2, 1, 2 * ampl])))
+
+    return flares
+
+
+def cost(flare, popt):
+    return 0.5 * np.sum((exponential_decay(flare["t"], *popt) - flare["y"])**2)
+
+
+def test_batched_matches_curve_fit():
+    flares = synthetic_flares(20)
+    ref = fit_flares(flares, processes=1)
+    res = fit_flares_batched(flares)
+
+    assert list(res.columns) == list(ref.columns)
+    assert (res.status == "ok").all() and (ref.status == "ok").all()
+
+    # same minimum, and the same e-folding times
+    for flare, a, b in zip(flares, res[PARAMS].values, ref[PARAMS].values):
+        assert cost(flare, a) <= cost(flare, b) * (1 + 1e-6)
+    np.testing.assert_allclose(res.tau, ref.tau, rtol=1e-4)
+
+    # t0 and ampl are degenerate between two cadences, which makes the
+    # covariances sensitive to how the normal matrix is inverted
+    np.testing.assert_allclose(res.cov_tau_tau, ref.cov_tau_tau, rtol=0.25)
+
+
+def test_batched_recovers_truth_without_noise():
+    flares = synthetic_flares(5, noise=0.)
+    res = fit_flares_batched(flares)
+
+    # only ampl exp(t0 / tau) is constrained, so compare the decay curves
+    for flare, popt in zip(flares, res[PARAMS].values):
+        np.testing.assert_allclose(popt[1], flare["truth"][1], rtol=1e-5)
+        np.testing.assert_allclose(exponential_decay(flare["t"], *popt),
+                                   exponential_decay(flare["t"], *flare["truth"]),
+                                   atol=1e-6)
+
+
+def test_batched_short_window_has_no_covariance():
+    flares = synthetic_flares(2)
+    flares[1] = dict(flares[1], t=flares[1]["t"][:3], y=flares[1]["y"][:3])
+
+    res = fit_flares_batched(flares)
+
+    assert res.loc[0, COVARIANCES].notna().all()
+    assert res.loc[1, COVARIANCES].isna().all()
+
+
+def test_jacobian_matches_finite_differences():
+    flare = synthetic_flares(1)[0]
+    x = np.array(flare["truth"])
+
+    jac = exponential_decay_jac(flare["t"], *x)
+
+    # central differences with t0 between two cadences
+    h = 1e-7
+    for k in range(3):
+        dx = np.eye(3)[k] * h
+        num = (exponential_decay(flare["t"], *(x + dx)) -
+               exponential_decay(flare["t"], *(x - dx))) / (2 * h)
+        np.testing.assert_allclose(jac[:, k], num, rtol=1e-5, atol=1e-5)
+
+
+def test_jac_moves_t0_across_cadences():
+    flares = synthetic_flares(10)
+    for flare in flares:
+        t0, tau, ampl = flare["truth"]
+        # start a few cadences late, with t0 free within the window
+        flare.update(p0=[t0 + 3.5 * CADENCE, tau * 1.2, ampl * 0.9],
+                     bounds=([flare["t"][0], 0, 0], [flare["t"][-1], 1, 2 * ampl]))
+
+    res = fit_flares(flares, processes=1, jac=True)
+    ref = fit_flares(flares, processes=1)
+
+    assert (res.status == "ok").all()
+    for flare, a, b in zip(flares, res[PARAMS].values, ref[PARAMS].values):
+        assert cost(flare, a) <= cost(flare, b) * (1 + 1e-6)
+        assert cost(flare, a) <= cost(flare, flare["truth"]) * (1 + 1e-6)
@@ -0,0 +1,75 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+Tests of the searchsorted window masks and slices against element-wise
+comparisons.
+"""
+
+import numpy as np
+import pytest
+
+from intervals import TimeIndex, interval_mask, interval_slices
+
+
+def reference_mask(time, tstart, tstop, pad=0., closed=True):
+    """Mask with one comparison per window, as in the original scripts."""
+    mask = np.zeros(len(time), dtype=bool)
+    for a, b in zip(tstart, tstop):
+        if closed:
+            mask |= (time >= a - pad) & (time <= b + pad)
+        else:
+            mask |= (time > a - pad) & (time < b + pad)
+    return mask
+
+
+@pytest.mark.parametrize("closed", [True, False])
+@pytest.mark.parametrize("pad", [0., 0.5])
+def test_mask_matches_reference(closed, pad):
+    rng = np.random.default_rng(42)
+    # repeated time stamps, and windows that overlap, touch time stamps,
+    # stick out of the light curve, or are empty
+    time = np.sort(np.round(rng.uniform(0, 100, 1000), 1))
+    tstart = np.concatenate([np.round(rng.uniform(-5, 100, 50), 1), [-10., 50.]])
+    tstop = np.concatenate([tstart[:50] + np.round(rng.uniform(0, 3, 50), 1),
+                            [-8., 49.]])
+
+    np.testing.assert_array_equal(
+        interval_mask(time, tstart, tstop, pad=pad, closed=closed),
+        reference_mask(time, tstart, tstop, pad=pad, closed=closed))
+
+    for sl, a, b in zip(interval_slices(time, tstart, tstop, pad=pad, closed=closed),
+                        tstart, tstop):
+        np.testing.assert_array_equal(
+            time[sl], time[reference_mask(time, [a], [b], pad=pad, closed=closed)])
+
+
+def test_no_windows_and_no_time():
+    time = np.arange(10.)
+
+    assert not interval_mask(time, [], []).any()
+    assert len(interval_mask(np.zeros(0), [1.], [2.])) == 0
+
+
+def test_time_index_window_is_a_view():
+    time = np.arange(0., 10., 0.5)
+    flux = time**2
+    index = TimeIndex(time)
+
+    t, f = index.window(2., 3., flux)
+
+    np.testing.assert_array_equal(t, [2., 2.5, 3.])
+    np.testing.assert_array_equal(f, [4., 6.25, 9.])
+    assert np.shares_memory(t, time) and np.shares_memory(f, flux)
+    assert index.slice(2., 3., closed=False) == slice(5, 6)
+    assert index.slice(20., 30.) == slice(20, 20)
+
+
+def test_time_index_needs_sorted_time():
+    with pytest.raises(ValueError):
+        TimeIndex([1., 0., 2.])
@@ -0,0 +1,134 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+Tests of the streaming quantiles against np.quantile.
+"""
+
+import numpy as np
+import pytest
+
+from quantiles import StreamingQuantiles, TDigest, TwoPassQuantiles
+
+
+QUANTILES = [0.16, 0.5, 0.84]
+
+
+def chain(n=50000, seed=42):
+    """Chain with a normal, a skewed, and a bimodal column."""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.normal(3., 0.5, n),
+                            rng.lognormal(0., 1., n),
+                            np.where(rng.random(n) < 0.3,
+                                     rng.normal(-2., 0.3, n),
+                                     rng.normal(2., 1., n))])
+
+
+def test_exact_matches_np_quantile():
+    x = chain()
+    sq = StreamingQuantiles(QUANTILES, method="exact")
+    for chunk in np.array_split(x, 13):
+        sq.update(chunk)
+
+    np.testing.assert_array_equal(sq.result(), np.quantile(x, QUANTILES, axis=0))
+
+
+def test_exact_is_default():
+    assert StreamingQuantiles().method == "exact"
+
+
+@pytest.mark.parametrize("compression", [100, 200, 1000])
+def test_tdigest_rank_error(compression):
+    x = chain()
+    sq = StreamingQuantiles(QUANTILES, method="tdigest", compression=compression)
+    for chunk in np.array_split(x, 13):
+        sq.update(chunk)
+    res = sq.result()
+
+    # the rank of each estimate in the chain is off by about q (1 - q) /
+    # compression, allow for a factor of a few and the resolution of the chain
+    q = np.asarray(QUANTILES)
+    for col in range(x.shape[1]):
+        rank = np.searchsorted(np.sort(x[:, col]), res[:, col]) / len(x)
+        bound = 4 * q * (1 - q) / compression + 1 / len(x)
+        assert np.all(np.abs(rank - q) <= bound)
+
+
+def test_tdigest_extremes_and_nans():
+    td = TDigest(100)
+    td.update([np.nan, 1., 2., np.inf, 3.])
+
+    assert td.quantile(0.) == 1.
+    assert td.quantile(1.) == 3.
+    assert np.isnan(TDigest(100).quantile(0.5))
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        StreamingQuantiles(method="histogram")
+
+
+def two_pass(chunks, quantiles=QUANTILES, **kwargs):
+    tp = TwoPassQuantiles(quantiles, **kwargs)
+    for chunk in chunks:
+        tp.update(chunk)
+    for chunk in chunks:
+        tp.collect(chunk)
+    return tp
+
+
+@pytest.mark.parametrize("n", [1, 2, 5, 50000])
+def test_two_pass_matches_np_quantile(n):
+    # negative and positive values, and a column with repeated values
+    x = np.column_stack([chain(n), -chain(n, seed=1)[:, 1],
+                         np.round(chain(n, seed=2)[:, 0])])
+    quantiles = [0., 0.01, 0.16, 0.5, 0.84, 0.99, 1.]
+
+    tp = two_pass(np.array_split(x, min(n, 13)), quantiles)
+
+    np.testing.assert_array_equal(tp.result(), np.quantile(x, quantiles, axis=0))
+
+
+def test_two_pass_keeps_few_values():
+    # a narrow posterior far from zero, like log10 EM, and one whose range
+    # grows from chunk to chunk, so that the bins have to widen
+    rng = np.random.default_rng(3)
+    x = np.column_stack([chain(), 50.5 + 0.01 * rng.standard_normal(50000),
+                         rng.standard_normal(50000) * np.linspace(1., 100., 50000)])
+    tp = two_pass(np.array_split(x, 13))
+
+    np.testing.assert_array_equal(tp.result(), np.quantile(x, QUANTILES, axis=0))
+
+    kept = [sum(len(v) for v in target["values"]) for target in tp.targets]
+    assert max(kept) < 0.1 * len(x)
+
+
+def test_two_pass_ignores_nans():
+    x = chain(1000)
+    y = x.copy()
+    y[::7, 0] = np.nan
+
+    res = two_pass([y]).result()
+
+    np.testing.assert_array_equal(res[:, 0],
+                                  np.quantile(y[~np.isnan(y[:, 0]), 0], QUANTILES))
+    np.testing.assert_array_equal(res[:, 1:], np.quantile(x[:, 1:], QUANTILES, axis=0))
+
+
+def test_two_pass_needs_both_passes():
+    x = chain(100)
+    tp = TwoPassQuantiles(QUANTILES)
+
+    with pytest.raises(ValueError):
+        tp.collect(x)
+    tp.update(x)
+    with pytest.raises(ValueError):
+        tp.result()
+    tp.collect(x[:50])
+    with pytest.raises(ValueError):
+        tp.result()
@@ -0,0 +1,49 @@
+"""
+Python 3.8 - UTF-8
+
+X-ray Loops
+Ekaterina Ilin, 2023
+MIT License
+
+---
+
+Tests of the keys of the result cache.
+"""
+
+import resultcache
+
+from resultcache import ResultCache, local_imports
+
+
+def scripts(folder):
+    """A script that imports a helper, which imports another one lazily."""
+    folder.mkdir()
+    (folder / "SCRIPT.py").write_text("import helper\nimport numpy as np\n")
+    (folder / "helper.py").write_text('from lazy import lazy_import\n\n'
+                                      'table = lazy_import("table")\n'
+                                      'plt = lazy_import("matplotlib.pyplot")\n')
+    (folder / "lazy.py").write_text("")
+    (folder / "table.py").write_text("A = 1\n")
+
+
+def test_local_imports_follow_lazy_imports(tmp_path):
+    scripts(tmp_path / "scripts")
+
+    found = local_imports(tmp_path / "scripts" / "SCRIPT.py", tmp_path / "scripts")
+
+    assert [p.name for p in found] == ["helper.py", "lazy.py", "table.py"]
+
+
+def test_key_changes_with_lazily_imported_module(tmp_path, monkeypatch):
+    scripts(tmp_path / "scripts")
+    monkeypatch.setattr(resultcache.paths, "src", tmp_path)
+    monkeypatch.setattr(resultcache.paths, "scripts", tmp_path / "scripts")
+    cache = ResultCache(root=tmp_path / "cache")
+    script = tmp_path / "scripts" / "SCRIPT.py"
+
+    key = cache.key(script, [])
+    assert cache.key(script, []) == key
+
+    (tmp_path / "scripts" / "table.py").write_text("A = 2\n")
+
+    assert cache.key(script, []) != key